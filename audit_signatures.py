@@ -0,0 +1,246 @@
+#! /bin/python3
+
+"""
+Re-verify the signatures of archived requests.
+
+Archives are JSON Lines files with one signed request per line, as returned
+by DuoHmac.get_authentication_components plus the method:
+
+    {"method": "GET", "url": "api-xxxxxxxx.duosecurity.com/admin/v1/users?limit=300",
+     "body": null, "headers": {"x-duo-date": "...", "Authorization": "Basic ..."}}
+
+Each file is split into byte ranges that are memory-mapped and verified
+in a pool of processes.  Every record that does not verify is written to
+stdout as a JSON line as soon as its range is done, with the file and byte
+offset of the record; a summary goes to stderr.  The exit status is 1 if
+any record did not verify.
+"""
+
+import argparse
+import json
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+
+from duo_hmac import duo_hmac_verify
+
+DEFAULT_RANGE_SIZE = 16 * 1024 * 1024
+
+# The verifier of each worker process, built once by _init_worker
+_verifier = None
+
+
+def _init_worker(credentials):
+    global _verifier
+    _verifier = duo_hmac_verify.DuoHmacVerifier(credentials)
+
+
+def split_ranges(path, range_size):
+    """Split a file into (path, start, end) byte ranges of about range_size"""
+    size = os.path.getsize(path)
+    return [
+        (path, start, min(start + range_size, size))
+        for start in range(0, size, range_size)
+    ]
+
+
+def iter_lines(path, start, end):
+    """
+    Yield (offset, line) for each line of the file that starts within
+    [start, end).  A line that straddles start belongs to the previous range.
+    """
+    with open(path, "rb") as archive:
+        try:
+            buffer = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Files that cannot be mapped are read instead
+            yield from _read_lines(archive, start, end)
+            return
+
+        with buffer:
+            offset = start
+            if start > 0 and buffer[start - 1] != ord("\n"):
+                offset = buffer.find(b"\n", start) + 1
+                if offset == 0:
+                    return
+            while offset < end:
+                newline = buffer.find(b"\n", offset)
+                if newline == -1:
+                    yield (offset, buffer[offset:])
+                    return
+                yield (offset, buffer[offset:newline])
+                offset = newline + 1
+
+
+def _read_lines(archive, start, end):
+    offset = start
+    if start > 0:
+        archive.seek(start - 1)
+        if archive.read(1) != b"\n":
+            offset += len(archive.readline())
+    archive.seek(offset)
+    while offset < end:
+        line = archive.readline()
+        if not line:
+            return
+        yield (offset, line.rstrip(b"\n"))
+        offset += len(line)
+
+
+def verify_record(verifier, line):
+    """Verify one archived request, and return its IKEY"""
+    record = json.loads(line)
+    url = record["url"]
+    if "://" in url:
+        url = url.split("://", 1)[1]
+    api_host, slash, rest = url.partition("/")
+    api_path, _, query_string = (slash + rest).partition("?")
+    return verifier.verify(
+        record["method"],
+        api_host,
+        api_path,
+        query_string,
+        record.get("body"),
+        record["headers"],
+    )
+
+
+def _record_ikey(line):
+    """The IKEY a record claims to be signed with, if it can be found"""
+    try:
+        headers = json.loads(line)["headers"]
+        authorization = duo_hmac_verify.get_header(headers, "Authorization")
+        return duo_hmac_verify.parse_authorization_header(authorization)[0]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def audit_range(task):
+    """Verify the records in one byte range; return (checked, mismatches)"""
+    path, start, end = task
+    checked = 0
+    mismatches = []
+    for offset, line in iter_lines(path, start, end):
+        if not line.strip():
+            continue
+        checked += 1
+        try:
+            verify_record(_verifier, line)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            if isinstance(e, KeyError):
+                error = f"Record has no {e} field"
+            elif isinstance(e, (TypeError, AttributeError)):
+                error = "Record is malformed"
+            else:
+                error = str(e)
+            mismatches.append(
+                {
+                    "file": path,
+                    "offset": offset,
+                    "ikey": _record_ikey(line),
+                    "error": error,
+                }
+            )
+    return (checked, mismatches)
+
+
+def audit(paths, credentials, processes=None, range_size=DEFAULT_RANGE_SIZE):
+    """
+    Verify every record in the files, yielding (checked, mismatches) per
+    byte range as each range is done, in no particular order
+    """
+    tasks = [task for path in paths for task in split_ranges(path, range_size)]
+    if processes == 1:
+        _init_worker(credentials)
+        yield from map(audit_range, tasks)
+        return
+
+    with multiprocessing.Pool(processes, _init_worker, (credentials,)) as pool:
+        yield from pool.imap_unordered(audit_range, tasks)
+
+
+def _read_keys(path):
+    with open(path) as keys_file:
+        keys = json.load(keys_file)
+    return {
+        ikey: [skeys] if isinstance(skeys, str) else list(skeys)
+        for (ikey, skeys) in keys.items()
+    }
+
+
+def _parse_credential(value):
+    ikey, separator, skey = value.partition(":")
+    if not separator or not ikey or not skey:
+        raise argparse.ArgumentTypeError("credentials must be given as IKEY:SKEY")
+    return (ikey, skey)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="Duo signature audit",
+        description="""Re-verifies the signatures of archived requests in
+                       JSON Lines files, across a pool of processes, and
+                       writes each record that does not verify to stdout""",
+        epilog="""CLI flags: --keys <keys.json> --credential IKEY:SKEY ...
+                  -j <processes> <archive.jsonl> ...""",
+    )
+    parser.add_argument("archives", nargs="+", help="JSON Lines archive files")
+    parser.add_argument(
+        "--keys",
+        help="""JSON file mapping each IKEY to its SKEY, or to a list of
+                current and historical SKEYs""",
+    )
+    parser.add_argument(
+        "--credential",
+        action="append",
+        default=[],
+        type=_parse_credential,
+        help="IKEY:SKEY; repeat an IKEY to give it historical SKEYs",
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=None,
+        help="Worker processes (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--range-size",
+        type=int,
+        default=DEFAULT_RANGE_SIZE,
+        help="Bytes of archive verified per task",
+    )
+    args = parser.parse_args()
+
+    credentials = _read_keys(args.keys) if args.keys else {}
+    for ikey, skey in args.credential:
+        credentials.setdefault(ikey, []).append(skey)
+    if not credentials:
+        parser.error("give the keys to verify with in --keys or --credential")
+
+    start = time.perf_counter()
+    checked = 0
+    mismatched = 0
+    for range_checked, mismatches in audit(
+        args.archives, credentials, args.processes, args.range_size
+    ):
+        checked += range_checked
+        mismatched += len(mismatches)
+        for mismatch in mismatches:
+            sys.stdout.write(json.dumps(mismatch) + "\n")
+        sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+
+    rate = checked / elapsed if elapsed else 0.0
+    print(
+        f"Checked {checked} records in {elapsed:.1f}s ({rate:.0f}/s), "
+        f"{mismatched} did not verify",
+        file=sys.stderr,
+    )
+    sys.exit(1 if mismatched else 0)
+
+
+if __name__ == "__main__":
+    main()
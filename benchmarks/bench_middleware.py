@@ -0,0 +1,146 @@
+#! /bin/python3
+
+"""
+Compare in-process request throughput of a trivial WSGI and ASGI
+application with and without the verifying middleware, for a small GET
+and a POST with a larger body.  No server or network is involved, so the
+difference is the whole per-request cost of verification.
+
+    python -m benchmarks.bench_middleware --requests 20000 --body-size 65536
+"""
+
+import argparse
+import asyncio
+import io
+import sys
+import time
+
+from duo_hmac import duo_hmac, duo_hmac_verify, duo_middleware
+
+IKEY = "DIABCDEFGHIJKLMNOPQR"
+SKEY = "testtesttesttesttesttesttesttesttesttest"
+API_HOST = "api-xxxxxxxx.duosecurity.com"
+
+
+def signed_request(http_method, api_path, parameters):
+    hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST)
+    uri, body, headers = hmac.get_authentication_components(
+        http_method, api_path, parameters
+    )
+    path, _, query_string = uri[len(API_HOST):].partition("?")
+    return (http_method, path, query_string, (body or "").encode("utf-8"), headers)
+
+
+def wsgi_app(environ, start_response):
+    environ["wsgi.input"].read()
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"ok"]
+
+
+async def asgi_app(scope, receive, send):
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def bench_wsgi(app, request, count):
+    http_method, path, query_string, body, headers = request
+    base_environ = {
+        "REQUEST_METHOD": http_method,
+        "PATH_INFO": path,
+        "QUERY_STRING": query_string,
+        "CONTENT_LENGTH": str(len(body)),
+        "HTTP_HOST": API_HOST,
+    }
+    for name, value in headers.items():
+        base_environ["HTTP_" + name.upper().replace("-", "_")] = value
+
+    def start_response(status, headers):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(count):
+        environ = dict(base_environ)
+        environ["wsgi.input"] = io.BytesIO(body)
+        b"".join(app(environ, start_response))
+    return count / (time.perf_counter() - start)
+
+
+def bench_asgi(app, request, count, chunk_size):
+    http_method, path, query_string, body, headers = request
+    scope = {
+        "type": "http",
+        "method": http_method,
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query_string.encode("latin-1"),
+        "headers": [(b"host", API_HOST.encode("latin-1"))]
+        + [(k.lower().encode(), v.encode()) for (k, v) in headers.items()],
+    }
+    chunks = [body[i: i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+
+    async def send(message):
+        pass
+
+    async def run():
+        for _ in range(count):
+            pending = iter(range(len(chunks)))
+
+            async def receive():
+                index = next(pending)
+                return {
+                    "type": "http.request",
+                    "body": chunks[index],
+                    "more_body": index < len(chunks) - 1,
+                }
+
+            await app(dict(scope), receive, send)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_middleware",
+        description="Request throughput with and without verifying middleware",
+    )
+    parser.add_argument("--requests", default=20000, type=int)
+    parser.add_argument("--body-size", default=65536, type=int)
+    parser.add_argument("--chunk-size", default=16384, type=int)
+    args = parser.parse_args()
+
+    verifier = duo_hmac_verify.DuoHmacVerifier({IKEY: SKEY})
+    requests = [
+        ("small GET", signed_request("GET", "/admin/v1/users", {"limit": "300"})),
+        (
+            f"{args.body_size // 1024}kB POST",
+            signed_request("POST", "/admin/v1/users", {"notes": "x" * args.body_size}),
+        ),
+    ]
+    print(f"Python {sys.version.split()[0]}, {args.requests} requests each")
+    for label, request in requests:
+        plain = bench_wsgi(wsgi_app, request, args.requests)
+        verified = bench_wsgi(
+            duo_middleware.DuoHmacWsgiMiddleware(wsgi_app, verifier),
+            request,
+            args.requests,
+        )
+        print(f"WSGI {label:>10}: {plain:9.0f}/s plain, {verified:9.0f}/s verified")
+
+        plain = bench_asgi(asgi_app, request, args.requests, args.chunk_size)
+        verified = bench_asgi(
+            duo_middleware.DuoHmacAsgiMiddleware(asgi_app, verifier),
+            request,
+            args.requests,
+            args.chunk_size,
+        )
+        print(f"ASGI {label:>10}: {plain:9.0f}/s plain, {verified:9.0f}/s verified")
+
+
+if __name__ == "__main__":
+    main()
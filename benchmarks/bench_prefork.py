@@ -0,0 +1,153 @@
+#! /bin/python3
+
+"""
+Compare forked workers with and without duo_warmup.prepare_for_fork in the
+master: the latency of each worker's first signature, and each worker's
+resident and private (unshared) memory after it has signed requests and
+run a garbage collection.  Requires os.fork; private memory is read from
+/proc/self/smaps_rollup, so it is only reported on Linux.
+
+    python -m benchmarks.bench_prefork --workers 4 --credentials 1000
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+
+from duo_hmac import duo_hmac, duo_warmup
+
+API_HOST = "api-xxxxxxxx.duosecurity.com"
+
+ENDPOINTS = [
+    ("GET", "/admin/v1/users", {"limit": "300", "offset": "0"}),
+    ("POST", "/admin/v1/users", {"username": "someone", "realname": "Some One"}),
+    ("POST", "/auth/v2/auth", {"username": "someone", "factor": "push"}),
+]
+
+
+def memory_kb():
+    """Return (resident, private) memory of this process in kB"""
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            fields = dict(
+                (line.split()[0].rstrip(":"), int(line.split()[1]))
+                for line in smaps
+                if line.split()[-1:] == ["kB"]
+            )
+        return fields["Rss"], fields["Private_Clean"] + fields["Private_Dirty"]
+    except (OSError, KeyError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, None
+
+
+def worker(signers, requests, write_fd):
+    signer = signers[os.getpid() % len(signers)]
+    http_method, api_path, parameters = ENDPOINTS[0]
+
+    start = time.perf_counter()
+    signer.get_authentication_components(http_method, api_path, parameters)
+    first = time.perf_counter() - start
+
+    for index in range(requests):
+        http_method, api_path, parameters = ENDPOINTS[index % len(ENDPOINTS)]
+        signers[index % len(signers)].get_authentication_components(
+            http_method, api_path, parameters
+        )
+    # A long-running worker collects garbage sooner or later
+    gc.collect()
+
+    resident, private = memory_kb()
+    os.write(write_fd, (json.dumps([first, resident, private]) + "\n").encode())
+
+
+def master(warm, args, write_fd):
+    signers = [
+        duo_hmac.DuoHmac(f"DI{index:018d}", f"{index:040d}", API_HOST)
+        for index in range(args.credentials)
+    ]
+    # Application state the workers inherit, as a web application would have
+    application_state = [
+        {"id": index, "name": f"object {index}"} for index in range(args.objects)
+    ]
+
+    if warm:
+        duo_warmup.prepare_for_fork(signers, ENDPOINTS)
+
+    read_fd, child_write_fd = os.pipe()
+    pids = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            worker(signers, args.requests, child_write_fd)
+            os._exit(0)
+        pids.append(pid)
+    os.close(child_write_fd)
+
+    with os.fdopen(read_fd) as results:
+        lines = results.read().splitlines()
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    del application_state
+    samples = [json.loads(line) for line in lines]
+    os.write(write_fd, (json.dumps(samples) + "\n").encode())
+
+
+def run(warm, args):
+    # Each configuration gets its own master, so freezing one cannot affect
+    # the other
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        master(warm, args, write_fd)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as results:
+        samples = json.loads(results.read())
+    os.waitpid(pid, 0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_prefork",
+        description="First-request latency and memory of forked workers",
+    )
+    parser.add_argument("--workers", default=4, type=int)
+    parser.add_argument("--credentials", default=1000, type=int)
+    parser.add_argument(
+        "--objects",
+        default=200000,
+        type=int,
+        help="Size of the application state the workers inherit",
+    )
+    parser.add_argument(
+        "--requests", default=2000, type=int, help="Signatures per worker"
+    )
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("This benchmark needs os.fork")
+
+    print(f"Python {sys.version.split()[0]}, {args.workers} workers")
+    for label, warm in [("cold", False), ("prepare_for_fork", True)]:
+        samples = run(warm, args)
+        first = statistics.median(sample[0] for sample in samples)
+        resident = statistics.mean(sample[1] for sample in samples)
+        line = f"{label:>16}: first signature {first * 1_000_000:8.1f}us"
+        line += f"  resident {resident / 1024:7.1f}MB"
+        if samples[0][2] is not None:
+            private = statistics.mean(sample[2] for sample in samples)
+            line += f"  private {private / 1024:7.1f}MB"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
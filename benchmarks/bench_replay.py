@@ -0,0 +1,98 @@
+#! /bin/python3
+
+"""
+Replay a corpus of request shapes captured with duo_capture.RequestShapeCapture
+and measure signing throughput, overall and for the most frequent endpoints.
+Requests are regenerated from the shapes up front, so only signing is timed,
+and each shape is replayed as often as it appears in the corpus.
+
+    python -m benchmarks.bench_replay shapes.jsonl --rounds 5
+
+Without a corpus, a small built-in workload is captured and replayed.
+"""
+
+import argparse
+import collections
+import io
+import random
+import sys
+import time
+
+from duo_hmac import duo_capture, duo_hmac
+
+IKEY = "DIABCDEFGHIJKLMNOPQR"
+SKEY = "testtesttesttesttesttesttesttesttesttest"
+API_HOST = "api-xxxxxxxx.duosecurity.com"
+
+# (weight, http_method, api_path, parameters) of the built-in workload
+BUILT_IN = [
+    (60, "POST", "/auth/v2/auth", {"username": "someone", "factor": "push"}),
+    (20, "POST", "/auth/v2/preauth", {"username": "someone", "ipaddr": "10.0.0.1"}),
+    (10, "GET", "/admin/v1/users", {"limit": "300", "offset": "0"}),
+    (5, "GET", "/admin/v1/users/DUABCDEFGHIJKLMNOPQR", None),
+    (4, "GET", "/admin/v2/logs/authentication", {"mintime": "1716552000000"}),
+    (1, "POST", "/admin/v1/users", {"username": "some one", "notes": "x" * 4000}),
+]
+
+
+def built_in_corpus():
+    stream = io.StringIO()
+    hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST)
+    hmac.capture = duo_capture.RequestShapeCapture(stream)
+    for weight, http_method, api_path, parameters in BUILT_IN:
+        for _ in range(weight):
+            hmac.get_authentication_components(http_method, api_path, parameters)
+    return stream.getvalue().splitlines()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_replay",
+        description="Signing throughput on a captured workload",
+    )
+    parser.add_argument("corpus", nargs="?", help="JSON lines of request shapes")
+    parser.add_argument("--rounds", default=5, type=int)
+    parser.add_argument("--seed", default=0, type=int)
+    parser.add_argument(
+        "--top", default=10, type=int, help="Endpoints to report separately"
+    )
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus) as corpus:
+            shapes = list(duo_capture.read_shapes(corpus))
+    else:
+        shapes = list(duo_capture.read_shapes(built_in_corpus()))
+    if not shapes:
+        sys.exit("The corpus has no request shapes")
+
+    rng = random.Random(args.seed)
+    requests = [duo_capture.generate_request(shape, rng) for shape in shapes]
+    rng.shuffle(requests)
+    hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST)
+
+    elapsed = collections.Counter()
+    counts = collections.Counter()
+    total_start = time.perf_counter()
+    for _ in range(args.rounds):
+        for http_method, api_path, parameters, in_headers in requests:
+            start = time.perf_counter()
+            hmac.get_authentication_components(
+                http_method, api_path, parameters, in_headers
+            )
+            endpoint = (http_method, duo_capture.path_template(api_path))
+            elapsed[endpoint] += time.perf_counter() - start
+            counts[endpoint] += 1
+    total = time.perf_counter() - total_start
+
+    signed = len(requests) * args.rounds
+    print(f"Python {sys.version.split()[0]}, {len(shapes)} shapes")
+    print(f"{signed} signatures, {signed / total:.0f}/s including the timing loop")
+    for (http_method, path), count in counts.most_common(args.top):
+        per_call = elapsed[(http_method, path)] / count * 1_000_000
+        share = count / signed * 100
+        print(f"{share:5.1f}% {http_method:>6} {path:<40} {per_call:8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#! /bin/python3
+
+"""
+Measure how signing throughput scales with threads sharing one DuoHmac.
+On a free-threaded build (for example python3.13t) throughput should grow
+with the thread count; with the GIL it stays roughly flat.
+
+    python -m benchmarks.bench_threads --threads 1 2 4 8
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from duo_hmac import duo_hmac
+
+IKEY = "DIABCDEFGHIJKLMNOPQR"
+SKEY = "testtesttesttesttesttesttesttesttesttest"
+API_HOST = "api-xxxxxxxx.duosecurity.com"
+
+PARAMETERS = {"username": "someone", "factor": "push", "device": "auto"}
+
+
+def run(hmac, thread_count, iterations, method):
+    barrier = threading.Barrier(thread_count + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(iterations):
+            hmac.get_authentication_components(method, "/auth/v2/auth", PARAMETERS)
+
+    threads = [threading.Thread(target=worker) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench_threads",
+        description="Signing throughput of one shared DuoHmac across threads",
+    )
+    parser.add_argument("--threads", default=[1, 2, 4, 8], nargs="*", type=int)
+    parser.add_argument(
+        "-n", default=20000, type=int, help="Signatures per thread"
+    )
+    parser.add_argument("-m", choices=["get", "post"], default="post")
+    args = parser.parse_args()
+
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    gil_state = "enabled" if gil_enabled else "disabled"
+    print(f"Python {sys.version.split()[0]}, GIL {gil_state}")
+
+    hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST)
+    method = args.m.upper()
+    # Warm up caches before timing anything
+    run(hmac, 1, 1000, method)
+
+    baseline = None
+    for thread_count in args.threads:
+        elapsed = run(hmac, thread_count, args.n, method)
+        throughput = thread_count * args.n / elapsed
+        baseline = baseline or throughput
+        print(
+            f"{thread_count:3d} threads: {throughput:10.0f} signatures/s"
+            f"  ({throughput / baseline:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ import json
 
 import requests
 
-from duo_hmac import duo_hmac
+from duo_hmac import duo_hmac, duo_requests_auth
 
 CONFIG_FILE = "duo.conf"
 DUO_SECTION = "duo"
@@ -19,8 +19,12 @@ def main():
     ikey, skey, api_host = _read_config()
     duo = duo_hmac.DuoHmac(ikey, skey, api_host)
 
+    # Both calls share one pooled connection
+    session = requests.Session()
+    session.auth = duo_requests_auth.DuoRequestsAuth(duo)
+
     # Try to call 'check' and look at return
-    status_code, json_content = _attempt_api_call(duo, "/auth/v2/check")
+    status_code, json_content = _attempt_api_call(session, duo, "/auth/v2/check")
 
     if status_code == 200:
         print("Your credentials successfully called the Auth API")
@@ -35,7 +39,7 @@ def main():
         return
 
     # if 40301, creds are probably admin; try settings endpoint
-    status_code, json_content = _attempt_api_call(duo, "/admin/v1/settings")
+    status_code, json_content = _attempt_api_call(session, duo, "/admin/v1/settings")
 
     if status_code == 200:
         print("Your credentials successfully called the Admin API")
@@ -45,10 +49,8 @@ def main():
         print(f"API call failed with status code {status_code}")
 
 
-def _attempt_api_call(duo, path):
-    uri, _, headers = duo.get_authentication_components("GET", path, {}, {})
-
-    response = requests.get(f"https://{uri}", headers=headers)
+def _attempt_api_call(session, duo, path):
+    response = session.get(f"https://{duo.api_host}{path}")
 
     status_code = response.status_code
     json_content = json.loads(response.content)
@@ -0,0 +1,158 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import json
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+from . import duo_canonicalize, duo_hmac, duo_hmac_utils, duo_hmac_validation
+
+ACCOUNT_ID_PARAMETER = "account_id"
+
+# Stands in for the account id while the shared parts of the request are
+# encoded; quoting and JSON encoding leave all of its characters alone
+_PLACEHOLDER = "DUOACCOUNTIDPLACEHOLDER9F3C7A1E5B"
+
+SignedRequest = Tuple[str, Optional[str], Dict[str, str]]
+
+
+class ChildAccount(NamedTuple):
+    """A child account, as listed by the Accounts API /accounts/v1/account/list"""
+
+    account_id: str
+    api_host: str
+
+
+class _SplitRequest:
+    """
+    The parts of a request that are the same for every child account, split
+    around the spot where the account id goes
+    """
+
+    def __init__(self, http_method: str, parameters: Optional[Dict[str, Any]]):
+        self.params_go_in_body = http_method.upper() in ("POST", "PUT", "PATCH")
+        self.body_parts: Optional[Tuple[str, str]] = None
+        self.query_parts: Optional[Tuple[str, str]] = ("", "")
+        self.canon_parts: Optional[Tuple[str, str]] = ("", "")
+
+        # In the unlikely event the caller's parameters contain the
+        # placeholder, try another one
+        attempt = 0
+        while not self._split(parameters, f"{_PLACEHOLDER}{attempt or ''}"):
+            attempt += 1
+
+        if self.params_go_in_body:
+            # The body hash of each child continues from the shared prefix
+            self.body_prefix_hash = hashlib.sha512(self.body_parts[0].encode("utf-8"))
+        else:
+            self.body_hash = duo_canonicalize.canonicalize_body(None)
+
+    def _split(self, parameters: Optional[Dict[str, Any]], placeholder: str) -> bool:
+        with_placeholder = dict(parameters or {})
+        with_placeholder[ACCOUNT_ID_PARAMETER] = placeholder
+
+        if self.params_go_in_body:
+            body = duo_hmac_utils.jsonize_parameters(with_placeholder)
+            self.body_parts = _split_once(body, f'"{placeholder}"')
+            return self.body_parts is not None
+
+        quoted = duo_hmac_utils.quote_parameters(with_placeholder)
+        self.query_parts = _split_once(
+            duo_hmac_utils.encode_quoted_parameters(quoted), placeholder
+        )
+        self.canon_parts = _split_once(
+            duo_canonicalize.canonicalize_quoted_parameters(quoted), placeholder
+        )
+        return self.query_parts is not None and self.canon_parts is not None
+
+
+def _split_once(text: str, separator: str) -> Optional[Tuple[str, str]]:
+    before, found, after = text.partition(separator)
+    if not found or separator in after:
+        return None
+    return (before, after)
+
+
+def fan_out(
+    parent: duo_hmac.DuoHmac,
+    http_method: str,
+    api_path: str,
+    parameters: Optional[Dict[str, Any]],
+    children: Sequence[ChildAccount],
+    in_headers: Optional[Dict[str, str]] = None,
+    max_workers: Optional[int] = None,
+) -> List[SignedRequest]:
+    """
+    Sign one Admin API request for each child account, using the parent's
+    Accounts API credentials.  Each request goes to the child's api_host
+    with the child's account_id added to the parameters.
+
+    Returns (uri, body, headers) for each child, in order, exactly as
+    parent.get_authentication_components would for that child's host and
+    parameters.  The parameters, JSON body, body hash prefix, and x-duo
+    header hash are computed once and shared by every child; with
+    max_workers, children are signed on a thread pool.
+    """
+    duo_hmac_validation.validate_headers(in_headers)
+
+    if parameters is not None and ACCOUNT_ID_PARAMETER in parameters:
+        raise ValueError(f"{ACCOUNT_ID_PARAMETER} is set for each child account")
+
+    in_headers = {} if in_headers is None else dict(in_headers)
+    split = _SplitRequest(http_method, parameters)
+
+    # Every child is signed with the same date, so the x-duo header hash is
+    # shared too
+    date_string = parent.date_string_provider.get_rfc_2822_date_string()
+    x_duo_headers = duo_hmac_utils.extract_x_duo_headers(in_headers)
+    x_duo_headers["x-duo-date"] = date_string
+    x_duo_headers_hash = duo_canonicalize.canonicalize_x_duo_headers(x_duo_headers)
+
+    def sign_child(child: ChildAccount) -> SignedRequest:
+        if split.params_go_in_body:
+            member = json.dumps(child.account_id)
+            body_end = f"{member}{split.body_parts[1]}"
+            body = f"{split.body_parts[0]}{body_end}"
+            body_hash_state = split.body_prefix_hash.copy()
+            body_hash_state.update(body_end.encode("utf-8"))
+            body_hash = body_hash_state.hexdigest()
+            canon_parameters = ""
+            uri = f"{child.api_host}{api_path}"
+        else:
+            quoted_id = duo_hmac_utils.quote_parameters(
+                {ACCOUNT_ID_PARAMETER: child.account_id}
+            )[ACCOUNT_ID_PARAMETER][0]
+            query_before, query_after = split.query_parts
+            canon_before, canon_after = split.canon_parts
+            query_id = quoted_id.replace("%20", "+")
+            canon_parameters = f"{canon_before}{quoted_id}{canon_after}"
+            body = None
+            body_hash = split.body_hash
+            uri = f"{child.api_host}{api_path}?{query_before}{query_id}{query_after}"
+
+        canon_string = duo_canonicalize.assemble_canonical_string(
+            date_string,
+            http_method,
+            child.api_host,
+            api_path,
+            canon_parameters,
+            body_hash,
+            x_duo_headers_hash,
+        )
+
+        out_headers = dict(in_headers)
+        out_headers["x-duo-date"] = date_string
+        out_headers["Authorization"] = parent._authorization_header(canon_string)
+        if split.params_go_in_body:
+            out_headers["Content-type"] = "application/json"
+
+        return (uri, body, out_headers)
+
+    if max_workers is None or max_workers <= 1 or len(children) <= 1:
+        return [sign_child(child) for child in children]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(sign_child, children))
@@ -0,0 +1,117 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+from . import duo_hmac, duo_hmac_utils
+
+BULK_API_PATH = "/admin/v1/bulk"
+# The Admin API accepts at most 50 operations per bulk request
+MAX_BULK_OPERATIONS = 50
+DEFAULT_MAX_BODY_SIZE = 1024 * 1024
+
+# The body is assembled from individually serialized operations.  These are
+# the parts jsonize_parameters({"operations": [...]}) puts around them.
+_BODY_PREFIX = '{"operations":['
+_BODY_SUFFIX = "]}"
+
+Operation = Tuple[str, str, Optional[Dict[str, Any]]]
+SignedRequest = Tuple[str, str, Dict[str, str]]
+
+
+class BulkOperationPacker:
+    """
+    Pack Admin API operations into as few /admin/v1/bulk requests as the
+    operation count and body size limits allow, and sign each request once.
+
+    Each operation is serialized once as it is added; the bulk body is
+    joined from those pieces, and is identical to running
+    jsonize_parameters over the whole batch.
+    """
+
+    def __init__(
+        self,
+        hmac: duo_hmac.DuoHmac,
+        max_operations: int = MAX_BULK_OPERATIONS,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+        in_headers: Optional[Dict[str, str]] = None,
+    ):
+        if not 0 < max_operations <= MAX_BULK_OPERATIONS:
+            raise ValueError(
+                f"max_operations must be between 1 and {MAX_BULK_OPERATIONS}"
+            )
+
+        self.hmac = hmac
+        self.max_operations = max_operations
+        self.max_body_size = max_body_size
+        self.in_headers = in_headers
+        self._operations: List[str] = []
+        self._body_size = len(_BODY_PREFIX) + len(_BODY_SUFFIX)
+
+    def add(
+        self,
+        http_method: str,
+        api_path: str,
+        parameters: Optional[Dict[str, Any]] = None,
+    ) -> Optional[SignedRequest]:
+        """
+        Add one operation.  If it does not fit in the current batch, the
+        current batch is signed and returned, and the operation starts the
+        next batch.
+        """
+        operation = duo_hmac_utils.jsonize_parameters(
+            {
+                "method": http_method.upper(),
+                "path": api_path,
+                "body": parameters if parameters is not None else {},
+            }
+        )
+
+        # json.dumps escapes non-ascii characters, so length is size in bytes
+        operation_size = len(operation) + (1 if self._operations else 0)
+        minimum_size = len(_BODY_PREFIX) + len(_BODY_SUFFIX) + len(operation)
+        if minimum_size > self.max_body_size:
+            raise ValueError(
+                f"Operation {http_method} {api_path} is too large for one bulk "
+                f"request ({minimum_size} > {self.max_body_size} bytes)"
+            )
+
+        signed = None
+        if (
+            len(self._operations) >= self.max_operations
+            or self._body_size + operation_size > self.max_body_size
+        ):
+            signed = self.flush()
+            operation_size = len(operation)
+
+        self._operations.append(operation)
+        self._body_size += operation_size
+        return signed
+
+    def flush(self) -> Optional[SignedRequest]:
+        """Sign and return the current batch, if it has any operations"""
+        if not self._operations:
+            return None
+
+        body = f"{_BODY_PREFIX}{','.join(self._operations)}{_BODY_SUFFIX}"
+        self._operations = []
+        self._body_size = len(_BODY_PREFIX) + len(_BODY_SUFFIX)
+
+        return self.hmac.prepare_json_request(
+            "POST", BULK_API_PATH, body, self.in_headers
+        ).sign()
+
+    def pack(self, operations: Iterable[Operation]) -> Iterator[SignedRequest]:
+        """
+        Yield signed bulk requests as batches fill, followed by the final
+        partial batch
+        """
+        for http_method, api_path, parameters in operations:
+            signed = self.add(http_method, api_path, parameters)
+            if signed is not None:
+                yield signed
+
+        signed = self.flush()
+        if signed is not None:
+            yield signed
@@ -4,7 +4,7 @@
 import hashlib
 import urllib.parse
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 
 def generate_canonical_string(
@@ -13,7 +13,7 @@ def generate_canonical_string(
     api_host: str,
     api_path: str,
     qs_parameters: Optional[Dict[bytes, List[bytes]]],
-    body: Optional[str],
+    body: Optional[Union[str, bytes]],
     duo_headers: Optional[Dict[str, str]],
 ) -> str:
     """
@@ -26,14 +26,35 @@ def generate_canonical_string(
       Hash of body as JSON string of body parameters, or hash of empty string if none
       Hash of 'x-duo' headers, or hash of empty string if none
     """
-    canon_parts = [
+    return assemble_canonical_string(
         date_string,
-        http_method.upper(),
-        api_host.lower(),
+        http_method,
+        api_host,
         api_path,
         canonicalize_parameters(qs_parameters),
         canonicalize_body(body),
         canonicalize_x_duo_headers(duo_headers),
+    )
+
+
+def assemble_canonical_string(
+    date_string: str,
+    http_method: str,
+    api_host: str,
+    api_path: str,
+    canon_parameters: str,
+    body_hash: str,
+    x_duo_headers_hash: str,
+) -> str:
+    """Join already canonicalized parts of the request into the canonical string"""
+    canon_parts = [
+        date_string,
+        http_method.upper(),
+        api_host.lower(),
+        api_path,
+        canon_parameters,
+        body_hash,
+        x_duo_headers_hash,
     ]
     return "\n".join(canon_parts)
 
@@ -54,11 +75,26 @@ def canonicalize_parameters(parameters: Optional[Dict[bytes, List[bytes]]]) -> s
     return "&".join(args)
 
 
-def canonicalize_body(body: Optional[str]) -> str:
+def canonicalize_quoted_parameters(quoted_parameters: Dict[str, List[str]]) -> str:
+    """
+    Canonicalize parameters that are already percent-encoded, as returned
+    by duo_hmac_utils.quote_parameters.  Produces the same string as
+    canonicalize_parameters without quoting anything again.
+    """
+    args: List[str] = []
+    for key in sorted(quoted_parameters):
+        prefix = f"{key}="
+        args.extend(map(prefix.__add__, sorted(quoted_parameters[key])))
+    return "&".join(args)
+
+
+def canonicalize_body(body: Optional[Union[str, bytes]]) -> str:
     """Canonicalize the body by encoding and hashing it"""
     if body is None:
         body = ""
-    return hashlib.sha512(body.encode("utf-8")).hexdigest()
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha512(body).hexdigest()
 
 
 def canonicalize_x_duo_headers(duo_headers: Optional[Dict[str, str]]) -> str:
@@ -83,3 +119,19 @@ def canonicalize_x_duo_headers(duo_headers: Optional[Dict[str, str]]) -> str:
 
     canon = "\x00".join(canon_list)
     return hashlib.sha512(canon.encode("utf-8")).hexdigest()
+
+
+def canonicalize_x_duo_header_items(x_duo_headers: List[Tuple[str, str]]) -> str:
+    """
+    Canonicalize x-duo headers given as a list of (lowercase name, value)
+    pairs with no repeated names, as canonicalize_x_duo_headers does for a
+    dict.  The list is sorted in place.
+    """
+    x_duo_headers.sort()
+
+    canon_list = []
+    for header_name, value in x_duo_headers:
+        canon_list.extend([header_name, value])
+
+    canon = "\x00".join(canon_list)
+    return hashlib.sha512(canon.encode("utf-8")).hexdigest()
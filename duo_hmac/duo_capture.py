@@ -0,0 +1,201 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+Capture the shapes of signed requests, and regenerate requests of the same
+shapes, so that benchmarks can replay a realistic workload.
+
+A shape records the method, the path with identifiers replaced by "{id}",
+the length of each parameter name, the length of each value before and
+after percent-encoding, the body size, and the number of headers.  It
+records no parameter names, values, or header values.
+"""
+
+import json
+import random
+import re
+import string
+import threading
+import urllib.parse
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+
+from . import duo_hmac_utils
+
+PATH_PLACEHOLDER = "{id}"
+
+# Path segments that are kept: endpoint names ("users", "auth_logs") and
+# versions ("v1").  Anything else, such as a user or integration id, is
+# replaced by PATH_PLACEHOLDER.
+_ENDPOINT_SEGMENT = re.compile(r"(?:[a-z_]+|v[0-9]+)\Z")
+
+# (http_method, api_path, parameters, in_headers), as taken by
+# DuoHmac.get_authentication_components
+Request = Tuple[str, str, Dict[str, Any], Dict[str, str]]
+
+
+def path_template(api_path: str) -> str:
+    """Replace the segments of api_path that are not endpoint names"""
+    return "/".join(
+        segment
+        if not segment or _ENDPOINT_SEGMENT.match(segment)
+        else PATH_PLACEHOLDER
+        for segment in api_path.split("/")
+    )
+
+
+def _size(value: Any) -> int:
+    """Size in bytes of a parameter name, as it is signed"""
+    encoded = duo_hmac_utils._encode(value)
+    if isinstance(encoded, bytes):
+        return len(encoded)
+    return len(str(value).encode("utf-8"))
+
+
+def _value_sizes(value: Any) -> List[int]:
+    """[bytes, percent-encoded length] of one parameter value"""
+    encoded = duo_hmac_utils._encode(value)
+    if isinstance(encoded, bytes):
+        return [len(encoded), len(urllib.parse.quote(encoded, "~"))]
+    # Only a JSON body can hold anything else
+    try:
+        size = len(json.dumps(value).encode("utf-8"))
+    except (TypeError, ValueError):
+        size = len(str(value).encode("utf-8"))
+    return [size, size]
+
+
+def _json_values(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def request_shape(
+    http_method: str,
+    api_path: str,
+    parameters: Optional[Dict[str, Any]],
+    in_headers: Optional[Dict[str, str]],
+    body: Optional[str],
+) -> Dict[str, Any]:
+    """The shape of one signed request, as a JSON-serializable dict"""
+    # Values are taken apart as they are signed: a JSON body holds lists as
+    # lists and anything else as one value, and a query string repeats the
+    # name for each value, as quote_parameters does
+    if http_method.upper() in ("POST", "PUT", "PATCH"):
+        to_list = _json_values
+    else:
+        to_list = duo_hmac_utils._to_list
+    shape_parameters = [
+        [_size(key), [_value_sizes(v) for v in to_list(value)]]
+        for (key, value) in (parameters or {}).items()
+    ]
+    headers = in_headers or {}
+    return {
+        "method": http_method.upper(),
+        "path": path_template(api_path),
+        "parameters": shape_parameters,
+        "body_size": len(body.encode("utf-8")) if body else 0,
+        "headers": len(headers),
+        "x_duo_headers": len(duo_hmac_utils.extract_x_duo_headers(headers)),
+    }
+
+
+class RequestShapeCapture:
+    """
+    Write the shape of each request signed with get_authentication_components
+    to stream as a JSON line, sampled at sample_rate.
+
+    Attach one to a DuoHmac by setting its capture attribute.  With no
+    capture attached, signing only pays for checking that the attribute is
+    None.
+    """
+
+    def __init__(self, stream: TextIO, sample_rate: float = 1.0):
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError("sample_rate must be greater than 0 and at most 1")
+
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        duo_hmac_utils._register_fork_safe_lock(self)
+        self.captured = 0
+        self.failed = 0
+
+    def record(
+        self,
+        http_method: str,
+        api_path: str,
+        parameters: Optional[Dict[str, Any]],
+        in_headers: Optional[Dict[str, str]],
+        body: Optional[str],
+    ) -> None:
+        """Write the shape of one request, if it is sampled"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        try:
+            shape = request_shape(
+                http_method, api_path, parameters, in_headers, body
+            )
+        except Exception:
+            # The request is already signed; failing to describe it must not
+            # fail the caller
+            with self._lock:
+                self.failed += 1
+            return
+
+        line = json.dumps(shape, separators=(",", ":"))
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.captured += 1
+
+
+def read_shapes(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse shapes from JSON lines, skipping blank lines"""
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _text(size: int, quoted_size: int, rng: random.Random) -> str:
+    # A space quotes to three characters, so this many spaces (among
+    # letters that quote to themselves) reproduce the quoted size
+    spaces = min(max((quoted_size - size) // 2, 0), size)
+    characters = [" "] * spaces + [
+        rng.choice(string.ascii_lowercase) for _ in range(size - spaces)
+    ]
+    rng.shuffle(characters)
+    return "".join(characters)
+
+
+def _identifier(rng: random.Random) -> str:
+    return "DU" + "".join(
+        rng.choice(string.ascii_uppercase + string.digits) for _ in range(18)
+    )
+
+
+def generate_request(shape: Dict[str, Any], rng: random.Random) -> Request:
+    """
+    Make up a request of the given shape, with random ASCII names and
+    values.  Each parameter value has its captured size and percent-encoded
+    size; values that were not strings become strings.
+    """
+    api_path = "/".join(
+        _identifier(rng) if segment == PATH_PLACEHOLDER else segment
+        for segment in shape["path"].split("/")
+    )
+
+    parameters: Dict[str, Any] = {}
+    for index, (key_size, value_sizes) in enumerate(shape["parameters"]):
+        # Names must differ, so the last characters number them
+        suffix = str(index)
+        key = _text(max(key_size - len(suffix), 0), 0, rng) + suffix
+        values = [_text(size, quoted_size, rng) for size, quoted_size in value_sizes]
+        parameters[key] = values[0] if len(values) == 1 else values
+
+    in_headers = {}
+    for index in range(shape["headers"]):
+        prefix = "X-Duo-Replay" if index < shape["x_duo_headers"] else "X-Replay"
+        in_headers[f"{prefix}-{index}"] = _text(16, 16, rng)
+
+    return (shape["method"], api_path, parameters, in_headers)
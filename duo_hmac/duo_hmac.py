@@ -4,15 +4,37 @@
 import base64
 import hashlib
 import hmac
-import urllib.parse
+import threading
 
-from typing import Any, Dict, List, Optional, Tuple
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 
-from . import duo_canonicalize, duo_hmac_utils, duo_hmac_validation
+from . import duo_canonicalize, duo_hmac_utils, duo_hmac_validation, duo_schema
+
+# Headers that can be signed in place: a mapping, or a list of (name, value)
+Headers = Union[MutableMapping[str, str], List[Tuple[str, str]]]
 
 
 class DuoHmac:
+    """
+    Signs requests with one set of Duo API credentials.
+
+    A DuoHmac may be shared between threads without locking, provided its
+    date string provider is thread-safe (the providers in duo_hmac_utils
+    are).  Signing only reads the instance's attributes; the keyed HMAC
+    state is cached per thread, so threads never contend on it.
+    """
+
     def __init__(
         self,
         ikey: str,
@@ -27,6 +49,21 @@ class DuoHmac:
             self.date_string_provider = duo_hmac_utils.UTCNowDateStringProvider()
         else:
             self.date_string_provider = date_string_provider
+        # Set to a duo_trace.CanonicalStringTrace to record what is signed
+        self.trace = None
+        # Set to a duo_capture.RequestShapeCapture to record request shapes
+        self.capture = None
+        self._thread_state = threading.local()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The per-thread key state is a cache, and cannot be pickled
+        state = dict(self.__dict__)
+        del state["_thread_state"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._thread_state = threading.local()
 
     def get_authentication_components(
         self,
@@ -42,6 +79,27 @@ class DuoHmac:
           - The request headers (including the authorization
             header per Duo's HMAC specification)
         """
+        components = self.prepare_request(
+            http_method, api_path, parameters, in_headers
+        ).sign()
+        if self.capture is not None:
+            self.capture.record(
+                http_method, api_path, parameters, in_headers, components[1]
+            )
+        return components
+
+    def prepare_request(
+        self,
+        http_method: str,
+        api_path: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> "DuoPreparedRequest":
+        """
+        Do all of the date-independent work for a request once: encode the
+        parameters, hash the body, and select the x-duo headers.  The result
+        can be signed, and signed again with a new date for each retry.
+        """
         duo_hmac_validation.validate_headers(in_headers)
 
         # We'll be manipulating the headers, so make a copy of them first just in case
@@ -50,51 +108,209 @@ class DuoHmac:
         else:
             in_headers = dict(in_headers)
 
-        # We need the request timestamp in RFC 2822 format
-        date_string = self.date_string_provider.get_rfc_2822_date_string()
-
         # Duo does not currently support splitting parameters
         # between the query string and body.
         # Put parameters in the correct place depending on the http method
-        # (body for POST, PUT, and PATCH, query string otherwise)
+        # (body for POST, PUT, and PATCH, query string otherwise).
+        # Query string parameters are quoted once and that form is reused
+        # for both the canonical string and the query string.
         params_go_in_body = http_method.upper() in ("POST", "PUT", "PATCH")
-        qs_parameters, body = duo_hmac_utils.prepare_parameters(
-            parameters, params_go_in_body
+        if params_go_in_body:
+            quoted_parameters = {}
+            body = duo_hmac_utils.jsonize_parameters(parameters)
+        else:
+            quoted_parameters = duo_hmac_utils.quote_parameters(parameters)
+            body = None
+
+        return self._prepare(
+            http_method,
+            api_path,
+            duo_hmac_utils.encode_quoted_parameters(quoted_parameters),
+            duo_canonicalize.canonicalize_quoted_parameters(quoted_parameters),
+            body,
+            in_headers,
+            params_go_in_body,
         )
 
-        # Always send the date string in x-duo-date
-        in_headers["x-duo-date"] = date_string
+    def prepare_json_request(
+        self,
+        http_method: str,
+        api_path: str,
+        body: str,
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> "DuoPreparedRequest":
+        """
+        Prepare a POST, PUT, or PATCH request whose body is already
+        serialized.  The body must be exactly what jsonize_parameters would
+        produce (sorted keys, no whitespace) for Duo to accept the signature.
+        """
+        duo_hmac_validation.validate_headers(in_headers)
 
-        # Extract the x-duo headers
-        x_duo_headers = duo_hmac_utils.extract_x_duo_headers(in_headers)
+        if http_method.upper() not in ("POST", "PUT", "PATCH"):
+            raise ValueError(f"{http_method} requests do not have a JSON body")
 
-        # Calculate the Authorization header from the pieces of the request
-        authn_header = self._generate_authentication_header(
-            date_string, http_method, api_path, qs_parameters, body, x_duo_headers
+        in_headers = {} if in_headers is None else dict(in_headers)
+        return self._prepare(http_method, api_path, "", "", body, in_headers, True)
+
+    def prepare_schema_request(
+        self,
+        schema: duo_schema.ParameterSchema,
+        values: Sequence[Any],
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> "DuoPreparedRequest":
+        """
+        Prepare a request for a precompiled parameter schema, with values
+        given in the order of the schema's keys
+        """
+        duo_hmac_validation.validate_headers(in_headers)
+
+        in_headers = {} if in_headers is None else dict(in_headers)
+        query_string, canon_parameters, body = schema.encode(values)
+        return self._prepare(
+            schema.http_method,
+            schema.api_path,
+            query_string,
+            canon_parameters,
+            body,
+            in_headers,
+            schema.params_go_in_body,
+        )
+
+    def get_schema_components(
+        self,
+        schema: duo_schema.ParameterSchema,
+        values: Sequence[Any],
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[str, str, Dict[str, str]]:
+        """
+        get_authentication_components for a precompiled parameter schema,
+        with values given in the order of the schema's keys
+        """
+        return self.prepare_schema_request(schema, values, in_headers).sign()
+
+    def _prepare(
+        self,
+        http_method: str,
+        api_path: str,
+        query_string: str,
+        canon_parameters: str,
+        body: Optional[Union[str, bytes]],
+        in_headers: Dict[str, str],
+        params_go_in_body: bool,
+    ) -> "DuoPreparedRequest":
+        return DuoPreparedRequest(
+            self,
+            http_method,
+            api_path,
+            self._uri(api_path, query_string),
+            body,
+            in_headers,
+            canon_parameters,
+            params_go_in_body,
+        )
+
+    def sign_headers_into(
+        self,
+        http_method: str,
+        api_path: str,
+        parameters: Optional[Dict[str, Any]],
+        headers: Headers,
+        lowercase_names: bool = False,
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Like get_authentication_components, but rather than copying the
+        headers, write x-duo-date, Authorization, and Content-type straight
+        into the caller's headers and return only the uri and body.
+
+        headers may be a mutable mapping, which is updated in place, or a
+        list of (name, value) tuples, where any earlier values for those
+        three headers are replaced and the rest are appended.  Any x-duo
+        headers already present are signed.  lowercase_names writes the
+        header names in lowercase, as HTTP/2 requires.
+        """
+        # We need the request timestamp in RFC 2822 format
+        date_string = self.date_string_provider.get_rfc_2822_date_string()
+
+        # Encode the parameters as prepare_request does, but sign straight
+        # from the caller's headers, without copying them into dicts
+        params_go_in_body = http_method.upper() in ("POST", "PUT", "PATCH")
+        if params_go_in_body:
+            query_string = ""
+            canon_parameters = ""
+            body = duo_hmac_utils.jsonize_parameters(parameters)
+        else:
+            quoted_parameters = duo_hmac_utils.quote_parameters(parameters)
+            query_string = duo_hmac_utils.encode_quoted_parameters(quoted_parameters)
+            canon_parameters = duo_canonicalize.canonicalize_quoted_parameters(
+                quoted_parameters
+            )
+            body = None
+
+        # Validate the headers and select the caller's x-duo headers in one
+        # pass, after encoding so they are not held during the largest
+        # allocations.  The new date replaces any left from an earlier signing.
+        x_duo_headers = duo_hmac_validation.validate_and_extract_x_duo_headers(headers)
+        x_duo_headers.append(("x-duo-date", date_string))
+
+        canon_string = duo_canonicalize.assemble_canonical_string(
+            date_string,
+            http_method,
+            self.api_host,
+            api_path,
+            canon_parameters,
+            duo_canonicalize.canonicalize_body(body),
+            duo_canonicalize.canonicalize_x_duo_header_items(x_duo_headers),
+        )
+        authn_header = self._authorization_header(canon_string)
+
+        _set_signature_headers(
+            headers, date_string, authn_header, params_go_in_body, lowercase_names
         )
+        return (self._uri(api_path, query_string), body)
+
+    def prepare_raw_request(
+        self,
+        http_method: str,
+        api_path: str,
+        query_string: Optional[str] = None,
+        body: Optional[Union[str, bytes]] = None,
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> "DuoPreparedRequest":
+        """
+        Prepare a request that an HTTP client has already encoded: sign the
+        query string and body exactly as they will be sent, rather than
+        encoding parameters.  No Content-type header is added.
+        """
+        duo_hmac_validation.validate_headers(in_headers)
 
+        in_headers = {} if in_headers is None else dict(in_headers)
+        canon_parameters = duo_canonicalize.canonicalize_parameters(
+            duo_hmac_utils.parse_query_string(query_string)
+        )
+        return self._prepare(
+            http_method,
+            api_path,
+            query_string or "",
+            canon_parameters,
+            body,
+            in_headers,
+            False,
+        )
+
+    def _uri(self, api_path: str, query_string: str) -> str:
         # Assemble the final uri by appending the encoded query string, if any
         uri = f"{self.api_host}{api_path}"
-        query_string = urllib.parse.urlencode(qs_parameters, doseq=True)
         if query_string:
             uri = f"{uri}?{query_string}"
-
-        # Assemble final headers from input headers, authorization header, and
-        # content-type header
-        out_headers = dict(in_headers)
-        out_headers["Authorization"] = authn_header
-        if params_go_in_body:
-            out_headers["Content-type"] = "application/json"
-
-        return (uri, body, out_headers)
+        return uri
 
     def _generate_authentication_header(
         self,
         date_string: str,
         http_method: str,
         api_path: str,
-        qs_parameters: Optional[Dict[bytes, List[bytes]]],
-        body: Optional[str],
+        canon_parameters: str,
+        body_hash: str,
         x_duo_headers: Optional[Dict[str, str]],
     ) -> str:
         """
@@ -106,15 +322,22 @@ class DuoHmac:
         5. Encode the IKEY:hex in base 64
         6. Append the b64 to the string "Basic"
         """
-        canon_string = duo_canonicalize.generate_canonical_string(
+        canon_string = duo_canonicalize.assemble_canonical_string(
             date_string,
             http_method,
             self.api_host,
             api_path,
-            qs_parameters,
-            body,
-            x_duo_headers,
+            canon_parameters,
+            body_hash,
+            duo_canonicalize.canonicalize_x_duo_headers(x_duo_headers),
         )
+        return self._authorization_header(canon_string)
+
+    def _authorization_header(self, canon_string: str) -> str:
+        """Sign an assembled canonical string and format the Authorization header"""
+        if self.trace is not None:
+            self.trace.record(self.ikey, canon_string)
+
         sig_hmac = self._sign_canonical_string(canon_string)
 
         auth = f"{self.ikey}:{sig_hmac.hexdigest()}"
@@ -129,7 +352,169 @@ class DuoHmac:
         Generate the SHA512 signature of the canonical string
         using the SKEY as the shared secret
         """
-        skey_bytes = self.skey.encode("utf-8")
         canon_bytes = canon_string.encode("utf-8")
 
-        return hmac.new(skey_bytes, canon_bytes, hashlib.sha512)
+        sig_hmac = self._get_key_state().copy()
+        sig_hmac.update(canon_bytes)
+        return sig_hmac
+
+    def _get_key_state(self) -> hmac.HMAC:
+        """
+        Return this thread's HMAC keyed with the SKEY.  Keying the HMAC costs
+        two extra hash blocks, so it is built once and copied per signature.
+        Each thread gets its own so that copying never contends on a lock
+        or a shared reference count (notably on free-threaded builds).
+        """
+        thread_state = self._thread_state
+        key_state = getattr(thread_state, "key_state", None)
+        if key_state is None or thread_state.skey != self.skey:
+            thread_state.skey = self.skey
+            key_state = hmac.new(self.skey.encode("utf-8"), digestmod=hashlib.sha512)
+            thread_state.key_state = key_state
+        return key_state
+
+
+def _header_items(headers: Headers) -> Iterable[Tuple[str, str]]:
+    if isinstance(headers, list):
+        return headers
+    return headers.items()
+
+
+def _set_header(headers: Headers, header_name: str, header_value: str) -> None:
+    """Set a header in a mapping, or replace or append it in a list of pairs"""
+    if not isinstance(headers, list):
+        headers[header_name] = header_value
+        return
+
+    header_name_lower = header_name.lower()
+    for index, (existing_name, _) in enumerate(headers):
+        if existing_name.lower() == header_name_lower:
+            headers[index] = (header_name, header_value)
+            return
+    headers.append((header_name, header_value))
+
+
+def _set_signature_headers(
+    headers: Headers,
+    date_string: str,
+    authn_header: str,
+    params_go_in_body: bool,
+    lowercase_names: bool,
+) -> None:
+    """Write x-duo-date, Authorization, and for JSON bodies Content-type"""
+    _set_header(headers, "x-duo-date", date_string)
+    _set_header(
+        headers,
+        "authorization" if lowercase_names else "Authorization",
+        authn_header,
+    )
+    if params_go_in_body:
+        _set_header(
+            headers,
+            "content-type" if lowercase_names else "Content-type",
+            "application/json",
+        )
+
+
+class DuoPreparedRequest:
+    """
+    A request with the parameters encoded, the body hashed, and the x-duo
+    headers selected.  Signing it again with a new date only costs hashing
+    the x-duo headers and the final HMAC.
+    """
+
+    def __init__(
+        self,
+        duo_hmac: DuoHmac,
+        http_method: str,
+        api_path: str,
+        uri: str,
+        body: Optional[Union[str, bytes]],
+        in_headers: Dict[str, str],
+        canon_parameters: str,
+        params_go_in_body: bool,
+    ):
+        self.duo_hmac = duo_hmac
+        self.http_method = http_method
+        self.api_path = api_path
+        self.uri = uri
+        self.body = body
+        self.in_headers = in_headers
+        self.canon_parameters = canon_parameters
+        self.params_go_in_body = params_go_in_body
+        self.body_hash = duo_canonicalize.canonicalize_body(body)
+        self.x_duo_headers = duo_hmac_utils.extract_x_duo_headers(in_headers)
+
+    def sign(self, date_string: Optional[str] = None) -> Tuple[str, str, Dict[str, str]]:
+        """
+        Sign the request with the given date, or the current date from the
+        DuoHmac's date string provider, and return the same components as
+        DuoHmac.get_authentication_components
+        """
+        # We need the request timestamp in RFC 2822 format
+        if date_string is None:
+            date_string = self.duo_hmac.date_string_provider.get_rfc_2822_date_string()
+
+        # Always send the date string in x-duo-date
+        x_duo_headers = dict(self.x_duo_headers)
+        x_duo_headers["x-duo-date"] = date_string
+
+        # Calculate the Authorization header from the pieces of the request
+        authn_header = self.duo_hmac._generate_authentication_header(
+            date_string,
+            self.http_method,
+            self.api_path,
+            self.canon_parameters,
+            self.body_hash,
+            x_duo_headers,
+        )
+
+        # Assemble final headers from input headers, authorization header, and
+        # content-type header
+        out_headers = dict(self.in_headers)
+        out_headers["x-duo-date"] = date_string
+        out_headers["Authorization"] = authn_header
+        if self.params_go_in_body:
+            out_headers["Content-type"] = "application/json"
+
+        return (self.uri, self.body, out_headers)
+
+    def sign_into(
+        self,
+        headers: Headers,
+        lowercase_names: bool = False,
+        date_string: Optional[str] = None,
+    ) -> None:
+        """
+        Sign the request and write x-duo-date, Authorization, and (for
+        requests with a JSON body) Content-type into the caller's headers,
+        without copying them.  x-duo headers already in headers are signed
+        along with any given to prepare_request.  See
+        DuoHmac.sign_headers_into for the forms headers may take.
+        """
+        # We need the request timestamp in RFC 2822 format
+        if date_string is None:
+            date_string = self.duo_hmac.date_string_provider.get_rfc_2822_date_string()
+
+        # Sign the caller's x-duo headers, with the new date replacing any
+        # date left over from an earlier signing
+        x_duo_headers = dict(self.x_duo_headers)
+        for header_name, header_value in _header_items(headers):
+            header_name_lower = header_name.lower()
+            if header_name_lower.startswith("x-duo"):
+                if header_name_lower != "x-duo-date":
+                    x_duo_headers[header_name] = header_value
+        x_duo_headers["x-duo-date"] = date_string
+
+        authn_header = self.duo_hmac._generate_authentication_header(
+            date_string,
+            self.http_method,
+            self.api_path,
+            self.canon_parameters,
+            self.body_hash,
+            x_duo_headers,
+        )
+
+        _set_signature_headers(
+            headers, date_string, authn_header, self.params_go_in_body, lowercase_names
+        )
@@ -1,10 +1,37 @@
 # SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
 # SPDX-License-Identifier: MIT
 
+import datetime
 import email.utils
 import json
+import os
+import threading
+import time
+import urllib.parse
+import weakref
 
-from typing import Any, Dict, List, Optional, Protocol, Tuple
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+
+_SAFE_CHARACTERS = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-~"
+)
+
+# Objects whose _lock is replaced in a forked child, in case another thread
+# held it at the moment of the fork (the logging module does the same)
+_FORK_SAFE_LOCK_OWNERS: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+def _register_fork_safe_lock(owner: Any) -> None:
+    _FORK_SAFE_LOCK_OWNERS.add(owner)
+
+
+def _reinit_locks_after_fork() -> None:
+    for owner in list(_FORK_SAFE_LOCK_OWNERS):
+        owner._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_locks_after_fork)
 
 
 # These type parameters are not correct, but the actual permissible
@@ -46,29 +73,84 @@ def normalize_parameters(
     if parameters is None:
         return {}
 
-    # urllib cannot handle unicode strings properly. quote() excepts,
-    # and urlencode() replaces them with '?'.
-    def encode(value):
-        if isinstance(value, bool):
-            if value:
-                value = "true"
-            else:
-                value = "false"
-        elif isinstance(value, int):
-            value = str(value)
-        if isinstance(value, str):
-            return value.encode("utf-8")
-        return value
-
-    def to_list(value):
-        if value is None or isinstance(value, str):
-            return [value]
-        return value
-
-    return dict(
-        (encode(key), [encode(v) for v in to_list(value)])
-        for (key, value) in list(parameters.items())
+    return {
+        _encode(key): [_encode(v) for v in _to_list(value)]
+        for (key, value) in parameters.items()
+    }
+
+
+def quote_parameters(parameters: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Normalize and percent-encode the parameters in a single pass, so every
+    key and value is encoded and quoted exactly once.  The quoted values
+    feed both the canonical string and the query string.
+    """
+    if parameters is None:
+        return {}
+
+    return {
+        _quote(_encode(key)): [_quote(_encode(v)) for v in _to_list(value)]
+        for (key, value) in parameters.items()
+    }
+
+
+def quote_values(value: Any) -> List[str]:
+    """
+    Normalize and percent-encode the value (or list of values) of one
+    parameter, exactly as quote_parameters does
+    """
+    return [_quote(_encode(v)) for v in _to_list(value)]
+
+
+def encode_quoted_parameters(quoted_parameters: Dict[str, List[str]]) -> str:
+    """
+    Build the query string from quoted parameters.  This matches
+    urllib.parse.urlencode(normalize_parameters(...), doseq=True): urlencode
+    quotes spaces as '+', and a quoted '%20' can only come from a space.
+    """
+    query_string = "&".join(
+        f"{key}={val}" for (key, vals) in quoted_parameters.items() for val in vals
     )
+    return query_string.replace("%20", "+")
+
+
+# Percent-encoding of each byte, indexed by byte value, with the same safe
+# characters as urllib.parse.quote(value, "~")
+_QUOTED_BYTES = [
+    chr(byte) if chr(byte) in _SAFE_CHARACTERS else f"%{byte:02X}"
+    for byte in range(256)
+]
+
+
+def _quote(value) -> str:
+    """
+    Equivalent to urllib.parse.quote(value, "~"), but does the per-byte work
+    in a single str.translate call instead of a Python-level loop
+    """
+    if value.__class__ is bytes:
+        return value.decode("latin-1").translate(_QUOTED_BYTES)
+    return urllib.parse.quote(value, "~")
+
+
+# urllib cannot handle unicode strings properly. quote() excepts,
+# and urlencode() replaces them with '?'.
+def _encode(value):
+    if isinstance(value, bool):
+        if value:
+            value = "true"
+        else:
+            value = "false"
+    elif isinstance(value, int):
+        value = str(value)
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return value
+
+
+def _to_list(value):
+    if value is None or isinstance(value, str):
+        return [value]
+    return value
 
 
 def extract_x_duo_headers(in_headers: Optional[Dict[str, str]]) -> Dict[str, str]:
@@ -83,10 +165,108 @@ def extract_x_duo_headers(in_headers: Optional[Dict[str, str]]) -> Dict[str, str
     }
 
 
+def parse_query_string(query_string: Optional[str]) -> Dict[bytes, List[bytes]]:
+    """
+    Parse a url-encoded query string back into normalized parameters,
+    the inverse of encoding the output of normalize_parameters
+    """
+    if not query_string:
+        return {}
+
+    # latin-1 maps every percent-decoded byte to exactly one code point,
+    # so the original parameter bytes survive the round trip unchanged
+    parsed: Dict[bytes, List[bytes]] = {}
+    for key, value in urllib.parse.parse_qsl(
+        query_string, keep_blank_values=True, encoding="latin-1"
+    ):
+        parsed.setdefault(key.encode("latin-1"), []).append(value.encode("latin-1"))
+    return parsed
+
+
 class DateStringProvider(Protocol):
+    """
+    Supplies the request date.  DuoHmac calls this from whichever thread is
+    signing, so implementations must be safe to call concurrently.
+    """
+
     def get_rfc_2822_date_string(self) -> str: ...
 
 
 class UTCNowDateStringProvider(DateStringProvider):
     def get_rfc_2822_date_string(self) -> str:
         return email.utils.formatdate()
+
+
+class SkewCompensatingDateStringProvider(DateStringProvider):
+    """
+    Issue dates corrected by a smoothed estimate of how far the local clock
+    is from the server's, learned from the Date headers of server responses.
+    The formatted date is cached for the current second.
+    """
+
+    def __init__(
+        self, smoothing: float = 0.2, clock: Callable[[], float] = time.time
+    ):
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be greater than 0 and at most 1")
+
+        self.smoothing = smoothing
+        self._clock = clock
+        self._offset = 0.0
+        self._has_sample = False
+        self._lock = threading.Lock()
+        _register_fork_safe_lock(self)
+        self._cache: Tuple[Optional[int], str] = (None, "")
+
+    @property
+    def offset(self) -> float:
+        """Seconds to add to the local clock to match the server's clock"""
+        return self._offset
+
+    def observe_server_date(
+        self,
+        date_header: str,
+        request_time: Optional[float] = None,
+        response_time: Optional[float] = None,
+    ) -> None:
+        """
+        Learn from the Date header of a server response.  If the local
+        times the request was sent and the response received are given,
+        their midpoint is compared to the server time; otherwise now is.
+        """
+        try:
+            server_datetime = email.utils.parsedate_to_datetime(date_header)
+        except (TypeError, ValueError, IndexError):
+            raise ValueError(f"Unable to parse Date header {date_header!r}")
+        # A -0000 zone parses as naive, which timestamp() would take as local
+        # time; it means UTC with no claim about the local zone (RFC 5322)
+        if server_datetime.tzinfo is None:
+            server_datetime = server_datetime.replace(tzinfo=datetime.timezone.utc)
+        server_time = server_datetime.timestamp()
+
+        if request_time is not None and response_time is not None:
+            local_time = (request_time + response_time) / 2
+        else:
+            local_time = self._clock()
+
+        # Date headers are truncated to the second, so on average the server
+        # time was half a second later than the header says
+        sample = server_time + 0.5 - local_time
+
+        with self._lock:
+            if self._has_sample:
+                self._offset += self.smoothing * (sample - self._offset)
+            else:
+                self._offset = sample
+                self._has_sample = True
+
+    def get_rfc_2822_date_string(self) -> str:
+        now = int(self._clock() + self._offset)
+
+        # Read and replace the cache as one tuple so threads never see a
+        # second paired with another second's string
+        second, date_string = self._cache
+        if second != now:
+            date_string = email.utils.formatdate(now)
+            self._cache = (now, date_string)
+        return date_string
@@ -1,41 +1,93 @@
 # SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
 # SPDX-License-Identifier: MIT
 
-from typing import Dict, Optional
+from typing import Iterable, List, Mapping, Optional, Tuple, Union
 
 
-def validate_headers(headers: Optional[Dict[str, str]]) -> None:
+def validate_headers(
+    headers: Optional[Union[Mapping[str, str], Iterable[Tuple[str, str]]]]
+) -> None:
     if headers is None:
         headers = {}
 
+    # Accept a list of (name, value) pairs as well as a mapping
+    header_items = headers.items() if hasattr(headers, "items") else headers
+
     problems = []
 
     headers_seen = set()
 
-    for key, value in headers.items():
-        if key is None:
-            problems.append("'None' is not a valid header name.")
-            continue
-        if value is None:
-            problems.append("'None' is not a valid header value")
-            continue
-        if "\x00" in key:
-            problems.append(f"Null characters are not valid in header name {key}")
-            continue
-        if "\x00" in value:
-            problems.append(f"Null characters are not valid in header value {value}")
+    for key, value in header_items:
+        problem = _header_problem(key, value)
+        if problem is not None:
+            problems.append(problem)
             continue
 
         key_lower = key.lower()
         if key_lower.startswith("x-duo"):
             if key_lower in headers_seen:
-                problems.append(
-                    f"Duplicate x-duo headers are not supported, \
-                      {key_lower} is duplicated."
-                )
+                problems.append(_duplicate_problem(key_lower))
             else:
                 headers_seen.add(key_lower)
 
     if problems:
         problem_string = "\n".join(problems)
         raise ValueError(problem_string)
+
+
+def validate_and_extract_x_duo_headers(
+    headers: Union[Mapping[str, str], Iterable[Tuple[str, str]]]
+) -> List[Tuple[str, str]]:
+    """
+    Validate headers as validate_headers does, and in the same pass return
+    their x-duo headers other than x-duo-date as sorted (lowercase name,
+    value) pairs.  Duplicates are found by sorting rather than with a set.
+    """
+    header_items = headers.items() if hasattr(headers, "items") else headers
+
+    problems = []
+    x_duo_headers = []
+    x_duo_dates = 0
+
+    for key, value in header_items:
+        problem = _header_problem(key, value)
+        if problem is not None:
+            problems.append(problem)
+            continue
+
+        key_lower = key.lower()
+        if key_lower == "x-duo-date":
+            x_duo_dates += 1
+            if x_duo_dates == 2:
+                problems.append(_duplicate_problem(key_lower))
+        elif key_lower.startswith("x-duo"):
+            x_duo_headers.append((key_lower, value))
+
+    x_duo_headers.sort()
+    for index in range(1, len(x_duo_headers)):
+        key_lower = x_duo_headers[index][0]
+        if key_lower == x_duo_headers[index - 1][0]:
+            problems.append(_duplicate_problem(key_lower))
+
+    if problems:
+        problem_string = "\n".join(problems)
+        raise ValueError(problem_string)
+
+    return x_duo_headers
+
+
+def _header_problem(key: Optional[str], value: Optional[str]) -> Optional[str]:
+    if key is None:
+        return "'None' is not a valid header name."
+    if value is None:
+        return "'None' is not a valid header value"
+    if "\x00" in key:
+        return f"Null characters are not valid in header name {key}"
+    if "\x00" in value:
+        return f"Null characters are not valid in header value {value}"
+    return None
+
+
+def _duplicate_problem(key_lower: str) -> str:
+    return f"Duplicate x-duo headers are not supported, \
+                      {key_lower} is duplicated."
@@ -0,0 +1,157 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import base64
+import binascii
+import hashlib
+import hmac
+import re
+
+from typing import Any, Mapping, Optional, Sequence, Tuple, Union
+
+
+from . import duo_canonicalize, duo_hmac_utils
+
+# A hex HMAC-SHA512 digest, as DuoHmac sends it
+_SIGNATURE = re.compile(r"[0-9a-f]{128}")
+
+
+def parse_authorization_header(authorization: Optional[str]) -> Tuple[str, str]:
+    """
+    Split a 'Basic' Authorization header into the IKEY and the hex
+    digest of the request signature
+    """
+    if not authorization:
+        raise ValueError("Missing Authorization header")
+
+    scheme, _, encoded = authorization.partition(" ")
+    if scheme.lower() != "basic" or not encoded:
+        raise ValueError("Authorization header is not in the 'Basic' scheme")
+
+    try:
+        decoded = base64.b64decode(encoded.strip(), validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Authorization header is not valid base 64")
+
+    ikey, separator, signature = decoded.partition(":")
+    if not separator or not ikey or not signature:
+        raise ValueError("Authorization header is not in IKEY:signature form")
+    # compare_digest raises TypeError for non-ASCII strings, so anything
+    # that is not a hex digest is rejected here
+    if not _SIGNATURE.fullmatch(signature):
+        raise ValueError("Authorization header signature is not a hex digest")
+
+    return (ikey, signature)
+
+
+def get_header(headers: Optional[Mapping[str, Any]], header_name: str) -> Optional[str]:
+    """Case-insensitive header lookup that works for dicts and message objects"""
+    if headers is None:
+        return None
+
+    header_name = header_name.lower()
+    for key, value in headers.items():
+        if key.lower() == header_name:
+            return value
+    return None
+
+
+class DuoHmacVerifier:
+    """
+    Verify the Authorization header of requests signed with DuoHmac.
+
+    credentials maps each IKEY to its SKEY, or to a sequence of SKEYs (for
+    example the current and historical keys of a rotated integration); a
+    request is valid if it was signed with any of them.
+
+    The keyed HMAC state for each SKEY is built once and copied per request,
+    so a verifier can be shared between threads.
+    """
+
+    def __init__(self, credentials: Mapping[str, Union[str, Sequence[str]]]):
+        self._key_states = {
+            ikey: [
+                hmac.new(skey.encode("utf-8"), digestmod=hashlib.sha512)
+                for skey in ([skeys] if isinstance(skeys, str) else skeys)
+            ]
+            for (ikey, skeys) in credentials.items()
+        }
+        # Set to a duo_trace.CanonicalStringTrace to record what is verified
+        self.trace = None
+
+    def verify(
+        self,
+        http_method: str,
+        api_host: str,
+        api_path: str,
+        query_string: Optional[str],
+        body: Optional[Union[str, bytes]],
+        headers: Mapping[str, str],
+    ) -> str:
+        """
+        Check the signature of a received request and return the IKEY that
+        signed it.  Raises ValueError if the request is not correctly signed.
+        """
+        return self.verify_body_hash(
+            http_method,
+            api_host,
+            api_path,
+            query_string,
+            duo_canonicalize.canonicalize_body(body),
+            headers,
+        )
+
+    def verify_body_hash(
+        self,
+        http_method: str,
+        api_host: str,
+        api_path: str,
+        query_string: Optional[str],
+        body_hash: str,
+        headers: Mapping[str, str],
+    ) -> str:
+        """
+        verify, given the hex SHA-512 digest of the body instead of the body,
+        for callers that hash the body as it arrives
+        """
+        ikey, signature = parse_authorization_header(
+            get_header(headers, "Authorization")
+        )
+
+        key_states = self._key_states.get(ikey)
+        if not key_states:
+            raise ValueError(f"Unknown IKEY {ikey}")
+
+        # DuoHmac always sends x-duo-date; fall back to Date for other clients
+        date_string = get_header(headers, "x-duo-date") or get_header(headers, "Date")
+        if not date_string:
+            raise ValueError("Request has no x-duo-date or Date header")
+
+        canon_string = duo_canonicalize.assemble_canonical_string(
+            date_string,
+            http_method,
+            api_host,
+            api_path,
+            duo_canonicalize.canonicalize_parameters(
+                duo_hmac_utils.parse_query_string(query_string)
+            ),
+            body_hash,
+            duo_canonicalize.canonicalize_x_duo_headers(
+                duo_hmac_utils.extract_x_duo_headers(headers)
+            ),
+        )
+
+        canon_bytes = canon_string.encode("utf-8")
+        valid = False
+        for key_state in key_states:
+            sig_hmac = key_state.copy()
+            sig_hmac.update(canon_bytes)
+            if hmac.compare_digest(sig_hmac.hexdigest(), signature):
+                valid = True
+                break
+        if self.trace is not None:
+            self.trace.record(ikey, canon_string, "valid" if valid else "invalid")
+        if not valid:
+            raise ValueError(f"Invalid signature for IKEY {ikey}")
+
+        return ikey
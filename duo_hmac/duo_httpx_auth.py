@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+Sign requests made with httpx, from either Client or AsyncClient.
+Requires httpx, which is not a dependency of duo_hmac.
+
+    client = httpx.Client(auth=DuoHttpxAuth(duo))
+    client.get(f"https://{duo.api_host}/admin/v1/users", params={"limit": "100"})
+    client.post(
+        f"https://{duo.api_host}/admin/v1/users",
+        content=duo_hmac_utils.jsonize_parameters({"username": "someone"}),
+        headers={"Content-Type": "application/json"},
+    )
+"""
+
+from typing import Generator
+
+import httpx
+
+from . import duo_hmac
+
+
+class DuoHttpxAuth(httpx.Auth):
+    """
+    Sign each request in flight from its method, url, and body exactly as
+    httpx encoded them, so the body is never serialized a second time.
+    Signing does no I/O, so the same flow serves sync and async clients.
+
+    Supported bodies: none (parameters in the query string, via params=),
+    or a body passed as content= that is exactly what
+    duo_hmac_utils.jsonize_parameters produces, as Duo requires (see
+    DuoHmac.prepare_json_request).  The body that json= produces is not
+    in that form.
+    """
+
+    requires_request_body = True
+
+    def __init__(self, hmac: duo_hmac.DuoHmac):
+        self.hmac = hmac
+
+    def auth_flow(
+        self, request: httpx.Request
+    ) -> Generator[httpx.Request, httpx.Response, None]:
+        netloc = request.url.netloc.decode("ascii")
+        if netloc.lower() != self.hmac.api_host.lower():
+            raise ValueError(
+                f"Request host {netloc} does not match API host {self.hmac.api_host}"
+            )
+
+        # raw_path is the path and query string as they will be sent
+        api_path, _, query_string = request.url.raw_path.decode("ascii").partition("?")
+        prepared = self.hmac.prepare_raw_request(
+            request.method, api_path, query_string, request.content
+        )
+        prepared.sign_into(request.headers)
+        yield request
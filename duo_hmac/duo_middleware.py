@@ -0,0 +1,324 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+WSGI and ASGI middleware that verifies the Duo signature of every request
+before passing it on to the application.
+
+The body is hashed chunk by chunk as it is read, and the same chunks are
+handed on to the application, so a body is held in memory once.  On
+success the signing IKEY is stored in the WSGI environ or ASGI scope under
+"duo_hmac.ikey"; otherwise the client gets a Duo-style 401 response.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import json
+import tempfile
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+from . import duo_hmac_verify
+
+IKEY_KEY = "duo_hmac.ikey"
+
+DEFAULT_MAX_BODY_SIZE = 10 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+# Bodies larger than this are buffered on disk by the WSGI middleware
+DEFAULT_SPOOL_SIZE = 1024 * 1024
+
+# Chunks at least this large are hashed on a thread instead of the event
+# loop; hashlib releases the GIL while it hashes them
+DEFAULT_OFFLOAD_THRESHOLD = 64 * 1024
+
+Environ = Dict[str, Any]
+StartResponse = Callable[..., Any]
+WsgiApp = Callable[[Environ, StartResponse], Iterable[bytes]]
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+AsgiApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+def _failure(status: int, code: int, message: str) -> Tuple[int, bytes]:
+    content = {"stat": "FAIL", "code": code, "message": message}
+    return (status, json.dumps(content, separators=(",", ":")).encode("utf-8"))
+
+
+def _unauthorized(error: Exception) -> Tuple[int, bytes]:
+    return _failure(401, 40101, str(error))
+
+
+def _too_large() -> Tuple[int, bytes]:
+    return _failure(413, 41301, "Request body too large")
+
+
+def _bad_content_length() -> Tuple[int, bytes]:
+    return _failure(400, 40001, "Invalid Content-Length")
+
+
+_REASONS = {400: "Bad Request", 401: "Unauthorized", 413: "Payload Too Large"}
+
+
+def _signed_header(name: str) -> bool:
+    """Whether a lowercase header name takes part in verification"""
+    return name.startswith("x-duo") or name in ("authorization", "date")
+
+
+def _wsgi_headers(environ: Environ) -> Dict[str, str]:
+    headers = {}
+    for key, value in environ.items():
+        if key.startswith("HTTP_"):
+            name = key[5:].replace("_", "-").lower()
+            if _signed_header(name):
+                headers[name] = value
+    return headers
+
+
+def _wsgi_path(environ: Environ) -> str:
+    # PATH_INFO is percent-decoded, so prefer the raw request target when
+    # the server provides it
+    raw_uri = environ.get("RAW_URI") or environ.get("REQUEST_URI")
+    if raw_uri:
+        return raw_uri.partition("?")[0]
+    return environ.get("SCRIPT_NAME", "") + environ.get("PATH_INFO", "")
+
+
+def _wsgi_host(environ: Environ) -> str:
+    host = environ.get("HTTP_HOST")
+    if host:
+        return host
+    host = environ["SERVER_NAME"]
+    port = environ.get("SERVER_PORT")
+    default_port = "443" if environ.get("wsgi.url_scheme") == "https" else "80"
+    if port and port != default_port:
+        host += ":" + port
+    return host
+
+
+def _asgi_path(scope: Scope) -> str:
+    # As with WSGI, path is percent-decoded and raw_path is optional
+    raw_path = scope.get("raw_path")
+    if raw_path:
+        return raw_path.decode("latin-1").partition("?")[0]
+    return scope["path"]
+
+
+class DuoHmacWsgiMiddleware:
+    """
+    Verify requests to a WSGI application.  api_host is the host clients
+    sign for; by default it is taken from each request's Host header.
+    """
+
+    def __init__(
+        self,
+        app: WsgiApp,
+        verifier: duo_hmac_verify.DuoHmacVerifier,
+        api_host: Optional[str] = None,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+        spool_size: int = DEFAULT_SPOOL_SIZE,
+    ):
+        self.app = app
+        self.verifier = verifier
+        self.api_host = api_host
+        self.max_body_size = max_body_size
+        self.spool_size = spool_size
+
+    def __call__(
+        self, environ: Environ, start_response: StartResponse
+    ) -> Iterable[bytes]:
+        try:
+            content_length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            return self._respond(start_response, _bad_content_length())
+        if content_length > self.max_body_size:
+            return self._respond(start_response, _too_large())
+        # A chunked body has no length; read to the end of the input, but
+        # only one byte past the limit
+        chunked = not content_length and environ.get("wsgi.input_terminated")
+        remaining = self.max_body_size + 1 if chunked else content_length
+
+        body_hash = hashlib.sha512()
+        spool = None
+        if remaining:
+            stream = environ["wsgi.input"]
+            spool = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+            while remaining:
+                chunk = stream.read(min(remaining, READ_CHUNK_SIZE))
+                if not chunk:
+                    break
+                body_hash.update(chunk)
+                spool.write(chunk)
+                remaining -= len(chunk)
+            if spool.tell() > self.max_body_size:
+                spool.close()
+                return self._respond(start_response, _too_large())
+            spool.seek(0)
+            environ["wsgi.input"] = spool
+
+        try:
+            ikey = self.verifier.verify_body_hash(
+                environ.get("REQUEST_METHOD", "GET"),
+                self.api_host or _wsgi_host(environ),
+                _wsgi_path(environ),
+                environ.get("QUERY_STRING"),
+                body_hash.hexdigest(),
+                _wsgi_headers(environ),
+            )
+        except (TypeError, ValueError) as e:
+            if spool is not None:
+                spool.close()
+            return self._respond(start_response, _unauthorized(e))
+
+        environ[IKEY_KEY] = ikey
+        if spool is None:
+            return self.app(environ, start_response)
+        try:
+            return _ClosingIterable(self.app(environ, start_response), spool)
+        except BaseException:
+            spool.close()
+            raise
+
+    @staticmethod
+    def _respond(
+        start_response: StartResponse, response: Tuple[int, bytes]
+    ) -> List[bytes]:
+        status, payload = response
+        start_response(
+            f"{status} {_REASONS[status]}",
+            [
+                ("Content-Type", "application/json"),
+                ("Content-Length", str(len(payload))),
+            ],
+        )
+        return [payload]
+
+
+class _ClosingIterable:
+    """The application's response, closing the spooled body along with it"""
+
+    def __init__(self, iterable: Iterable[bytes], spool: Any):
+        self._iterable = iterable
+        self._spool = spool
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._iterable, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._spool.close()
+
+
+class DuoHmacAsgiMiddleware:
+    """
+    Verify HTTP requests to an ASGI application; other scopes (lifespan,
+    websocket) pass straight through.  api_host is the host clients sign
+    for; by default it is taken from each request's Host header.
+
+    Body chunks of at least offload_threshold bytes are hashed on executor
+    (the event loop's default executor if None), so a large upload does not
+    stall other requests.
+    """
+
+    def __init__(
+        self,
+        app: AsgiApp,
+        verifier: duo_hmac_verify.DuoHmacVerifier,
+        api_host: Optional[str] = None,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+        offload_threshold: int = DEFAULT_OFFLOAD_THRESHOLD,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ):
+        self.app = app
+        self.verifier = verifier
+        self.api_host = api_host
+        self.max_body_size = max_body_size
+        self.offload_threshold = offload_threshold
+        self.executor = executor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {}
+        host = self.api_host
+        for raw_name, raw_value in scope.get("headers", ()):
+            name = raw_name.decode("latin-1").lower()
+            if _signed_header(name):
+                headers[name] = raw_value.decode("latin-1")
+            elif name == "host" and host is None:
+                host = raw_value.decode("latin-1")
+        if host is None:
+            server = scope.get("server") or ("", None)
+            host = server[0] if server[1] is None else f"{server[0]}:{server[1]}"
+
+        # The messages are kept as received and replayed to the application,
+        # so each body chunk is held once
+        received: collections.deque = collections.deque()
+        body_hash = hashlib.sha512()
+        body_size = 0
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                # The client went away; let the application see it
+                received.append(message)
+                break
+            chunk = message.get("body", b"")
+            body_size += len(chunk)
+            if body_size > self.max_body_size:
+                await self._respond(send, _too_large())
+                return
+            if len(chunk) >= self.offload_threshold:
+                await loop.run_in_executor(self.executor, body_hash.update, chunk)
+            elif chunk:
+                body_hash.update(chunk)
+            received.append(message)
+            if not message.get("more_body", False):
+                break
+
+        try:
+            ikey = self.verifier.verify_body_hash(
+                scope["method"],
+                host,
+                _asgi_path(scope),
+                scope.get("query_string", b"").decode("latin-1"),
+                body_hash.hexdigest(),
+                headers,
+            )
+        except (TypeError, ValueError) as e:
+            await self._respond(send, _unauthorized(e))
+            return
+
+        async def replay() -> Dict[str, Any]:
+            if received:
+                return received.popleft()
+            return await receive()
+
+        await self.app(dict(scope, **{IKEY_KEY: ikey}), replay, send)
+
+    @staticmethod
+    async def _respond(send: Send, response: Tuple[int, bytes]) -> None:
+        status, payload = response
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(payload)).encode("latin-1")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": payload})
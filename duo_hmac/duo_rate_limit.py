@@ -0,0 +1,217 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import random
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+from . import duo_hmac
+
+# send(http_method, uri, body, headers) -> (status, response)
+Send = Callable[[str, str, Optional[str], Dict[str, str]], Tuple[int, Any]]
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+TOO_MANY_REQUESTS = 429
+_EPSILON = 1e-9
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket that refills at rate tokens per second, up
+    to burst tokens.  clock and sleep can be replaced for testing.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate / 10, 1.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(now - max(self._updated, self._paused_until), 0.0)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = max(now, self._updated)
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available and return 0, or return how many
+        seconds to wait before trying again
+        """
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            # Allow for rounding, or a wait could be too short to move the clock
+            if self._tokens >= 1 - _EPSILON:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        """Block until a token is available, and take it"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            self._sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens, and accrue none, for the next seconds"""
+        with self._lock:
+            self._pause(seconds)
+
+    def _pause(self, seconds: float) -> None:
+        now = self._clock()
+        self._refill(now)
+        self._paused_until = max(self._paused_until, now + seconds)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    A token bucket whose rate follows the server: each 429 halves the rate
+    and pauses dispatch for a jittered backoff, and each success raises the
+    rate by about additive_increase requests per second, per second.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        min_rate: float = 0.1,
+        max_rate: Optional[float] = None,
+        additive_increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        jitter: Optional[random.Random] = None,
+    ):
+        super().__init__(rate, burst, clock, sleep)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.additive_increase = additive_increase
+        self.decrease_factor = decrease_factor
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._jitter = jitter if jitter is not None else random.Random()
+        self._consecutive_throttles = 0
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self._consecutive_throttles = 0
+            increase = self.additive_increase / self.rate
+            self.rate = min(self.max_rate, self.rate + increase)
+
+    def throttled(self) -> float:
+        """Slow down after a 429, and return the backoff chosen"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            # "Full jitter": a uniformly random wait up to an exponential cap
+            ceiling = min(
+                self.backoff_cap, self.backoff_base * 2**self._consecutive_throttles
+            )
+            self._consecutive_throttles += 1
+            backoff = self._jitter.uniform(0, ceiling)
+            self._pause(backoff)
+            # Tokens saved up before the 429 are not trusted either
+            self._tokens = 0.0
+        return backoff
+
+
+class RateLimitedScheduler:
+    """
+    Dispatch requests through a send callable, paced by an adaptive token
+    bucket per (api_host, ikey).  Requests are prepared once and signed
+    only when a token is granted, so each attempt carries a fresh
+    x-duo-date, and no request is signed while its bucket is backing off.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        max_attempts: int = 5,
+        bucket_factory: Optional[Callable[[float], AdaptiveTokenBucket]] = None,
+    ):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.rate = rate
+        self.max_attempts = max_attempts
+        self._bucket_factory = bucket_factory or AdaptiveTokenBucket
+        self._buckets: Dict[Tuple[str, str], AdaptiveTokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, hmac: duo_hmac.DuoHmac) -> AdaptiveTokenBucket:
+        key = (hmac.api_host.lower(), hmac.ikey)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(key, self._bucket_factory(self.rate))
+        return bucket
+
+    def call(
+        self,
+        hmac: duo_hmac.DuoHmac,
+        http_method: str,
+        api_path: str,
+        parameters: Optional[Dict[str, Any]],
+        send: Send,
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Any]:
+        """
+        Send one request, retrying 429 responses up to max_attempts in
+        total.  Returns the final (status, response) from send.
+        """
+        prepared = hmac.prepare_request(http_method, api_path, parameters, in_headers)
+        bucket = self.bucket_for(hmac)
+
+        for _ in range(self.max_attempts):
+            bucket.acquire()
+            uri, body, headers = prepared.sign()
+            status, response = send(http_method, uri, body, headers)
+            if status != TOO_MANY_REQUESTS:
+                bucket.succeeded()
+                break
+            bucket.throttled()
+
+        return (status, response)
+
+    def map(
+        self,
+        hmac: duo_hmac.DuoHmac,
+        requests: Iterable[Request],
+        send: Send,
+        max_workers: int = 8,
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> List[Tuple[int, Any]]:
+        """
+        Send (http_method, api_path, parameters) requests from max_workers
+        threads, and return their results in order.  send must be safe to
+        call from several threads.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(
+                    lambda request: self.call(hmac, *request, send, in_headers),
+                    requests,
+                )
+            )
@@ -0,0 +1,56 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+Sign requests made with the requests library.  Requires requests, which
+is not a dependency of duo_hmac.
+
+    session = requests.Session()
+    session.auth = DuoRequestsAuth(duo)
+    session.get(f"https://{duo.api_host}/admin/v1/users", params={"limit": "100"})
+    session.post(
+        f"https://{duo.api_host}/admin/v1/users",
+        data=duo_hmac_utils.jsonize_parameters({"username": "someone"}),
+        headers={"Content-Type": "application/json"},
+    )
+"""
+
+import urllib.parse
+
+import requests
+
+from . import duo_hmac
+
+
+class DuoRequestsAuth(requests.auth.AuthBase):
+    """
+    Sign each request in flight from its method, url, and body exactly as
+    requests prepared them, so the body is never serialized a second time.
+    Works with pooled Sessions; one instance can be shared between threads.
+
+    Supported bodies: none (parameters in the query string, via params=),
+    or a str or bytes body passed as data= that is exactly what
+    duo_hmac_utils.jsonize_parameters produces, as Duo requires (see
+    DuoHmac.prepare_json_request).  The body that json= produces is not
+    in that form, and streamed bodies cannot be signed.
+    """
+
+    def __init__(self, hmac: duo_hmac.DuoHmac):
+        self.hmac = hmac
+
+    def __call__(self, request: requests.PreparedRequest) -> requests.PreparedRequest:
+        url = urllib.parse.urlsplit(request.url)
+        if url.netloc.lower() != self.hmac.api_host.lower():
+            raise ValueError(
+                f"Request host {url.netloc} does not match API host {self.hmac.api_host}"
+            )
+
+        body = request.body
+        if body is not None and not isinstance(body, (str, bytes)):
+            raise ValueError("Streamed request bodies cannot be signed")
+
+        prepared = self.hmac.prepare_raw_request(
+            request.method, url.path, url.query, body
+        )
+        prepared.sign_into(request.headers)
+        return request
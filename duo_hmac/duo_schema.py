@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import json
+
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+from . import duo_hmac_utils
+
+# The encoder json.dumps(..., sort_keys=True, separators=(",", ":")) would
+# construct on every call, as used by jsonize_parameters
+_JSON_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+
+
+class ParameterSchema:
+    """
+    A request that is always sent with the same parameter names, compiled
+    once: the names are encoded, quoted, sorted, and (for JSON bodies)
+    serialized up front, so each request only encodes its values.
+
+    Sign a request from a sequence of values, in the order of keys, with
+    DuoHmac.prepare_schema_request or DuoHmac.get_schema_components.  The
+    results are identical to passing dict(zip(keys, values)) to
+    get_authentication_components.
+    """
+
+    def __init__(self, http_method: str, api_path: str, keys: Sequence[str]):
+        if len(set(keys)) != len(keys):
+            raise ValueError("Parameter schema keys must be unique")
+        if not all(isinstance(key, str) for key in keys):
+            raise ValueError("Parameter schema keys must be strings")
+
+        self.http_method = http_method
+        self.api_path = api_path
+        self.keys = tuple(keys)
+        self.params_go_in_body = http_method.upper() in ("POST", "PUT", "PATCH")
+
+        if self.params_go_in_body:
+            # Members of the JSON object in sorted key order, as
+            # (index into values, '"key":')
+            self._json_members = [
+                (index, f"{_JSON_ENCODER.encode(key)}:")
+                for (index, key) in sorted(enumerate(keys), key=lambda item: item[1])
+            ]
+        else:
+            quoted_keys = [duo_hmac_utils.quote_values(key)[0] for key in keys]
+            self._query_prefixes = [f"{quoted_key}=" for quoted_key in quoted_keys]
+            # Canonical order sorts by quoted key
+            self._canon_order = sorted(
+                range(len(keys)), key=lambda index: quoted_keys[index]
+            )
+
+    def encode(self, values: Sequence[Any]) -> Tuple[str, str, Optional[str]]:
+        """Return the query string, canonical parameters, and body for values"""
+        if len(values) != len(self.keys):
+            raise ValueError(
+                f"Expected {len(self.keys)} parameter values, got {len(values)}"
+            )
+
+        if self.params_go_in_body:
+            body = ",".join(
+                f"{member}{_JSON_ENCODER.encode(values[index])}"
+                for (index, member) in self._json_members
+            )
+            return ("", "", f"{{{body}}}")
+
+        quoted_values = [duo_hmac_utils.quote_values(value) for value in values]
+
+        args: List[str] = []
+        for index in self._canon_order:
+            prefix = self._query_prefixes[index]
+            args.extend(map(prefix.__add__, sorted(quoted_values[index])))
+        canon_parameters = "&".join(args)
+
+        query_string = "&".join(
+            f"{prefix}{quoted_value}"
+            for (prefix, quoted) in zip(self._query_prefixes, quoted_values)
+            for quoted_value in quoted
+        )
+        return (query_string.replace("%20", "+"), canon_parameters, None)
@@ -0,0 +1,444 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+A long-lived signing daemon that holds Duo API credentials, and a client
+for it.  Worker processes ask the daemon to sign requests over a Unix
+socket instead of each holding every SKEY.
+
+    python -m duo_hmac.duo_sign_daemon --socket /run/duo-sign.sock \\
+        --keys /etc/duo/sign-keys.json
+
+The keys file maps each IKEY to its SKEY and API host:
+
+    {"IKEY": {"skey": "SKEY", "api_host": "api-xxxxxxxx.duosecurity.com"}}
+
+Wire protocol: each frame is a 4-byte payload length and a 4-byte request
+id (both big-endian unsigned), followed by a UTF-8 JSON payload.  A request
+payload is {"sign": [[ikey, method, path, parameters, headers], ...]} or
+{"stats": true}.  The daemon answers every frame, in order, with a frame
+carrying the same request id whose payload is a list of
+[uri, body, headers] results ({"error": message} for requests that could
+not be signed) or the stats object.  Clients may pipeline frames.
+"""
+
+import argparse
+import collections
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+
+from . import duo_hmac
+
+FRAME_HEADER = struct.Struct("!II")
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+SignRequest = Tuple[str, str, str, Optional[Dict[str, Any]], Optional[Dict[str, str]]]
+SignResult = Tuple[str, Optional[str], Dict[str, str]]
+
+
+def _encode_payload(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_frame(request_id: int, payload: Any) -> bytes:
+    data = _encode_payload(payload)
+    return FRAME_HEADER.pack(len(data), request_id) + data
+
+
+def _read_exactly(stream, length: int) -> Optional[bytes]:
+    data = stream.read(length)
+    if len(data) < length:
+        return None
+    return data
+
+
+def _read_frame(stream) -> Optional[Tuple[int, Any]]:
+    """Read one frame, or return None if the connection closed"""
+    header = _read_exactly(stream, FRAME_HEADER.size)
+    if header is None:
+        return None
+    length, request_id = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {length} bytes is larger than {MAX_FRAME_SIZE}")
+    data = _read_exactly(stream, length)
+    if data is None:
+        return None
+    return (request_id, json.loads(data))
+
+
+class SigningStats:
+    """Throughput and latency counters for the daemon"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.signatures = 0
+        self.batches = 0
+        self.errors = 0
+        self.batch_seconds = 0.0
+        self.max_batch_seconds = 0.0
+
+    def record_batch(self, signatures: int, errors: int, seconds: float) -> None:
+        # Counted once per batch, so the lock is not taken per signature
+        with self._lock:
+            self.signatures += signatures
+            self.errors += errors
+            self.batches += 1
+            self.batch_seconds += seconds
+            self.max_batch_seconds = max(self.max_batch_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            uptime = time.monotonic() - self.started
+            return {
+                "uptime_seconds": uptime,
+                "signatures": self.signatures,
+                "errors": self.errors,
+                "batches": self.batches,
+                "signatures_per_second": self.signatures / uptime if uptime else 0.0,
+                "mean_signature_microseconds": (
+                    self.batch_seconds / self.signatures * 1_000_000
+                    if self.signatures
+                    else 0.0
+                ),
+                "mean_batch_microseconds": (
+                    self.batch_seconds / self.batches * 1_000_000
+                    if self.batches
+                    else 0.0
+                ),
+                "max_batch_microseconds": self.max_batch_seconds * 1_000_000,
+            }
+
+
+class _SigningRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server
+        while True:
+            try:
+                frame = _read_frame(self.rfile)
+            except ValueError:
+                return
+            if frame is None:
+                return
+            request_id, payload = frame
+
+            if isinstance(payload, dict) and payload.get("stats"):
+                response = daemon.stats.snapshot()
+            else:
+                sign_requests = None
+                if isinstance(payload, dict):
+                    sign_requests = payload.get("sign", [])
+                if isinstance(sign_requests, list):
+                    response = daemon.sign_batch(sign_requests)
+                else:
+                    response = [{"error": "ValueError: sign must be a list"}]
+
+            self.wfile.write(_encode_frame(request_id, response))
+            self.wfile.flush()
+
+
+class SigningDaemon(socketserver.ThreadingUnixStreamServer):
+    """
+    Serve sign requests on a Unix socket, one thread per connection.  The
+    socket is only accessible to the daemon's user (mode 0600).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, signers: Dict[str, duo_hmac.DuoHmac]):
+        self.signers = signers
+        self.stats = SigningStats()
+        # Replace a stale socket from an earlier run, but nothing else
+        if os.path.lexists(socket_path):
+            if not _is_socket(socket_path):
+                raise ValueError(f"{socket_path} exists and is not a socket")
+            os.unlink(socket_path)
+        super().__init__(socket_path, _SigningRequestHandler)
+
+    def server_bind(self) -> None:
+        # Bind in a private directory and move the socket into place once it
+        # is private, so it is never reachable with the default mode.
+        # os.umask would also apply to files other threads create meanwhile.
+        socket_path = self.server_address
+        directory = tempfile.mkdtemp(
+            dir=os.path.dirname(os.path.abspath(socket_path))
+        )
+        private_path = os.path.join(directory, "sock")
+        try:
+            self.socket.bind(private_path)
+            os.chmod(private_path, 0o600)
+            os.rename(private_path, socket_path)
+        finally:
+            if os.path.lexists(private_path):
+                os.unlink(private_path)
+            os.rmdir(directory)
+
+    def sign_batch(self, sign_requests: Sequence[Any]) -> List[Any]:
+        start = time.perf_counter()
+        results: List[Any] = []
+        errors = 0
+        for sign_request in sign_requests:
+            try:
+                _check_sign_request(sign_request)
+                ikey, http_method, api_path, parameters, in_headers = sign_request
+                signer = self.signers.get(ikey)
+                if signer is None:
+                    raise ValueError(f"Unknown IKEY {ikey}")
+                results.append(
+                    signer.get_authentication_components(
+                        http_method, api_path, parameters, in_headers
+                    )
+                )
+            except Exception as e:
+                # One bad request must not cost the connection, and with it
+                # every batch the client has in flight
+                errors += 1
+                results.append({"error": f"{type(e).__name__}: {e}"})
+        self.stats.record_batch(len(results), errors, time.perf_counter() - start)
+        return results
+
+    def server_close(self) -> None:
+        super().server_close()
+        if _is_socket(self.server_address):
+            os.unlink(self.server_address)
+
+
+def _is_socket(path: str) -> bool:
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def _check_sign_request(sign_request: Any) -> None:
+    """Raise ValueError unless sign_request has the shape of a SignRequest"""
+    if not isinstance(sign_request, list) or len(sign_request) != 5:
+        raise ValueError("A sign request must be a list of 5 items")
+    ikey, http_method, api_path, parameters, in_headers = sign_request
+    if not all(isinstance(item, str) for item in (ikey, http_method, api_path)):
+        raise ValueError("IKEY, method, and path must be strings")
+    if parameters is not None and not isinstance(parameters, dict):
+        raise ValueError("Parameters must be an object or null")
+    if in_headers is not None and not isinstance(in_headers, dict):
+        raise ValueError("Headers must be an object or null")
+
+
+class DuoSignClient:
+    """
+    Client for a SigningDaemon.  Holds one connection; calls from several
+    threads are serialized.  After a fork, create a new client in the child.
+    If an exchange with the daemon fails part way, the connection is closed
+    and later calls raise ConnectionError; create a new client to go on.
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(socket_path)
+        self._rfile = self._socket.makefile("rb")
+        self._lock = threading.Lock()
+        self._next_request_id = 0
+        self._closed = False
+
+    def close(self) -> None:
+        self._closed = True
+        self._rfile.close()
+        self._socket.close()
+
+    def __enter__(self) -> "DuoSignClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def sign(
+        self,
+        ikey: str,
+        http_method: str,
+        api_path: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        in_headers: Optional[Dict[str, str]] = None,
+    ) -> SignResult:
+        """Sign one request, with the same results as get_authentication_components"""
+        sign_request = (ikey, http_method, api_path, parameters, in_headers)
+        result = self.sign_batch([sign_request])[0]
+        if isinstance(result, ValueError):
+            raise result
+        return result
+
+    def sign_batch(
+        self, sign_requests: Sequence[SignRequest]
+    ) -> List[Union[SignResult, ValueError]]:
+        """
+        Sign several requests in one round trip.  Requests that could not be
+        signed have a ValueError in their place.
+        """
+        return self.sign_many(sign_requests, batch_size=max(len(sign_requests), 1))
+
+    def sign_many(
+        self,
+        sign_requests: Iterable[SignRequest],
+        batch_size: int = 64,
+        window: int = 8,
+    ) -> List[Union[SignResult, ValueError]]:
+        """
+        Sign any number of requests, sent in batches of batch_size with up
+        to window batches in flight at once
+        """
+        # Serialize every batch before sending any, so requests that cannot
+        # be sent fail the call without leaving responses on the connection
+        payloads: List[bytes] = []
+        batch: List[SignRequest] = []
+        for sign_request in sign_requests:
+            batch.append(sign_request)
+            if len(batch) >= batch_size:
+                payloads.append(_encode_payload({"sign": batch}))
+                batch = []
+        if batch:
+            payloads.append(_encode_payload({"sign": batch}))
+
+        results: List[Union[SignResult, ValueError]] = []
+        with self._lock:
+            self._check_open()
+            try:
+                in_flight: Deque[int] = collections.deque()
+                for payload in payloads:
+                    if len(in_flight) >= window:
+                        results.extend(self._receive(in_flight.popleft()))
+                    in_flight.append(self._send(payload))
+                while in_flight:
+                    results.extend(self._receive(in_flight.popleft()))
+            except BaseException:
+                # Responses may still be in flight, and would be taken as the
+                # answers to the next call
+                self.close()
+                raise
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        """Return the daemon's throughput and latency counters"""
+        payload = _encode_payload({"stats": True})
+        with self._lock:
+            self._check_open()
+            try:
+                return self._receive_payload(self._send(payload))
+            except BaseException:
+                self.close()
+                raise
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise ConnectionError("The connection to the signing daemon is closed")
+
+    def _send(self, payload: bytes) -> int:
+        """Send an encoded payload and return its request id"""
+        self._next_request_id = (self._next_request_id + 1) & 0xFFFFFFFF
+        header = FRAME_HEADER.pack(len(payload), self._next_request_id)
+        self._socket.sendall(header + payload)
+        return self._next_request_id
+
+    def _receive_payload(self, request_id: int) -> Any:
+        frame = _read_frame(self._rfile)
+        if frame is None:
+            raise ConnectionError("Signing daemon closed the connection")
+        if frame[0] != request_id:
+            raise ConnectionError(
+                f"Expected the response to request {request_id}, got {frame[0]}"
+            )
+        return frame[1]
+
+    def _receive(self, request_id: int) -> List[Union[SignResult, ValueError]]:
+        return [
+            ValueError(result["error"]) if isinstance(result, dict) else tuple(result)
+            for result in self._receive_payload(request_id)
+        ]
+
+
+def _read_keys(path: str) -> List[Tuple[str, str, str]]:
+    """Read (IKEY, SKEY, API_HOST) credentials from a keys file, or stdin for -"""
+    if path == "-":
+        keys = json.load(sys.stdin)
+    else:
+        with open(path) as keys_file:
+            keys = json.load(keys_file)
+    return [(ikey, key["skey"], key["api_host"]) for (ikey, key) in keys.items()]
+
+
+def _parse_credential(value: str) -> Tuple[str, str, str]:
+    parts = value.split(":", 2)
+    if len(parts) != 3 or not all(parts):
+        raise argparse.ArgumentTypeError(
+            "credentials must be given as IKEY:SKEY:API_HOST"
+        )
+    return (parts[0], parts[1], parts[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m duo_hmac.duo_sign_daemon",
+        description="Sign Duo API requests for other processes over a Unix socket",
+    )
+    parser.add_argument("--socket", required=True, help="Path of the Unix socket")
+    parser.add_argument(
+        "--keys",
+        help="""JSON file mapping each IKEY to its skey and api_host, or - to
+                read it from stdin""",
+    )
+    parser.add_argument(
+        "--credential",
+        action="append",
+        default=[],
+        type=_parse_credential,
+        help="""IKEY:SKEY:API_HOST to sign for; may be repeated.  Other local
+                users can read command lines, so prefer --keys.""",
+    )
+    parser.add_argument(
+        "--report-interval",
+        default=0.0,
+        type=float,
+        help="Print throughput and latency every this many seconds",
+    )
+    args = parser.parse_args()
+
+    credentials = _read_keys(args.keys) if args.keys else []
+    credentials.extend(args.credential)
+    if not credentials:
+        parser.error("give the keys to sign with in --keys or --credential")
+
+    signers = {
+        ikey: duo_hmac.DuoHmac(ikey, skey, api_host)
+        for (ikey, skey, api_host) in credentials
+    }
+    server = SigningDaemon(args.socket, signers)
+
+    if args.report_interval:
+
+        def report():
+            while True:
+                time.sleep(args.report_interval)
+                print(json.dumps(server.stats.snapshot()), flush=True)
+
+        threading.Thread(target=report, daemon=True).start()
+
+    print(f"Signing for {len(signers)} IKEY(s) on {args.socket}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
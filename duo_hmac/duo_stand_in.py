@@ -0,0 +1,422 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+A local stand-in for the Duo APIs, for offline and load testing of code
+built on duo_hmac.  Every request has its Authorization header checked
+against the configured IKEY/SKEY pairs.
+
+    python -m duo_hmac.duo_stand_in --credential IKEY:SKEY --port 8080
+"""
+
+import argparse
+import asyncio
+import email.utils
+import http.server
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+from . import duo_hmac_verify, duo_rate_limit
+
+DEFAULT_LIST_SIZE = 1000
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 300
+
+# Paged list endpoints: path -> (id field, id prefix, name field)
+LIST_ENDPOINTS = {
+    "/admin/v1/users": ("user_id", "DU", "username"),
+    "/admin/v1/groups": ("group_id", "DG", "name"),
+    "/admin/v1/phones": ("phone_id", "DP", "name"),
+    "/admin/v1/integrations": ("integration_key", "DI", "name"),
+}
+
+SETTINGS = {
+    "caller_id": "+15555555555",
+    "fraud_email": "",
+    "inactive_user_expiration": 0,
+    "lockout_threshold": 10,
+    "name": "Duo stand-in",
+    "sms_batch": 1,
+    "sms_expiration": 0,
+    "sms_refresh": 0,
+    "telephony_warning_min": 0,
+    "timezone": "UTC",
+    "user_telephony_cost_max": 20,
+}
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class StandInApi:
+    """
+    Route and answer requests the way the Duo APIs would, independent of
+    the server that receives them.
+    """
+
+    def __init__(
+        self,
+        credentials: Dict[str, str],
+        fail_401_rate: float = 0.0,
+        fail_429_rate: float = 0.0,
+        latency: float = 0.0,
+        list_size: int = DEFAULT_LIST_SIZE,
+        seed: Optional[int] = None,
+        rate_limit: float = 0.0,
+    ):
+        self.verifier = duo_hmac_verify.DuoHmacVerifier(credentials)
+        self.fail_401_rate = fail_401_rate
+        self.fail_429_rate = fail_429_rate
+        # Answer 429 to requests above rate_limit per second, as Duo would
+        self.rate_limiter = None
+        if rate_limit:
+            self.rate_limiter = duo_rate_limit.TokenBucket(rate_limit)
+        self.latency = latency
+        self.list_size = list_size
+        self._random = random.Random(seed)
+
+    def handle(
+        self,
+        http_method: str,
+        target: str,
+        headers: Mapping[str, str],
+        body: Optional[bytes],
+    ) -> Response:
+        """Answer one request with (status, headers, body)"""
+        api_path, _, query_string = target.partition("?")
+
+        if self.fail_429_rate and self._random.random() < self.fail_429_rate:
+            return _failure(429, 42901, "Too Many Requests")
+        if self.rate_limiter is not None and self.rate_limiter.try_acquire():
+            return _failure(429, 42901, "Too Many Requests")
+        if self.fail_401_rate and self._random.random() < self.fail_401_rate:
+            return _failure(401, 40101, "Invalid signature in request credentials")
+
+        try:
+            self.verifier.verify(
+                http_method,
+                duo_hmac_verify.get_header(headers, "Host") or "",
+                api_path,
+                query_string,
+                body,
+                headers,
+            )
+        except ValueError:
+            return _failure(401, 40101, "Invalid signature in request credentials")
+
+        if api_path == "/auth/v2/check":
+            return _success({"time": int(time.time())})
+        if api_path == "/admin/v1/settings":
+            return _success(SETTINGS)
+        if api_path in LIST_ENDPOINTS:
+            return self._list_page(api_path, http_method, query_string)
+        return _failure(404, 40401, "Resource not found")
+
+    def _list_page(self, api_path: str, http_method: str, query_string: str) -> Response:
+        if http_method.upper() != "GET":
+            return _failure(405, 40501, "Method not allowed")
+
+        parameters = urllib.parse.parse_qs(query_string)
+        try:
+            limit = int(parameters.get("limit", [DEFAULT_PAGE_LIMIT])[0])
+            offset = int(parameters.get("offset", [0])[0])
+        except ValueError:
+            return _failure(400, 40002, "Invalid request parameters")
+        if limit < 1 or offset < 0:
+            return _failure(400, 40002, "Invalid request parameters")
+        limit = min(limit, MAX_PAGE_LIMIT)
+
+        id_field, id_prefix, name_field = LIST_ENDPOINTS[api_path]
+        end = min(offset + limit, self.list_size)
+        objects = [
+            {id_field: f"{id_prefix}{index:018d}", name_field: f"{name_field}{index}"}
+            for index in range(offset, end)
+        ]
+
+        metadata: Dict[str, Any] = {"total_objects": self.list_size}
+        if end < self.list_size:
+            metadata["next_offset"] = end
+        if offset > 0:
+            metadata["prev_offset"] = max(offset - limit, 0)
+
+        return _success(objects, metadata)
+
+
+def _success(response: Any, metadata: Optional[Dict[str, Any]] = None) -> Response:
+    content: Dict[str, Any] = {"stat": "OK", "response": response}
+    if metadata is not None:
+        content["metadata"] = metadata
+    return _json_response(200, content)
+
+
+def _failure(status: int, code: int, message: str) -> Response:
+    return _json_response(status, {"stat": "FAIL", "code": code, "message": message})
+
+
+def _json_response(status: int, content: Dict[str, Any]) -> Response:
+    payload = json.dumps(content, separators=(",", ":")).encode("utf-8")
+    return (status, {"Content-Type": "application/json"}, payload)
+
+
+def _content_length(value: Optional[str]) -> Optional[int]:
+    """The body length a Content-Length header gives, or None if it is invalid"""
+    if not value:
+        return 0
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+def _bad_content_length() -> Response:
+    # Without a length the next request cannot be found, so the connection
+    # is closed after answering
+    status, headers, payload = _failure(400, 40001, "Invalid Content-Length")
+    headers["Connection"] = "close"
+    return (status, headers, payload)
+
+
+class _StandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    # Keep connections open so pooled clients are not measuring reconnects,
+    # and send headers and body without waiting on delayed acknowledgements
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _dispatch(self):
+        length = _content_length(self.headers.get("Content-Length"))
+        if length is None:
+            status, headers, payload = _bad_content_length()
+        else:
+            body = self.rfile.read(length) if length else None
+
+            api = self.server.api
+            if api.latency:
+                time.sleep(api.latency)
+            status, headers, payload = api.handle(
+                self.command, self.path, self.headers, body
+            )
+
+        self.send_response(status)
+        for header_name, header_value in headers.items():
+            self.send_header(header_name, header_value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ThreadedStandInServer(http.server.ThreadingHTTPServer):
+    """A thread-per-connection server around a StandInApi"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self, address: Tuple[str, int], api: StandInApi, verbose: bool = False
+    ):
+        self.api = api
+        self.verbose = verbose
+        super().__init__(address, _StandInRequestHandler)
+
+    @property
+    def api_host(self) -> str:
+        """The host:port value to give DuoHmac as its api_host"""
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+
+def start_threaded_server(
+    api: StandInApi, host: str = "127.0.0.1", port: int = 0
+) -> ThreadedStandInServer:
+    """Start serving in a background thread; call shutdown() when finished"""
+    server = ThreadedStandInServer((host, port), api)
+    # Poll often so shutdown() returns quickly
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    return server
+
+
+async def _handle_connection(
+    api: StandInApi, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            http_method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                header_name, _, header_value = line.decode("latin-1").partition(":")
+                headers[header_name.strip()] = header_value.strip()
+
+            length = _content_length(
+                duo_hmac_verify.get_header(headers, "Content-Length")
+            )
+            if length is None:
+                status, out_headers, payload = _bad_content_length()
+            else:
+                body = await reader.readexactly(length) if length else None
+
+                if api.latency:
+                    await asyncio.sleep(api.latency)
+                status, out_headers, payload = api.handle(
+                    http_method, target, headers, body
+                )
+
+            out_headers = dict(out_headers)
+            out_headers["Date"] = email.utils.formatdate(usegmt=True)
+            out_headers["Content-Length"] = str(len(payload))
+            lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+            lines.extend(f"{key}: {value}" for (key, value) in out_headers.items())
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+            await writer.drain()
+
+            connection = duo_hmac_verify.get_header(headers, "Connection") or ""
+            if length is None or connection.lower() == "close":
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _start_server(api: StandInApi, host: str, port: int) -> asyncio.AbstractServer:
+    return await asyncio.start_server(
+        lambda reader, writer: _handle_connection(api, reader, writer),
+        host,
+        port,
+        backlog=1024,
+    )
+
+
+async def serve_asyncio(api: StandInApi, host: str, port: int) -> None:
+    """Serve on a single event loop until cancelled"""
+    server = await _start_server(api, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+class AsyncioStandInServer:
+    """
+    The asyncio server around a StandInApi, on an event loop in a background
+    thread, with the same shutdown() and server_close() as the threaded one
+    """
+
+    def __init__(self, api: StandInApi, host: str = "127.0.0.1", port: int = 0):
+        self.api = api
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(_start_server(api, host, port))
+        self.server_address = self._server.sockets[0].getsockname()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def api_host(self) -> str:
+        """The host:port value to give DuoHmac as its api_host"""
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def shutdown(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def server_close(self) -> None:
+        self._loop.close()
+
+    async def _stop(self) -> None:
+        # Stop listening, and end the connections still being served
+        self._server.close()
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def start_asyncio_server(
+    api: StandInApi, host: str = "127.0.0.1", port: int = 0
+) -> AsyncioStandInServer:
+    """Start serving on a background event loop; call shutdown() when finished"""
+    return AsyncioStandInServer(api, host, port)
+
+
+def _parse_credential(value: str) -> Tuple[str, str]:
+    ikey, separator, skey = value.partition(":")
+    if not separator or not ikey or not skey:
+        raise argparse.ArgumentTypeError("credentials must be given as IKEY:SKEY")
+    return (ikey, skey)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m duo_hmac.duo_stand_in",
+        description="Local stand-in for the Duo APIs that verifies HMAC signatures",
+    )
+    parser.add_argument(
+        "--credential",
+        action="append",
+        required=True,
+        type=_parse_credential,
+        help="IKEY:SKEY pair to accept; may be repeated",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8080, type=int)
+    parser.add_argument("--mode", choices=["threaded", "asyncio"], default="threaded")
+    parser.add_argument(
+        "--fail-401-rate", default=0.0, type=float, help="Fraction of 401s to inject"
+    )
+    parser.add_argument(
+        "--fail-429-rate", default=0.0, type=float, help="Fraction of 429s to inject"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        default=0.0,
+        type=float,
+        help="Answer 429 to requests above this many per second",
+    )
+    parser.add_argument(
+        "--latency-ms", default=0.0, type=float, help="Delay added to each response"
+    )
+    parser.add_argument("--list-size", default=DEFAULT_LIST_SIZE, type=int)
+    parser.add_argument("--seed", default=None, type=int)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    api = StandInApi(
+        dict(args.credential),
+        fail_401_rate=args.fail_401_rate,
+        fail_429_rate=args.fail_429_rate,
+        latency=args.latency_ms / 1000,
+        list_size=args.list_size,
+        seed=args.seed,
+        rate_limit=args.rate_limit,
+    )
+
+    print(f"Serving Duo stand-in ({args.mode}) on {args.host}:{args.port}")
+    try:
+        if args.mode == "asyncio":
+            asyncio.run(serve_asyncio(api, args.host, args.port))
+        else:
+            server = ThreadedStandInServer((args.host, args.port), api, args.verbose)
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
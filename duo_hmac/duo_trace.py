@@ -0,0 +1,122 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import json
+import random
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, TextIO
+
+
+from . import duo_hmac_utils
+
+
+class TraceRecord(NamedTuple):
+    """
+    What was signed, without the parameter values: enough to line a
+    client's signature up with the server's view of the same request
+    """
+
+    timestamp: float
+    ikey: str
+    date_string: str
+    http_method: str
+    api_host: str
+    api_path: str
+    canon_parameters_length: int
+    body_hash: str
+    x_duo_headers_hash: str
+    canonical_string_digest: str
+    outcome: Optional[str]
+
+
+class CanonicalStringTrace:
+    """
+    A fixed-size ring buffer of the most recent canonical strings signed
+    (or verified), sampled at sample_rate.
+
+    Attach one to a DuoHmac or DuoHmacVerifier by setting its trace
+    attribute.  With no trace attached, signing only pays for checking that
+    the attribute is None.  Unsampled requests cost one random number.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        sample_rate: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0.0 < sample_rate <= 1.0:
+            raise ValueError("sample_rate must be greater than 0 and at most 1")
+
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._clock = clock
+        self._lock = threading.Lock()
+        duo_hmac_utils._register_fork_safe_lock(self)
+        self._records: List[Optional[TraceRecord]] = [None] * capacity
+        self._next = 0
+        self.recorded = 0
+
+    def record(
+        self, ikey: str, canon_string: str, outcome: Optional[str] = None
+    ) -> None:
+        """Record one canonical string, if it is sampled"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        # The path is the only part that could contain a newline
+        head, canon_parameters, body_hash, x_duo_headers_hash = canon_string.rsplit(
+            "\n", 3
+        )
+        date_string, http_method, api_host, api_path = head.split("\n", 3)
+        record = TraceRecord(
+            self._clock(),
+            ikey,
+            date_string,
+            http_method,
+            api_host,
+            api_path,
+            len(canon_parameters),
+            body_hash,
+            x_duo_headers_hash,
+            hashlib.sha256(canon_string.encode("utf-8")).hexdigest(),
+            outcome,
+        )
+
+        with self._lock:
+            self._records[self._next] = record
+            self._next = (self._next + 1) % self.capacity
+            self.recorded += 1
+
+    def dump(self) -> List[TraceRecord]:
+        """Return the buffered records, oldest first"""
+        with self._lock:
+            records = self._records[self._next:] + self._records[: self._next]
+        return [record for record in records if record is not None]
+
+    def write_jsonl(self, stream: TextIO) -> int:
+        """Write the buffered records to stream as JSON lines, and return the count"""
+        records = self.dump()
+        for record in records:
+            stream.write(json.dumps(record._asdict()) + "\n")
+        return len(records)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records = [None] * self.capacity
+            self._next = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        duo_hmac_utils._register_fork_safe_lock(self)
@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+Warm up signers in a prefork server's master process, so that workers
+inherit ready-made state instead of each building it on its first request.
+
+With gunicorn, for example, load the application in the master
+(preload_app = True) and call prepare_for_fork there once the signers
+exist.
+"""
+
+import gc
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+from . import duo_hmac
+
+# (http_method, api_path, parameters) of a request the workers will send
+Endpoint = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+def warm_up(
+    signers: Iterable[duo_hmac.DuoHmac], endpoints: Iterable[Endpoint] = ()
+) -> None:
+    """
+    Build each signer's keyed HMAC state and its date provider's cache, and
+    sign each endpoint once to load the encoder and quoting caches.  The
+    warm-up signatures are discarded and are not traced.
+
+    Key state is cached per thread, so call this from the thread that will
+    fork; the forked worker's main thread inherits it.
+    """
+    endpoints = list(endpoints)
+    for signer in signers:
+        signer._get_key_state()
+        signer.date_string_provider.get_rfc_2822_date_string()
+
+        trace, signer.trace = signer.trace, None
+        try:
+            for http_method, api_path, parameters in endpoints:
+                signer.prepare_request(http_method, api_path, parameters).sign()
+        finally:
+            signer.trace = trace
+
+
+def freeze() -> None:
+    """
+    Move every object tracked by the garbage collector into a permanent
+    generation that collections never visit.  A collection in a worker
+    would otherwise write to every object it scans, copying the pages the
+    worker shares with the master.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def prepare_for_fork(
+    signers: Iterable[duo_hmac.DuoHmac],
+    endpoints: Iterable[Endpoint] = (),
+    freeze_objects: bool = True,
+) -> None:
+    """Warm up the signers and, unless freeze_objects is False, freeze the heap"""
+    warm_up(signers, endpoints)
+    if freeze_objects:
+        freeze()
@@ -0,0 +1,265 @@
+#! /bin/python3
+
+import argparse
+import http.client
+import math
+import threading
+import time
+import urllib.parse
+
+from duo_hmac import duo_hmac
+
+import check_credentials as cc
+
+# Bucket boundaries grow by 1%, so reported percentiles are within 1%
+BUCKET_GROWTH = 1.01
+PERCENTILES = [50.0, 90.0, 99.0, 99.9]
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        microseconds = max(seconds * 1_000_000, 1.0)
+        bucket = int(math.log(microseconds, BUCKET_GROWTH))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Return the upper bound, in seconds, of the bucket holding the percentile"""
+        if not self.count:
+            return 0.0
+        threshold = self.count * percent / 100
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= threshold:
+                return min(BUCKET_GROWTH ** (bucket + 1) / 1_000_000, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return "no samples"
+        parts = [f"mean {_format_seconds(self.total / self.count)}"]
+        parts.extend(
+            f"p{percent:g} {_format_seconds(self.percentile(percent))}"
+            for percent in PERCENTILES
+        )
+        parts.append(f"max {_format_seconds(self.max)}")
+        return "  ".join(parts)
+
+
+def _format_seconds(seconds):
+    if seconds < 0.001:
+        return f"{seconds * 1_000_000:.1f}us"
+    return f"{seconds * 1000:.2f}ms"
+
+
+class Worker(threading.Thread):
+    """
+    Sends signed requests over one persistent connection, either as fast
+    as possible or on a fixed schedule, keeping its own histograms
+    """
+
+    def __init__(self, hmac, base_url, args_dict, deadline, interval, start, quota):
+        super().__init__(daemon=True)
+        self.hmac = hmac
+        self.base_url = base_url
+        self.args_dict = args_dict
+        self.deadline = deadline
+        self.interval = interval
+        self.start_time = start
+        self.quota = quota
+        self.signing = LatencyHistogram()
+        self.network = LatencyHistogram()
+        self.end_to_end = LatencyHistogram()
+        self.statuses = {}
+
+    def _connect(self):
+        if self.base_url.scheme == "https":
+            return http.client.HTTPSConnection(self.base_url.netloc)
+        return http.client.HTTPConnection(self.base_url.netloc)
+
+    def run(self):
+        connection = self._connect()
+        host_length = len(self.hmac.api_host)
+        method = self.args_dict["method"]
+        path = self.args_dict["path"]
+        params = self.args_dict["params"]
+        sent = 0
+
+        while sent < self.quota:
+            scheduled = time.perf_counter()
+            if self.interval:
+                # Open loop: measure from the scheduled send time, so a slow
+                # server cannot hide queueing delay from the results
+                scheduled = self.start_time + sent * self.interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if time.perf_counter() >= self.deadline:
+                break
+
+            sign_start = time.perf_counter()
+            uri, body, headers = self.hmac.get_authentication_components(
+                method, path, params
+            )
+            sign_end = time.perf_counter()
+
+            try:
+                connection.request(method, uri[host_length:], body, headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = self._connect()
+                status = "error"
+            done = time.perf_counter()
+
+            self.signing.record(sign_end - sign_start)
+            self.network.record(done - sign_end)
+            self.end_to_end.record(done - scheduled)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            sent += 1
+
+        connection.close()
+
+
+def get_arguments(parser):
+    parser.add_argument(
+        "--base-url",
+        default="http://127.0.0.1:8080",
+        help="Where to send requests; the host is also used to sign them",
+    )
+    parser.add_argument("--ikey", help="IKEY to sign with (default: duo.conf)")
+    parser.add_argument("--skey", help="SKEY to sign with (default: duo.conf)")
+    parser.add_argument(
+        "-m", choices=["get", "post"], default="get", help="HTTP method"
+    )
+    parser.add_argument("-a", default="/auth/v2/check", help="API path")
+    parser.add_argument(
+        "-p",
+        default=[],
+        help="API call parameters as k=v pairs",
+        metavar="KEY=VALUE",
+        nargs="*",
+    )
+    parser.add_argument(
+        "-c", default=1, type=int, help="Number of concurrent connections"
+    )
+    parser.add_argument(
+        "-r",
+        default=0.0,
+        type=float,
+        help="Target requests per second across all connections (default: unpaced)",
+    )
+    parser.add_argument("-d", default=10.0, type=float, help="Duration in seconds")
+    parser.add_argument(
+        "-n", default=0, type=int, help="Stop after this many requests (default: -d)"
+    )
+    args = parser.parse_args()
+
+    args_dict = {
+        "base_url": urllib.parse.urlsplit(args.base_url),
+        "ikey": args.ikey,
+        "skey": args.skey,
+        "method": args.m.upper(),
+        "path": args.a,
+        "params": {p[0]: p[1] for p in [item.split("=") for item in args.p]},
+        "concurrency": max(args.c, 1),
+        "rate": args.r,
+        "duration": args.d,
+        "requests": args.n,
+    }
+
+    return args_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="Duo API load generator",
+        description="""Sends signed Duo API requests at a target rate or
+                       concurrency and reports throughput and latency,
+                       with signing time and network time measured
+                       separately""",
+        epilog="""CLI flags: --base-url <url> -m <HTTP method> -a <api path>
+                  -p key1=value1 ... -c <connections> -r <rate> -d <seconds>""",
+    )
+    args_dict = get_arguments(parser)
+
+    if args_dict["ikey"] and args_dict["skey"]:
+        ikey, skey = args_dict["ikey"], args_dict["skey"]
+    else:
+        ikey, skey, _ = cc._read_config()
+
+    base_url = args_dict["base_url"]
+    hmac = duo_hmac.DuoHmac(ikey, skey, base_url.netloc)
+
+    concurrency = args_dict["concurrency"]
+    interval = concurrency / args_dict["rate"] if args_dict["rate"] else 0.0
+    if args_dict["requests"]:
+        quotas = [
+            args_dict["requests"] // concurrency
+            + (1 if index < args_dict["requests"] % concurrency else 0)
+            for index in range(concurrency)
+        ]
+    else:
+        quotas = [math.inf] * concurrency
+
+    start = time.perf_counter()
+    deadline = start + args_dict["duration"]
+    workers = [
+        Worker(
+            hmac,
+            base_url,
+            args_dict,
+            deadline,
+            interval,
+            # Stagger paced workers so the combined schedule is even
+            start + index * interval / concurrency,
+            quotas[index],
+        )
+        for index in range(concurrency)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    signing = LatencyHistogram()
+    network = LatencyHistogram()
+    end_to_end = LatencyHistogram()
+    statuses = {}
+    for worker in workers:
+        signing.merge(worker.signing)
+        network.merge(worker.network)
+        end_to_end.merge(worker.end_to_end)
+        for status, count in worker.statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    print(f"Requests:   {end_to_end.count} in {elapsed:.2f}s")
+    print(f"Throughput: {end_to_end.count / elapsed:.1f} requests/s")
+    status_counts = [f"{status}: {count}" for status, count in statuses.items()]
+    print(f"Statuses:   {', '.join(status_counts)}")
+    print(f"Signing:    {signing.summary()}")
+    print(f"Network:    {network.summary()}")
+    print(f"End to end: {end_to_end.summary()}")
+
+
+if __name__ == "__main__":
+    main()
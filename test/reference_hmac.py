@@ -0,0 +1,159 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+The original, unoptimized implementation of Duo request signing, kept
+verbatim as the reference the optimized paths are compared against.
+Do not optimize this module.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import urllib.parse
+
+
+def jsonize_parameters(parameters):
+    if parameters is None:
+        parameters = {}
+
+    return json.dumps(parameters, sort_keys=True, separators=(",", ":"))
+
+
+def normalize_parameters(parameters):
+    if parameters is None:
+        return {}
+
+    def encode(value):
+        if isinstance(value, bool):
+            if value:
+                value = "true"
+            else:
+                value = "false"
+        elif isinstance(value, int):
+            value = str(value)
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return value
+
+    def to_list(value):
+        if value is None or isinstance(value, str):
+            return [value]
+        return value
+
+    return dict(
+        (encode(key), [encode(v) for v in to_list(value)])
+        for (key, value) in list(parameters.items())
+    )
+
+
+def extract_x_duo_headers(in_headers):
+    if in_headers is None:
+        return {}
+
+    return {
+        key: value
+        for (key, value) in in_headers.items()
+        if key.lower().startswith("x-duo")
+    }
+
+
+def canonicalize_parameters(parameters):
+    if parameters is None:
+        return ""
+
+    args = []
+    for key, vals in sorted(
+        (urllib.parse.quote(key, "~"), vals) for (key, vals) in list(parameters.items())
+    ):
+        for val in sorted(urllib.parse.quote(val, "~") for val in vals):
+            args.append(f"{key}={val}")
+    return "&".join(args)
+
+
+def canonicalize_body(body):
+    if body is None:
+        body = ""
+    return hashlib.sha512(body.encode("utf-8")).hexdigest()
+
+
+def canonicalize_x_duo_headers(duo_headers):
+    if duo_headers is None:
+        duo_headers = {}
+
+    lowered_headers = {}
+    for header_name, header_value in duo_headers.items():
+        header_name = header_name.lower() if header_name is not None else None
+        lowered_headers[header_name] = header_value
+
+    canon_list = []
+
+    for header_name in sorted(lowered_headers.keys()):
+        value = lowered_headers[header_name]
+        canon_list.extend([header_name, value])
+
+    canon = "\x00".join(canon_list)
+    return hashlib.sha512(canon.encode("utf-8")).hexdigest()
+
+
+def generate_canonical_string(
+    date_string, http_method, api_host, api_path, qs_parameters, body, duo_headers
+):
+    canon_parts = [
+        date_string,
+        http_method.upper(),
+        api_host.lower(),
+        api_path,
+        canonicalize_parameters(qs_parameters),
+        canonicalize_body(body),
+        canonicalize_x_duo_headers(duo_headers),
+    ]
+    return "\n".join(canon_parts)
+
+
+def get_authentication_components(
+    ikey, skey, api_host, date_string, http_method, api_path, parameters, in_headers
+):
+    if in_headers is None:
+        in_headers = {}
+    else:
+        in_headers = dict(in_headers)
+
+    params_go_in_body = http_method.upper() in ("POST", "PUT", "PATCH")
+    qs_parameters = {}
+    body = None
+    if params_go_in_body:
+        body = jsonize_parameters(parameters)
+    else:
+        qs_parameters = normalize_parameters(parameters)
+
+    in_headers["x-duo-date"] = date_string
+    x_duo_headers = extract_x_duo_headers(in_headers)
+
+    canon_string = generate_canonical_string(
+        date_string,
+        http_method,
+        api_host,
+        api_path,
+        qs_parameters,
+        body,
+        x_duo_headers,
+    )
+    sig_hmac = hmac.new(
+        skey.encode("utf-8"), canon_string.encode("utf-8"), hashlib.sha512
+    )
+    auth = f"{ikey}:{sig_hmac.hexdigest()}"
+    authn_header = f"Basic {base64.b64encode(auth.encode('utf-8')).decode('utf-8')}"
+
+    uri = f"{api_host}{api_path}"
+    query_string = urllib.parse.urlencode(qs_parameters, doseq=True)
+    if query_string:
+        uri = f"{uri}?{query_string}"
+
+    out_headers = dict(in_headers)
+    out_headers["Authorization"] = authn_header
+    if params_go_in_body:
+        out_headers["Content-type"] = "application/json"
+
+    return (uri, body, out_headers)
@@ -0,0 +1,21 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+Credentials and a fixed request date shared by the tests.  These are not
+real Duo credentials.
+"""
+
+from duo_hmac import duo_hmac_utils
+
+IKEY = "DIABCDEFGHIJKLMNOPQR"
+SKEY = "testtesttesttesttesttesttesttesttesttest"
+API_HOST = "api-xxxxxxxx.duosecurity.com"
+DATE_STRING = "Fri, 24 May 2024 12:00:00 -0000"
+
+
+class FixedDateStringProvider(duo_hmac_utils.DateStringProvider):
+    """Dates every request with DATE_STRING"""
+
+    def get_rfc_2822_date_string(self) -> str:
+        return DATE_STRING
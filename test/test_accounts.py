@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_accounts, duo_hmac
+
+CHILDREN = [
+    duo_accounts.ChildAccount("DA0000000000000000A1", "api-aaaaaaaa.duosecurity.com"),
+    duo_accounts.ChildAccount("DA0000000000000000B2", "api-bbbbbbbb.duosecurity.com"),
+    duo_accounts.ChildAccount("DA0000000000000000C3", "api-cccccccc.duosecurity.com"),
+]
+
+
+class TestFanOut(unittest.TestCase):
+    def setUp(self) -> None:
+        self.parent = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+
+        return super().setUp()
+
+    def expected(self, http_method, api_path, parameters, in_headers=None):
+        """Sign each child separately, the way fan_out replaces"""
+        results = []
+        for child in CHILDREN:
+            child_hmac = duo_hmac.DuoHmac(
+                IKEY, SKEY, child.api_host, FixedDateStringProvider()
+            )
+            child_parameters = dict(parameters or {})
+            child_parameters["account_id"] = child.account_id
+            results.append(
+                child_hmac.get_authentication_components(
+                    http_method, api_path, child_parameters, in_headers
+                )
+            )
+        return results
+
+    def test_matches_signing_each_child(self):
+        test_cases = [
+            ("GET", "/admin/v1/users", None, None),
+            ("GET", "/admin/v1/users", {"limit": "10", "username": ["b", "a c"]}, None),
+            ("GET", "/admin/v1/info/summary", {"zzz": "1", "aaa": "2"}, None),
+            ("POST", "/admin/v1/users", {"username": "some user", "z": 1}, None),
+            ("POST", "/admin/v1/users", None, {"X-Duo-Trace": "abc"}),
+            ("DELETE", "/admin/v1/users/DU123", {}, {"User-Agent": "test"}),
+        ]
+        for request in test_cases:
+            with self.subTest(request=request):
+                self.assertEqual(
+                    self.expected(*request),
+                    duo_accounts.fan_out(
+                        self.parent, *request[:3], CHILDREN, request[3]
+                    ),
+                )
+
+    def test_parallel(self):
+        parameters = {"username": "some user"}
+        self.assertEqual(
+            self.expected("GET", "/admin/v1/users", parameters),
+            duo_accounts.fan_out(
+                self.parent,
+                "GET",
+                "/admin/v1/users",
+                parameters,
+                CHILDREN,
+                max_workers=4,
+            ),
+        )
+
+    def test_parameters_containing_the_placeholder(self):
+        placeholder = duo_accounts._PLACEHOLDER
+        test_cases = [
+            ("GET", {"a": placeholder}),
+            ("GET", {placeholder: "x"}),
+            ("POST", {"a": placeholder}),
+            ("POST", {"a": placeholder, "b": placeholder + "1"}),
+        ]
+        for http_method, parameters in test_cases:
+            with self.subTest(http_method=http_method, parameters=parameters):
+                self.assertEqual(
+                    self.expected(http_method, "/admin/v1/users", parameters),
+                    duo_accounts.fan_out(
+                        self.parent, http_method, "/admin/v1/users", parameters, CHILDREN
+                    ),
+                )
+
+    def test_account_id_parameter_rejected(self):
+        with self.assertRaises(ValueError):
+            duo_accounts.fan_out(
+                self.parent, "GET", "/admin/v1/users", {"account_id": "x"}, CHILDREN
+            )
+
+    def test_no_children(self):
+        self.assertEqual(
+            [], duo_accounts.fan_out(self.parent, "GET", "/admin/v1/users", None, [])
+        )
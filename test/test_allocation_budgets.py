@@ -0,0 +1,219 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+Allocation budgets for signing, measured with tracemalloc.  For each
+workload and stage this measures:
+  - blocks and bytes still allocated per call while the results are kept,
+    which is what a signing service hands to the garbage collector
+  - peak bytes allocated during one call, including temporaries
+
+A measurement over budget fails the test.  Budgets leave about 30%
+headroom over CPython 3.8 to 3.13.  To print every measurement:
+
+    export DUO_HMAC_ALLOCATION_REPORT=1
+    python -m unittest discover test/ -p test_allocation_budgets.py
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+import unittest
+
+from signing_fixtures import API_HOST, DATE_STRING, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_canonicalize, duo_hmac, duo_hmac_utils
+
+REPORT = bool(os.environ.get("DUO_HMAC_ALLOCATION_REPORT"))
+
+SMALL_PARAMETERS = {"username": "someone", "factor": "push", "device": "auto"}
+LARGE_LIST_PARAMETERS = {"user_id": [f"DU{index:018d}" for index in range(5000)]}
+LARGE_BODY_PARAMETERS = {"notes": "x" * (1024 * 1024)}
+
+# Headers for sign_headers_into, half of them signed x-duo headers
+HEADERS = {
+    f"X-Duo-Header-{index}" if index % 2 else f"X-Other-Header-{index}": "v" * 20
+    for index in range(20)
+}
+
+WORKLOADS = {
+    "small GET": ("GET", SMALL_PARAMETERS),
+    "small POST": ("POST", SMALL_PARAMETERS),
+    "large list GET": ("GET", LARGE_LIST_PARAMETERS),
+    "large body POST": ("POST", LARGE_BODY_PARAMETERS),
+}
+
+# (workload, stage) -> (retained blocks, retained bytes, peak bytes) per call
+BUDGETS = {
+    ("small GET", "parameters"): (19, 1100, 1800),
+    ("small GET", "canonicalization"): (7, 800, 1800),
+    ("small GET", "signature"): (2, 350, 2000),
+    ("small GET", "headers"): (3, 350, 550),
+    ("small GET", "sign"): (6, 800, 3200),
+    ("small GET", "total"): (8, 950, 4600),
+    ("small GET", "sign headers into"): (3, 300, 6000),
+    ("small POST", "parameters"): (2, 160, 2700),
+    ("small POST", "canonicalization"): (5, 550, 1450),
+    ("small POST", "signature"): (2, 350, 2000),
+    ("small POST", "headers"): (3, 350, 550),
+    ("small POST", "sign"): (6, 800, 3200),
+    ("small POST", "total"): (9, 1050, 4900),
+    ("small POST", "sign headers into"): (5, 360, 5600),
+    ("large list GET", "parameters"): (6600, 510_000, 510_000),
+    ("large list GET", "canonicalization"): (12, 380_000, 940_000),
+    ("large list GET", "signature"): (6, 600, 190_000),
+    ("large list GET", "headers"): (6, 500, 550),
+    ("large list GET", "sign"): (11, 1100, 380_000),
+    ("large list GET", "total"): (14, 190_000, 1_440_000),
+    ("large list GET", "sign headers into"): (12, 190_000, 1_440_000),
+    ("large body POST", "parameters"): (8, 1_370_000, 3_070_000),
+    ("large body POST", "canonicalization"): (9, 800, 1_370_000),
+    ("large body POST", "signature"): (6, 600, 2000),
+    ("large body POST", "headers"): (6, 500, 550),
+    ("large body POST", "sign"): (11, 1100, 3200),
+    ("large body POST", "total"): (17, 1_370_000, 3_070_000),
+    ("large body POST", "sign headers into"): (14, 1_370_000, 3_070_000),
+}
+
+
+def stages(hmac, http_method, parameters):
+    """The stages of signing one request, each as a function of no arguments"""
+    params_go_in_body = http_method in ("POST", "PUT", "PATCH")
+    prepared = hmac.prepare_request(http_method, "/admin/v1/users", parameters)
+    x_duo_headers = {"x-duo-date": DATE_STRING}
+
+    if params_go_in_body:
+
+        def prepare_parameters():
+            return duo_hmac_utils.jsonize_parameters(parameters)
+
+        def canonicalize():
+            return (
+                duo_canonicalize.canonicalize_body(prepared.body),
+                duo_canonicalize.canonicalize_x_duo_headers(x_duo_headers),
+            )
+
+    else:
+        quoted = duo_hmac_utils.quote_parameters(parameters)
+
+        def prepare_parameters():
+            return duo_hmac_utils.quote_parameters(parameters)
+
+        def canonicalize():
+            return (
+                duo_canonicalize.canonicalize_quoted_parameters(quoted),
+                duo_hmac_utils.encode_quoted_parameters(quoted),
+                duo_canonicalize.canonicalize_body(None),
+                duo_canonicalize.canonicalize_x_duo_headers(x_duo_headers),
+            )
+
+    canon_string = duo_canonicalize.assemble_canonical_string(
+        DATE_STRING,
+        http_method,
+        API_HOST,
+        "/admin/v1/users",
+        prepared.canon_parameters,
+        prepared.body_hash,
+        duo_canonicalize.canonicalize_x_duo_headers(x_duo_headers),
+    )
+    authn_header = hmac._authorization_header(canon_string)
+
+    def assemble_headers():
+        # As DuoPreparedRequest.sign assembles the final headers
+        out_headers = dict(prepared.in_headers)
+        out_headers["x-duo-date"] = DATE_STRING
+        out_headers["Authorization"] = authn_header
+        if params_go_in_body:
+            out_headers["Content-type"] = "application/json"
+        return out_headers
+
+    into_headers = dict(HEADERS)
+
+    return {
+        "parameters": prepare_parameters,
+        "canonicalization": canonicalize,
+        "signature": lambda: hmac._authorization_header(canon_string),
+        "headers": assemble_headers,
+        "sign": prepared.sign,
+        "total": lambda: hmac.get_authentication_components(
+            http_method, "/admin/v1/users", parameters
+        ),
+        "sign headers into": lambda: hmac.sign_headers_into(
+            http_method, "/admin/v1/users", parameters, into_headers
+        ),
+    }
+
+
+def measure(function, calls):
+    """Return (retained blocks, retained bytes, peak bytes) per call"""
+    # Run once first so one-time caches are not counted
+    function()
+    gc.collect()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        results = [function() for _ in range(calls)]
+        after = tracemalloc.take_snapshot()
+        differences = after.compare_to(before, "filename")
+        retained_blocks = sum(stat.count_diff for stat in differences) / calls
+        retained_bytes = sum(stat.size_diff for stat in differences) / calls
+        del results
+        gc.collect()
+
+        # clear_traces also resets the peak, which Python 3.8 cannot do alone
+        tracemalloc.clear_traces()
+        baseline, _ = tracemalloc.get_traced_memory()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return (retained_blocks, retained_bytes, peak - baseline)
+
+
+@unittest.skipIf(tracemalloc.is_tracing(), "tracemalloc is already in use")
+class TestAllocationBudgets(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+
+        return super().setUp()
+
+    def test_budgets(self):
+        for workload, (http_method, parameters) in WORKLOADS.items():
+            calls = 200 if parameters is SMALL_PARAMETERS else 5
+            for stage, function in stages(self.hmac, http_method, parameters).items():
+                measured = measure(function, calls)
+                budget = BUDGETS[(workload, stage)]
+                if REPORT:
+                    print(
+                        f"{workload:>16} {stage:>16}: {measured[0]:7.1f} blocks"
+                        f" {measured[1]:10.0f} bytes retained,"
+                        f" {measured[2]:10.0f} bytes peak",
+                        file=sys.stderr,
+                    )
+
+                with self.subTest(workload=workload, stage=stage):
+                    self.assertLessEqual(measured[0], budget[0], "retained blocks")
+                    self.assertLessEqual(measured[1], budget[1], "retained bytes")
+                    self.assertLessEqual(measured[2], budget[2], "peak bytes")
+
+    def test_sign_headers_into_allocates_less(self):
+        # Signing into the caller's headers must cost less than copying them
+        for workload in ("small GET", "small POST"):
+            http_method, parameters = WORKLOADS[workload]
+            into = measure(
+                stages(self.hmac, http_method, parameters)["sign headers into"], 200
+            )
+            copied = measure(
+                lambda: self.hmac.get_authentication_components(
+                    http_method, "/admin/v1/users", parameters, HEADERS
+                ),
+                200,
+            )
+
+            with self.subTest(workload=workload):
+                self.assertLess(into[0], copied[0], "retained blocks")
+                self.assertLess(into[1], copied[1], "retained bytes")
+                self.assertLess(into[2], copied[2], "peak bytes")
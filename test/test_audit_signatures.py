@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import tempfile
+import unittest
+
+import audit_signatures
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_hmac
+
+OLD_SKEY = "oldoldoldoldoldoldoldoldoldoldoldoldoldo"
+
+
+def archived(hmac, http_method, api_path, parameters):
+    url, body, headers = hmac.get_authentication_components(
+        http_method, api_path, parameters
+    )
+    return {"method": http_method, "url": url, "body": body, "headers": headers}
+
+
+class TestAuditSignatures(unittest.TestCase):
+    def setUp(self) -> None:
+        current = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+        old = duo_hmac.DuoHmac(IKEY, OLD_SKEY, API_HOST, FixedDateStringProvider())
+        other = duo_hmac.DuoHmac("DIOTHER", SKEY, API_HOST, FixedDateStringProvider())
+
+        tampered = archived(current, "POST", "/auth/v2/auth", {"username": "a"})
+        tampered["body"] = tampered["body"].replace('"a"', '"b"')
+        moved = archived(current, "GET", "/admin/v1/users", {"limit": "300"})
+        moved["url"] = moved["url"].replace("300", "100")
+        https = archived(current, "GET", "/admin/v1/users", None)
+        https["url"] = "https://" + https["url"]
+
+        lines = []
+        for index in range(50):
+            lines.append(
+                archived(current, "GET", "/admin/v1/users", {"offset": str(index)})
+            )
+            lines.append(
+                archived(old, "POST", "/auth/v2/auth", {"username": f"user{index}"})
+            )
+        # The line numbers of the records that do not verify
+        self.bad = {10: tampered, 25: moved, 40: archived(other, "GET", "/a", None)}
+        for index, record in sorted(self.bad.items()):
+            lines.insert(index, record)
+        lines.insert(60, https)
+        lines = [json.dumps(record) for record in lines]
+        lines.insert(70, "")
+        self.bad[71] = "not json"
+        lines.insert(71, "not json")
+        self.bad[72] = '{"method": "GET"}'
+        lines.insert(72, '{"method": "GET"}')
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "archive.jsonl")
+        with open(self.path, "w") as archive:
+            archive.write("\n".join(lines) + "\n")
+        self.offsets = []
+        offset = 0
+        for line in lines:
+            self.offsets.append(offset)
+            offset += len(line.encode("utf-8")) + 1
+        self.record_count = len(lines) - 1
+        self.credentials = {IKEY: [SKEY, OLD_SKEY]}
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+        return super().tearDown()
+
+    def run_audit(self, processes, range_size, credentials=None):
+        checked = 0
+        mismatches = []
+        for range_checked, range_mismatches in audit_signatures.audit(
+            [self.path], credentials or self.credentials, processes, range_size
+        ):
+            checked += range_checked
+            mismatches.extend(range_mismatches)
+        return (checked, sorted(mismatches, key=lambda mismatch: mismatch["offset"]))
+
+    def test_finds_mismatches(self):
+        test_cases = [
+            (1, audit_signatures.DEFAULT_RANGE_SIZE),
+            (1, 100),
+            (1, 1),
+            (2, 977),
+        ]
+        for processes, range_size in test_cases:
+            with self.subTest(processes=processes, range_size=range_size):
+                checked, mismatches = self.run_audit(processes, range_size)
+
+                self.assertEqual(self.record_count, checked)
+                self.assertEqual(
+                    [self.offsets[index] for index in sorted(self.bad)],
+                    [mismatch["offset"] for mismatch in mismatches],
+                )
+                self.assertEqual(
+                    [IKEY, IKEY, "DIOTHER", None, None],
+                    [mismatch["ikey"] for mismatch in mismatches],
+                )
+                self.assertEqual("Unknown IKEY DIOTHER", mismatches[2]["error"])
+                self.assertEqual(self.path, mismatches[0]["file"])
+
+    def test_historical_keys_required(self):
+        _, mismatches = self.run_audit(1, 4096, {IKEY: SKEY})
+
+        self.assertEqual(50 + len(self.bad), len(mismatches))
+
+    def test_read_lines_without_mmap(self):
+        size = os.path.getsize(self.path)
+        for range_size in (1, 333, size):
+            with self.subTest(range_size=range_size):
+                with open(self.path, "rb") as archive:
+                    read = [
+                        line
+                        for start in range(0, size, range_size)
+                        for line in audit_signatures._read_lines(
+                            archive, start, min(start + range_size, size)
+                        )
+                    ]
+                mapped = [
+                    line
+                    for task in audit_signatures.split_ranges(self.path, range_size)
+                    for line in audit_signatures.iter_lines(*task)
+                ]
+
+                self.assertEqual(mapped, read)
+                self.assertEqual(self.offsets, [offset for offset, _ in read])
+
+    def test_empty_archive(self):
+        with open(self.path, "w"):
+            pass
+
+        self.assertEqual((0, []), self.run_audit(1, 100))
@@ -0,0 +1,100 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import json
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_bulk, duo_hmac, duo_hmac_utils
+
+
+def make_operations(count):
+    return [
+        ("post", f"/admin/v1/users/DU{index:018d}", {"realname": f"Üser {index}"})
+        for index in range(count)
+    ]
+
+
+class TestBulkOperationPacker(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+
+        return super().setUp()
+
+    def test_matches_unpacked_signing(self):
+        operations = make_operations(3)
+        packer = duo_bulk.BulkOperationPacker(self.hmac)
+
+        actual = list(packer.pack(operations))
+        expected = self.hmac.get_authentication_components(
+            "POST",
+            duo_bulk.BULK_API_PATH,
+            {
+                "operations": [
+                    {"method": method.upper(), "path": path, "body": params}
+                    for (method, path, params) in operations
+                ]
+            },
+        )
+
+        self.assertEqual([expected], actual)
+
+    def test_operation_limit(self):
+        packer = duo_bulk.BulkOperationPacker(self.hmac)
+        batches = list(packer.pack(make_operations(120)))
+
+        sizes = [len(json.loads(body)["operations"]) for (_, body, _) in batches]
+        self.assertEqual([50, 50, 20], sizes)
+
+    def test_size_limit(self):
+        max_body_size = 1000
+        packer = duo_bulk.BulkOperationPacker(self.hmac, max_body_size=max_body_size)
+        batches = list(packer.pack(make_operations(100)))
+
+        paths = []
+        for _, body, _ in batches:
+            self.assertLessEqual(len(body.encode("utf-8")), max_body_size)
+            paths.extend(op["path"] for op in json.loads(body)["operations"])
+        self.assertEqual([path for (_, path, _) in make_operations(100)], paths)
+        self.assertGreater(len(batches), 2)
+
+    def test_streams_full_batches(self):
+        packer = duo_bulk.BulkOperationPacker(self.hmac, max_operations=2)
+        results = [packer.add(*operation) for operation in make_operations(5)]
+
+        self.assertEqual(
+            [False, False, True, False, True], [r is not None for r in results]
+        )
+        self.assertIsNotNone(packer.flush())
+        self.assertIsNone(packer.flush())
+
+    def test_oversized_operation(self):
+        packer = duo_bulk.BulkOperationPacker(self.hmac, max_body_size=50)
+
+        with self.assertRaises(ValueError):
+            packer.add("POST", "/admin/v1/users", {"username": "x" * 50})
+
+    def test_bad_operation_limit(self):
+        with self.assertRaises(ValueError):
+            duo_bulk.BulkOperationPacker(self.hmac, max_operations=51)
+
+
+class TestPrepareJsonRequest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+
+        return super().setUp()
+
+    def test_matches_components(self):
+        params = {"foo": "bar", "one": "1"}
+        expected = self.hmac.get_authentication_components("POST", "/path", params)
+        actual = self.hmac.prepare_json_request(
+            "POST", "/path", duo_hmac_utils.jsonize_parameters(params)
+        ).sign()
+
+        self.assertEqual(expected, actual)
+
+    def test_get_not_allowed(self):
+        with self.assertRaises(ValueError):
+            self.hmac.prepare_json_request("GET", "/path", "{}")
@@ -4,6 +4,7 @@
 import json
 import random
 import unittest
+import urllib.parse
 
 from duo_hmac import duo_canonicalize
 
@@ -134,6 +135,19 @@ class TestCanonicalizeParameters(unittest.TestCase):
 
                 self.assertEqual(expected, actual)
 
+    def test_quoted_parameters_match(self):
+        for test_name, input, expected in self.test_cases:
+            with self.subTest(test_name):
+                quoted = {
+                    urllib.parse.quote(key, "~"): [
+                        urllib.parse.quote(val, "~") for val in vals
+                    ]
+                    for (key, vals) in input.items()
+                }
+                actual = duo_canonicalize.canonicalize_quoted_parameters(quoted)
+
+                self.assertEqual(expected, actual)
+
     def test_parameter_sorting(self):
         test_keys = [
             b"one",
@@ -247,3 +261,19 @@ class TestCanonicalizeXDuoHeaders(unittest.TestCase):
 
         self.assertEqual(actual_1, actual_2)
         self.assertEqual(actual_2, actual_3)
+
+    def test_header_items(self):
+        test_cases = [
+            ("No headers", {}),
+            ("Date only", {"x-duo-date": "Fri, 24 May 2024 12:00:00 -0000"}),
+            ("Mixed case", {"x-duo-A": "header_value_1", "X-Duo-B": "header_value_2"}),
+            ("Unsorted", {"x-duo-two": "2", "x-duo-one": "1", "x-duo-three": "3"}),
+        ]
+        for test_name, headers in test_cases:
+            with self.subTest(test_name):
+                header_items = [(name.lower(), value) for name, value in headers.items()]
+
+                self.assertEqual(
+                    duo_canonicalize.canonicalize_x_duo_headers(headers),
+                    duo_canonicalize.canonicalize_x_duo_header_items(header_items),
+                )
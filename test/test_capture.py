@@ -0,0 +1,171 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import io
+import json
+import random
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_capture, duo_hmac
+
+
+class TestPathTemplate(unittest.TestCase):
+    def test_path_template(self):
+        test_cases = [
+            ("/auth/v2/auth", "/auth/v2/auth"),
+            ("/admin/v1/users/DUABCDEFGHIJKLMNOPQR", "/admin/v1/users/{id}"),
+            (
+                "/admin/v1/users/DUABCDEFGHIJKLMNOPQR/phones/DPABCDEFGHIJKLMNOPQR",
+                "/admin/v1/users/{id}/phones/{id}",
+            ),
+            ("/admin/v2/logs/authentication", "/admin/v2/logs/authentication"),
+            ("/admin/v1/info/auth_attempts", "/admin/v1/info/auth_attempts"),
+            ("/admin/v1/users/someone@example.com", "/admin/v1/users/{id}"),
+            ("/admin/v1/users/1234", "/admin/v1/users/{id}"),
+            ("/admin/v1/users/", "/admin/v1/users/"),
+        ]
+        for api_path, expected in test_cases:
+            with self.subTest(api_path=api_path):
+                self.assertEqual(expected, duo_capture.path_template(api_path))
+
+
+class TestRequestShapeCapture(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+        self.stream = io.StringIO()
+        self.hmac.capture = duo_capture.RequestShapeCapture(self.stream)
+
+        return super().setUp()
+
+    def shapes(self):
+        return list(duo_capture.read_shapes(self.stream.getvalue().splitlines()))
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(duo_hmac.DuoHmac(IKEY, SKEY, API_HOST).capture)
+
+    def test_records_shape(self):
+        self.hmac.get_authentication_components(
+            "get",
+            "/admin/v1/users/DUABCDEFGHIJKLMNOPQR",
+            {"username": "a b", "list": ["é", "xyz"]},
+            {"X-Duo-Extra": "x", "User-Agent": "test"},
+        )
+        _, body, _ = self.hmac.get_authentication_components(
+            "POST", "/auth/v2/auth", {"username": "someone", "count": 12}
+        )
+
+        self.assertEqual(
+            [
+                {
+                    "method": "GET",
+                    "path": "/admin/v1/users/{id}",
+                    "parameters": [[8, [[3, 5]]], [4, [[2, 6], [3, 3]]]],
+                    "body_size": 0,
+                    "headers": 2,
+                    "x_duo_headers": 1,
+                },
+                {
+                    "method": "POST",
+                    "path": "/auth/v2/auth",
+                    "parameters": [[8, [[7, 7]]], [5, [[2, 2]]]],
+                    "body_size": len(body),
+                    "headers": 0,
+                    "x_duo_headers": 0,
+                },
+            ],
+            self.shapes(),
+        )
+        self.assertEqual(2, self.hmac.capture.captured)
+
+    def test_no_values_recorded(self):
+        secrets = ["someone@example.com", "s3cr3t-passcode", "DUABCDEFGHIJKLMNOPQR"]
+        self.hmac.get_authentication_components(
+            "GET",
+            "/admin/v1/users/DUABCDEFGHIJKLMNOPQR",
+            {"username": secrets[0]},
+            {"X-Duo-Passcode": secrets[1]},
+        )
+        self.hmac.get_authentication_components(
+            "POST", "/auth/v2/auth", {"passcode": secrets[1], "nested": {"a": "b"}}
+        )
+        captured = self.stream.getvalue()
+
+        for secret in secrets + [SKEY, IKEY, "username", "passcode", "nested"]:
+            self.assertNotIn(secret, captured)
+        for line in captured.splitlines():
+            json.loads(line)
+
+    def test_normalized_names_and_values(self):
+        test_cases = [
+            ("Integer key", {1: "a"}, [[1, [[1, 1]]]]),
+            ("Bytes key", {b"k": "v"}, [[1, [[1, 1]]]]),
+            ("Set value", {"a": {"x y"}}, [[1, [[3, 5]]]]),
+            ("Integer and boolean values", {"n": [10, True]}, [[1, [[2, 2], [4, 4]]]]),
+        ]
+        for test_name, parameters, expected in test_cases:
+            with self.subTest(test_name):
+                self.stream.seek(0)
+                self.stream.truncate()
+                url, _, _ = self.hmac.get_authentication_components(
+                    "GET", "/admin/v1/users", parameters
+                )
+
+                self.assertTrue(url.startswith(API_HOST))
+                self.assertEqual(expected, self.shapes()[0]["parameters"])
+
+    def test_never_raises(self):
+        class Unmeasurable:
+            def __len__(self):
+                raise RuntimeError("no length")
+
+            def __iter__(self):
+                raise RuntimeError("no items")
+
+        capture = self.hmac.capture
+        capture.record("GET", "/admin/v1/users", {"a": Unmeasurable()}, None, None)
+
+        self.assertEqual(1, capture.failed)
+        self.assertEqual(0, capture.captured)
+        self.assertEqual("", self.stream.getvalue())
+
+    def test_sampled(self):
+        self.hmac.capture = duo_capture.RequestShapeCapture(self.stream, 0.1)
+        random.seed(1)
+        for _ in range(1000):
+            self.hmac.get_authentication_components("GET", "/auth/v2/check")
+
+        self.assertEqual(len(self.shapes()), self.hmac.capture.captured)
+        self.assertLess(50, self.hmac.capture.captured)
+        self.assertGreater(150, self.hmac.capture.captured)
+
+    def test_bad_sample_rate(self):
+        for sample_rate in (0.0, -1.0, 1.5):
+            with self.subTest(sample_rate=sample_rate):
+                with self.assertRaises(ValueError):
+                    duo_capture.RequestShapeCapture(self.stream, sample_rate)
+
+    def test_generated_requests_have_captured_shapes(self):
+        requests = [
+            ("GET", "/admin/v1/users", {"limit": "300", "offset": "0"}, None),
+            ("GET", "/admin/v1/users/DUABCDEFGHIJKLMNOPQR", None, None),
+            ("GET", "/admin/v1/logs", {"a b": ["x y z", "~.-_", "%&="]}, None),
+            ("POST", "/auth/v2/auth", {"username": "some one"}, {"X-Duo-A": "1"}),
+            ("PUT", "/admin/v1/users", {"notes": "n" * 5000}, {"User-Agent": "t"}),
+        ]
+        for http_method, api_path, parameters, in_headers in requests:
+            self.hmac.get_authentication_components(
+                http_method, api_path, parameters, in_headers
+            )
+        shapes = self.shapes()
+
+        self.stream.seek(0)
+        self.stream.truncate()
+        rng = random.Random(0)
+        for shape in shapes:
+            self.hmac.get_authentication_components(
+                *duo_capture.generate_request(shape, rng)
+            )
+
+        self.assertEqual(shapes, self.shapes())
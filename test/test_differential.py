@@ -0,0 +1,358 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+"""
+Differential tests: every optimized signing path must produce byte-identical
+output to the reference implementation in reference_hmac.py, for randomly
+generated adversarial inputs.
+
+The corpus is a fixed list of seeds, so failures are reproducible.  To
+explore further, set DUO_HMAC_DIFFERENTIAL_SEED (and optionally
+DUO_HMAC_DIFFERENTIAL_ITERATIONS) to add a seed to the corpus:
+
+    export DUO_HMAC_DIFFERENTIAL_SEED=12345
+    python -m unittest discover test/ -p test_differential.py
+"""
+
+import os
+import random
+import unittest
+import urllib.parse
+
+import reference_hmac
+from signing_fixtures import API_HOST, DATE_STRING, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import (
+    duo_accounts,
+    duo_canonicalize,
+    duo_hmac,
+    duo_hmac_utils,
+    duo_schema,
+)
+
+CORPUS_SEEDS = [0, 1, 2, 3, 5, 8, 13, 21, 34, 55]
+ITERATIONS = int(os.environ.get("DUO_HMAC_DIFFERENTIAL_ITERATIONS", "50"))
+if os.environ.get("DUO_HMAC_DIFFERENTIAL_SEED"):
+    CORPUS_SEEDS.append(int(os.environ["DUO_HMAC_DIFFERENTIAL_SEED"]))
+
+HTTP_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "get", "post"]
+
+CHARACTER_POOLS = [
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",
+    # Everything quote() treats specially, including the '~' Duo keeps safe
+    " !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~",
+    "\t\n\x0b\x0c\r\x7f\x01",
+    "%20%2B+%7E",
+    "éüñßøÆÅ",
+    "䚚⡻㗐軳ཅ᩶﹟⃨́",
+    "\U0001f600\U0001f4a9\U00010348",
+]
+
+
+class AdversarialInputs(random.Random):
+    """Random request inputs biased toward the cases that break encoders"""
+
+    def text(self, max_length=8):
+        if self.random() < 0.1:
+            return ""
+        pool = self.choice(CHARACTER_POOLS)
+        if self.random() < 0.3:
+            pool = "".join(CHARACTER_POOLS)
+        return "".join(self.choice(pool) for _ in range(self.randint(1, max_length)))
+
+    def scalar(self):
+        roll = self.random()
+        if roll < 0.6:
+            return self.text()
+        if roll < 0.75:
+            return self.randint(-(10**12), 10**12)
+        if roll < 0.9:
+            return self.choice([True, False])
+        return self.text(64)
+
+    def value(self):
+        roll = self.random()
+        if roll < 0.5:
+            return self.text()
+        if roll < 0.99:
+            length = self.randint(0, 6)
+            values = [self.scalar() for _ in range(length)]
+            return tuple(values) if self.random() < 0.1 else values
+        # Occasionally a huge list, as in bulk lookups
+        return [self.text(12) for _ in range(self.randint(500, 5000))]
+
+    def parameters(self):
+        if self.random() < 0.05:
+            return None
+        return {self.text(): self.value() for _ in range(self.randint(0, 6))}
+
+    def json_parameters(self):
+        if self.random() < 0.05:
+            return None
+        return {self.text(): self.scalar() for _ in range(self.randint(0, 6))}
+
+    def headers(self):
+        if self.random() < 0.2:
+            return None
+        headers = {}
+        for _ in range(self.randint(0, 4)):
+            name = self.text(6).replace("\x00", "")
+            if self.random() < 0.6:
+                prefix = "".join(
+                    self.choice([c.lower(), c.upper()]) for c in "x-duo-"
+                )
+                name = prefix + name
+            headers[name] = self.text().replace("\x00", "")
+        # Reject duplicates the same way DuoHmac validation would
+        lowered = {}
+        for name, value in headers.items():
+            if not name.lower().startswith("x-duo") or name.lower() not in lowered:
+                lowered[name.lower()] = (name, value)
+        return dict(lowered.values())
+
+    def request(self):
+        http_method = self.choice(HTTP_METHODS)
+        if http_method.upper() in ("POST", "PUT", "PATCH"):
+            parameters = self.json_parameters()
+        else:
+            parameters = self.parameters()
+        api_path = "/" + "/".join(
+            urllib.parse.quote(self.text(), "/") for _ in range(self.randint(1, 4))
+        )
+        return http_method, api_path, parameters, self.headers()
+
+
+def outcome(function, *args):
+    """The result of a call, or the type of exception it raised"""
+    try:
+        return function(*args)
+    except Exception as e:
+        return type(e)
+
+
+class TestDifferential(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+
+        return super().setUp()
+
+    def reference_components(self, http_method, api_path, parameters, headers):
+        return outcome(
+            reference_hmac.get_authentication_components,
+            IKEY,
+            SKEY,
+            API_HOST,
+            DATE_STRING,
+            http_method,
+            api_path,
+            parameters,
+            headers,
+        )
+
+    def for_each_seed(self, check):
+        for seed in CORPUS_SEEDS:
+            inputs = AdversarialInputs(seed)
+            for iteration in range(ITERATIONS):
+                with self.subTest(seed=seed, iteration=iteration):
+                    check(inputs)
+
+    def test_parameter_canonicalization(self):
+        def check(inputs):
+            parameters = inputs.parameters()
+
+            def fast_path():
+                quoted = duo_hmac_utils.quote_parameters(parameters)
+                return (
+                    duo_canonicalize.canonicalize_quoted_parameters(quoted),
+                    duo_hmac_utils.encode_quoted_parameters(quoted),
+                )
+
+            def reference():
+                normalized = reference_hmac.normalize_parameters(parameters)
+                return (
+                    reference_hmac.canonicalize_parameters(normalized),
+                    urllib.parse.urlencode(normalized, doseq=True),
+                )
+
+            self.assertEqual(outcome(reference), outcome(fast_path))
+            self.assertEqual(
+                outcome(reference_hmac.normalize_parameters, parameters),
+                outcome(duo_hmac_utils.normalize_parameters, parameters),
+            )
+
+        self.for_each_seed(check)
+
+    def test_canonicalize_parameters(self):
+        def check(inputs):
+            normalized = outcome(
+                reference_hmac.normalize_parameters, inputs.parameters()
+            )
+            if isinstance(normalized, dict):
+                self.assertEqual(
+                    outcome(reference_hmac.canonicalize_parameters, normalized),
+                    outcome(duo_canonicalize.canonicalize_parameters, normalized),
+                )
+
+        self.for_each_seed(check)
+
+    def test_jsonize_parameters(self):
+        def check(inputs):
+            parameters = inputs.json_parameters()
+            self.assertEqual(
+                reference_hmac.jsonize_parameters(parameters),
+                duo_hmac_utils.jsonize_parameters(parameters),
+            )
+
+        self.for_each_seed(check)
+
+    def test_x_duo_headers(self):
+        def check(inputs):
+            headers = duo_hmac_utils.extract_x_duo_headers(inputs.headers())
+            self.assertEqual(
+                reference_hmac.canonicalize_x_duo_headers(headers),
+                duo_canonicalize.canonicalize_x_duo_headers(headers),
+            )
+
+        self.for_each_seed(check)
+
+    def test_authentication_components(self):
+        def check(inputs):
+            request = inputs.request()
+            self.assertEqual(
+                self.reference_components(*request),
+                outcome(self.hmac.get_authentication_components, *request),
+            )
+
+        self.for_each_seed(check)
+
+    def test_prepared_request(self):
+        def check(inputs):
+            request = inputs.request()
+            prepared = outcome(self.hmac.prepare_request, *request)
+            if isinstance(prepared, duo_hmac.DuoPreparedRequest):
+                self.assertEqual(self.reference_components(*request), prepared.sign())
+                self.assertEqual(
+                    self.reference_components(*request), prepared.sign(DATE_STRING)
+                )
+
+        self.for_each_seed(check)
+
+    def test_sign_headers_into(self):
+        def check(inputs):
+            http_method, api_path, parameters, headers = inputs.request()
+            out_headers = dict(headers or {})
+
+            def sign_into():
+                uri, body = self.hmac.sign_headers_into(
+                    http_method, api_path, parameters, out_headers
+                )
+                return (uri, body, out_headers)
+
+            self.assertEqual(
+                self.reference_components(http_method, api_path, parameters, headers),
+                outcome(sign_into),
+            )
+
+        self.for_each_seed(check)
+
+    def test_prepared_json_body(self):
+        def check(inputs):
+            http_method = inputs.choice(["POST", "PUT", "PATCH"])
+            parameters = inputs.json_parameters()
+            headers = inputs.headers()
+            body = reference_hmac.jsonize_parameters(parameters)
+
+            self.assertEqual(
+                self.reference_components(http_method, "/path", parameters, headers),
+                self.hmac.prepare_json_request(
+                    http_method, "/path", body, headers
+                ).sign(),
+            )
+
+        self.for_each_seed(check)
+
+    def test_raw_request(self):
+        def check(inputs):
+            request = inputs.request()
+            expected = self.reference_components(*request)
+            if not isinstance(expected, tuple):
+                return
+
+            uri, body, expected_headers = expected
+            api_path, _, query_string = uri[len(API_HOST):].partition("?")
+            prepared = self.hmac.prepare_raw_request(
+                request[0], api_path, query_string, body, request[3]
+            )
+            _, _, actual_headers = prepared.sign()
+
+            self.assertEqual(
+                expected_headers["Authorization"], actual_headers["Authorization"]
+            )
+
+        self.for_each_seed(check)
+
+    def test_accounts_fan_out(self):
+        def check(inputs):
+            http_method, api_path, parameters, headers = inputs.request()
+            if parameters is not None:
+                parameters.pop("account_id", None)
+            children = [
+                duo_accounts.ChildAccount(inputs.text(), f"api-{index}.duosecurity.com")
+                for index in range(inputs.randint(1, 3))
+            ]
+
+            expected = []
+            for child in children:
+                child_parameters = dict(parameters or {})
+                child_parameters["account_id"] = child.account_id
+                expected.append(
+                    outcome(
+                        reference_hmac.get_authentication_components,
+                        IKEY,
+                        SKEY,
+                        child.api_host,
+                        DATE_STRING,
+                        http_method,
+                        api_path,
+                        child_parameters,
+                        headers,
+                    )
+                )
+
+            actual = outcome(
+                duo_accounts.fan_out,
+                self.hmac,
+                http_method,
+                api_path,
+                parameters,
+                children,
+                headers,
+            )
+            if isinstance(actual, list):
+                self.assertEqual(expected, actual)
+            else:
+                self.assertIn(actual, expected)
+
+        self.for_each_seed(check)
+
+    def test_parameter_schema(self):
+        def check(inputs):
+            http_method, api_path, parameters, headers = inputs.request()
+            parameters = {
+                key: value
+                for (key, value) in (parameters or {}).items()
+                if isinstance(key, str)
+            }
+            schema = duo_schema.ParameterSchema(http_method, api_path, list(parameters))
+
+            self.assertEqual(
+                self.reference_components(http_method, api_path, parameters, headers),
+                outcome(
+                    self.hmac.get_schema_components,
+                    schema,
+                    list(parameters.values()),
+                    headers,
+                ),
+            )
+
+        self.for_each_seed(check)
@@ -1,6 +1,8 @@
 # SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
 # SPDX-License-Identifier: MIT
 
+import pickle
+import threading
 import unittest
 
 from duo_hmac import duo_hmac, duo_hmac_utils
@@ -21,6 +23,11 @@ class TestDateStringProvider(duo_hmac_utils.DateStringProvider):
         return DATE_STRING
 
 
+class LaterDateStringProvider(duo_hmac_utils.DateStringProvider):
+    def get_rfc_2822_date_string(self) -> str:
+        return "Fri, 24 May 2024 12:00:05 -0000"
+
+
 class TestHmac(unittest.TestCase):
     def setUp(self) -> None:
         self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, TestDateStringProvider())
@@ -174,3 +181,185 @@ class TestHmac(unittest.TestCase):
 
         with self.assertRaises(TypeError):
             self.hmac.get_authentication_components(HTTP_GET, API_PATH, in_params2)
+
+
+class TestPreparedRequest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, TestDateStringProvider())
+
+        return super().setUp()
+
+    prepared_test_cases = [
+        ("GET without parameters", HTTP_GET, None, None),
+        ("GET with parameters and headers", HTTP_GET, {"foo": "bar"}, {"x-duo-a": "b"}),
+        ("POST with parameters", HTTP_POST, {"foo": "bar", "one": "1"}, None),
+        (
+            "POST with parameters and headers",
+            HTTP_POST,
+            {"foo": "bar"},
+            {"x-duo-a": "b", "other": "c"},
+        ),
+    ]
+
+    def test_sign_matches_components(self):
+        for test_name, method, params, headers in self.prepared_test_cases:
+            with self.subTest(test_name):
+                expected = self.hmac.get_authentication_components(
+                    method, API_PATH, params, headers
+                )
+                prepared = self.hmac.prepare_request(method, API_PATH, params, headers)
+
+                self.assertEqual(expected, prepared.sign())
+                # Signing is repeatable
+                self.assertEqual(expected, prepared.sign())
+
+    def test_resign_with_new_date(self):
+        new_date = LaterDateStringProvider().get_rfc_2822_date_string()
+        later_hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, LaterDateStringProvider())
+
+        for test_name, method, params, headers in self.prepared_test_cases:
+            with self.subTest(test_name):
+                expected = later_hmac.get_authentication_components(
+                    method, API_PATH, params, headers
+                )
+                prepared = self.hmac.prepare_request(method, API_PATH, params, headers)
+                first = prepared.sign()
+
+                self.assertEqual(expected, prepared.sign(new_date))
+                self.assertNotEqual(
+                    first[2]["Authorization"], expected[2]["Authorization"]
+                )
+
+    def test_input_headers_not_modified(self):
+        in_headers = {"x-duo-a": "b"}
+        prepared = self.hmac.prepare_request(HTTP_POST, API_PATH, None, in_headers)
+        prepared.sign()
+
+        self.assertDictEqual({"x-duo-a": "b"}, in_headers)
+
+    def test_skey_change(self):
+        before = self.hmac.get_authentication_components(HTTP_GET, API_PATH)
+        self.hmac.skey = SKEY.upper()
+        after = self.hmac.get_authentication_components(HTTP_GET, API_PATH)
+        expected = duo_hmac.DuoHmac(
+            IKEY, SKEY.upper(), API_HOST, TestDateStringProvider()
+        ).get_authentication_components(HTTP_GET, API_PATH)
+
+        self.assertNotEqual(before, after)
+        self.assertEqual(expected, after)
+
+
+class TestThreadSafety(unittest.TestCase):
+    THREADS = 8
+    ITERATIONS = 200
+
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, TestDateStringProvider())
+
+        return super().setUp()
+
+    def make_request(self, index):
+        method = HTTP_POST if index % 2 else HTTP_GET
+        params = {"index": str(index), "values": [str(v) for v in range(index % 7)]}
+        headers = {"x-duo-index": str(index)}
+        return method, params, headers
+
+    def test_shared_signer(self):
+        # Compute the expected results on a separate signer, single threaded
+        reference = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, TestDateStringProvider())
+        expected = [
+            reference.get_authentication_components(method, API_PATH, params, headers)
+            for method, params, headers in map(self.make_request, range(self.ITERATIONS))
+        ]
+
+        barrier = threading.Barrier(self.THREADS)
+        failures = []
+
+        def worker():
+            barrier.wait()
+            for index in range(self.ITERATIONS):
+                method, params, headers = self.make_request(index)
+                if index % 3:
+                    actual = self.hmac.get_authentication_components(
+                        method, API_PATH, params, headers
+                    )
+                else:
+                    actual = self.hmac.prepare_request(
+                        method, API_PATH, params, headers
+                    ).sign()
+                if actual != expected[index]:
+                    failures.append(index)
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], failures)
+
+    def test_pickle(self):
+        expected = self.hmac.get_authentication_components(HTTP_GET, API_PATH)
+        unpickled = pickle.loads(pickle.dumps(self.hmac))
+
+        actual = unpickled.get_authentication_components(HTTP_GET, API_PATH)
+
+        self.assertEqual(expected, actual)
+
+
+class TestSignHeadersInto(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, TestDateStringProvider())
+
+        return super().setUp()
+
+    sign_into_test_cases = [
+        ("GET without parameters", HTTP_GET, None, {}),
+        ("GET with parameters", HTTP_GET, {"foo": "bar"}, {"x-duo-a": "b", "c": "d"}),
+        ("POST with parameters", HTTP_POST, {"foo": "bar"}, {"x-duo-a": "b", "c": "d"}),
+    ]
+
+    def test_mapping_updated_in_place(self):
+        for test_name, method, params, headers in self.sign_into_test_cases:
+            with self.subTest(test_name):
+                expected = self.hmac.get_authentication_components(
+                    method, API_PATH, params, headers
+                )
+                out_headers = dict(headers)
+                uri, body = self.hmac.sign_headers_into(
+                    method, API_PATH, params, out_headers
+                )
+
+                self.assertEqual(expected, (uri, body, out_headers))
+
+    def test_header_list(self):
+        for test_name, method, params, headers in self.sign_into_test_cases:
+            with self.subTest(test_name):
+                expected = self.hmac.get_authentication_components(
+                    method, API_PATH, params, headers
+                )
+                out_headers = list(headers.items())
+                uri, body = self.hmac.sign_headers_into(
+                    method, API_PATH, params, out_headers, lowercase_names=True
+                )
+
+                self.assertEqual(expected[:2], (uri, body))
+                self.assertEqual(
+                    {key.lower(): value for (key, value) in expected[2].items()},
+                    dict(out_headers),
+                )
+                self.assertEqual(len(expected[2]), len(out_headers))
+
+    def test_resign_header_list(self):
+        out_headers = [("x-duo-a", "b")]
+        self.hmac.sign_headers_into(HTTP_POST, API_PATH, {"foo": "bar"}, out_headers)
+        first = list(out_headers)
+        self.hmac.sign_headers_into(HTTP_POST, API_PATH, {"foo": "bar"}, out_headers)
+
+        self.assertEqual(first, out_headers)
+
+    def test_invalid_header_list(self):
+        with self.assertRaises(ValueError):
+            self.hmac.sign_headers_into(
+                HTTP_GET, API_PATH, None, [("x-duo-a", "1"), ("X-Duo-A", "2")]
+            )
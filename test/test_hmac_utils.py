@@ -1,7 +1,10 @@
 # SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
 # SPDX-License-Identifier: MIT
 
+import os
+import time
 import unittest
+import urllib.parse
 
 from duo_hmac import duo_hmac_utils
 
@@ -173,6 +176,68 @@ class TestNormalizeParameters(unittest.TestCase):
                 self.assertDictEqual(expected, actual)
 
 
+class TestQuoteParameters(unittest.TestCase):
+    test_cases = [
+        ("Empty parameters", {}),
+        ("None parameters", None),
+        ("String value", {"string": "string"}),
+        ("Reserved characters", {"a b&c": ["d=e", "f+g", "h~i", "j%20k"]}),
+        ("All bytes", {"bytes": [bytes(range(256))]}),
+        ("Mixed type list value", {"string": [1, "1", True]}),
+        ("Unicode string list value", {"Šțɍ": ["ì", "И", "Ɠ"]}),
+        ("Large list value", {"usernames": [f"user {i}" for i in range(10000)]}),
+    ]
+
+    def test_matches_normalize_and_quote(self):
+        for test_name, input in self.test_cases:
+            with self.subTest(test_name):
+                expected = {
+                    urllib.parse.quote(key, "~"): [
+                        urllib.parse.quote(val, "~") for val in vals
+                    ]
+                    for (key, vals) in duo_hmac_utils.normalize_parameters(input).items()
+                }
+                actual = duo_hmac_utils.quote_parameters(input)
+
+                self.assertDictEqual(expected, actual)
+
+    def test_query_string_matches_urlencode(self):
+        for test_name, input in self.test_cases:
+            with self.subTest(test_name):
+                expected = urllib.parse.urlencode(
+                    duo_hmac_utils.normalize_parameters(input), doseq=True
+                )
+                actual = duo_hmac_utils.encode_quoted_parameters(
+                    duo_hmac_utils.quote_parameters(input)
+                )
+
+                self.assertEqual(expected, actual)
+
+    unsupported_types_cases = [
+        ("Integer value", {"string": 1}),
+        ("None list value", {"string": [None]}),
+        ("Float list value", {"string": [1.5]}),
+    ]
+
+    def test_unsupported_value_types(self):
+        for test_name, input in self.unsupported_types_cases:
+            with self.subTest(test_name):
+                with self.assertRaises(TypeError):
+                    duo_hmac_utils.quote_parameters(input)
+
+
+class TestParseQueryString(unittest.TestCase):
+    def test_round_trip(self):
+        for test_name, input in TestQuoteParameters.test_cases:
+            with self.subTest(test_name):
+                expected = duo_hmac_utils.normalize_parameters(input)
+                actual = duo_hmac_utils.parse_query_string(
+                    urllib.parse.urlencode(expected, doseq=True)
+                )
+
+                self.assertDictEqual(expected, actual)
+
+
 class TestExtractXDuoHeaders(unittest.TestCase):
     test_cases = [
         ("Empty input", {}, {}),
@@ -232,3 +297,109 @@ class TestExtractXDuoHeaders(unittest.TestCase):
         }
         actual = duo_hmac_utils.extract_x_duo_headers(test_input)
         self.assertEqual(expected, actual)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestSkewCompensatingDateStringProvider(unittest.TestCase):
+    # 2024-05-24 12:00:00 UTC
+    NOW = 1716552000.0
+
+    def setUp(self) -> None:
+        self.clock = FakeClock(self.NOW)
+        self.provider = duo_hmac_utils.SkewCompensatingDateStringProvider(
+            smoothing=0.5, clock=self.clock
+        )
+
+        return super().setUp()
+
+    def test_no_samples(self):
+        self.assertEqual(
+            "Fri, 24 May 2024 12:00:00 -0000",
+            self.provider.get_rfc_2822_date_string(),
+        )
+
+    def test_learns_offset(self):
+        # The server is 30 seconds ahead of us
+        self.provider.observe_server_date("Fri, 24 May 2024 12:00:30 GMT")
+
+        self.assertAlmostEqual(30.5, self.provider.offset)
+        self.assertEqual(
+            "Fri, 24 May 2024 12:00:30 -0000",
+            self.provider.get_rfc_2822_date_string(),
+        )
+
+    def test_zones(self):
+        test_cases = [
+            ("GMT", "Fri, 24 May 2024 12:00:30 GMT", 30.5),
+            ("-0000", "Fri, 24 May 2024 12:00:30 -0000", 30.5),
+            ("+0000", "Fri, 24 May 2024 12:00:30 +0000", 30.5),
+            ("+0100", "Fri, 24 May 2024 13:00:30 +0100", 30.5),
+            ("-0500", "Fri, 24 May 2024 07:00:30 -0500", 30.5),
+        ]
+        # A local zone far from UTC shows any date read as local time
+        saved_tz = os.environ.get("TZ")
+        os.environ["TZ"] = "America/New_York"
+        if hasattr(time, "tzset"):
+            time.tzset()
+        try:
+            for test_name, date_header, expected in test_cases:
+                with self.subTest(test_name):
+                    provider = duo_hmac_utils.SkewCompensatingDateStringProvider(
+                        clock=self.clock
+                    )
+                    provider.observe_server_date(date_header)
+
+                    self.assertAlmostEqual(expected, provider.offset)
+        finally:
+            if saved_tz is None:
+                del os.environ["TZ"]
+            else:
+                os.environ["TZ"] = saved_tz
+            if hasattr(time, "tzset"):
+                time.tzset()
+
+    def test_smooths_offset(self):
+        self.provider.observe_server_date("Fri, 24 May 2024 12:00:30 GMT")
+        self.provider.observe_server_date("Fri, 24 May 2024 12:00:10 GMT")
+
+        self.assertAlmostEqual(20.5, self.provider.offset)
+
+    def test_round_trip_midpoint(self):
+        self.provider.observe_server_date(
+            "Fri, 24 May 2024 11:59:50 GMT", self.NOW - 1.5, self.NOW - 0.5
+        )
+
+        self.assertAlmostEqual(-8.5, self.provider.offset)
+
+    def test_cached_per_second(self):
+        first = self.provider.get_rfc_2822_date_string()
+        self.clock.now += 0.4
+        self.assertIs(first, self.provider.get_rfc_2822_date_string())
+
+        self.clock.now += 1
+        self.assertEqual(
+            "Fri, 24 May 2024 12:00:01 -0000",
+            self.provider.get_rfc_2822_date_string(),
+        )
+
+    bad_input_test_cases = [
+        ("Empty date", ""),
+        ("Not a date", "yesterday"),
+    ]
+
+    def test_bad_date_header(self):
+        for test_name, input in self.bad_input_test_cases:
+            with self.subTest(test_name):
+                with self.assertRaises(ValueError):
+                    self.provider.observe_server_date(input)
+
+    def test_bad_smoothing(self):
+        with self.assertRaises(ValueError):
+            duo_hmac_utils.SkewCompensatingDateStringProvider(smoothing=0)
@@ -42,6 +42,12 @@ class TestValidateHeaders(unittest.TestCase):
                 with self.assertRaises(ValueError):
                     duo_hmac_validation.validate_headers(input)
 
+    def test_header_pairs(self):
+        duo_hmac_validation.validate_headers([("x-duo-a", "A"), ("other", "B")])
+
+        with self.assertRaises(ValueError):
+            duo_hmac_validation.validate_headers([("x-duo-a", "A"), ("X-duo-a", "B")])
+
     def test_duplicate_detection(self):
         input_headers = {
             "x-duo-a": "A",
@@ -56,3 +62,37 @@ class TestValidateHeaders(unittest.TestCase):
 
             for expected_duplicate in expected_duplicates:
                 assert f"{expected_duplicate} is duplicated" in ve.exception.msg
+
+
+class TestValidateAndExtractXDuoHeaders(unittest.TestCase):
+    def test_extracts_sorted_x_duo_headers(self):
+        headers = {
+            "X-Duo-B": "b",
+            "User-Agent": "agent",
+            "x-duo-a": "a",
+            "X-Duo-Date": "Fri, 24 May 2024 12:00:00 -0000",
+        }
+        for form in (headers, list(headers.items())):
+            with self.subTest(form=type(form).__name__):
+                self.assertEqual(
+                    [("x-duo-a", "a"), ("x-duo-b", "b")],
+                    duo_hmac_validation.validate_and_extract_x_duo_headers(form),
+                )
+
+    def test_same_problems_as_validate_headers(self):
+        test_cases = [
+            ("None key", {None: "none key"}),
+            ("None value", {"none value": None}),
+            ("Null character in key", {"\x00" + "null": "value"}),
+            ("Null character in value", {"key": "\x00" + "null"}),
+            ("Duplicate", [("x-duo-a", "A"), ("X-duo-a", "B")]),
+            ("Duplicate date", [("x-duo-date", "A"), ("X-Duo-Date", "B")]),
+        ]
+        for test_name, headers in test_cases:
+            with self.subTest(test_name):
+                with self.assertRaises(ValueError) as expected:
+                    duo_hmac_validation.validate_headers(headers)
+                with self.assertRaises(ValueError) as actual:
+                    duo_hmac_validation.validate_and_extract_x_duo_headers(headers)
+
+                self.assertEqual(str(expected.exception), str(actual.exception))
@@ -0,0 +1,172 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import base64
+import hashlib
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_hmac, duo_hmac_verify
+
+API_PATH = "/api/path"
+
+
+class TestParseAuthorizationHeader(unittest.TestCase):
+    bad_header_test_cases = [
+        ("Missing header", None),
+        ("Empty header", ""),
+        ("Wrong scheme", "Bearer abc"),
+        ("Not base 64", "Basic !!!!"),
+        ("No separator", "Basic RElBQkNE"),
+        ("Short signature", "Basic RElBQkNEOmFiY2Rl"),
+        ("Non-ASCII signature", "Basic RElBQkM6w6k="),
+        (
+            "Uppercase signature",
+            "Basic " + base64.b64encode(b"DIABC:" + b"A" * 128).decode("ascii"),
+        ),
+    ]
+
+    def test_bad_headers(self):
+        for test_name, input in self.bad_header_test_cases:
+            with self.subTest(test_name):
+                with self.assertRaises(ValueError):
+                    duo_hmac_verify.parse_authorization_header(input)
+
+    def test_round_trip(self):
+        duo = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+        _, _, headers = duo.get_authentication_components("GET", API_PATH)
+
+        ikey, signature = duo_hmac_verify.parse_authorization_header(
+            headers["Authorization"]
+        )
+        self.assertEqual(IKEY, ikey)
+        self.assertEqual(128, len(signature))
+
+
+class TestDuoHmacVerifier(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+        self.verifier = duo_hmac_verify.DuoHmacVerifier({IKEY: SKEY})
+
+        return super().setUp()
+
+    def sign_and_split(self, method, params, headers=None):
+        uri, body, out_headers = self.hmac.get_authentication_components(
+            method, API_PATH, params, headers
+        )
+        path, _, query_string = uri[len(API_HOST):].partition("?")
+        return path, query_string, body, out_headers
+
+    signed_request_test_cases = [
+        ("GET without parameters", "GET", None, None),
+        ("GET with parameters", "GET", {"foo": "bar", "list": ["a b", "c~d"]}, None),
+        ("GET with unicode", "GET", {"Šțɍ": ["ì", "И", "Ɠ"]}, None),
+        ("POST with parameters", "POST", {"foo": "bar", "one": 1}, None),
+        ("POST with x-duo headers", "POST", {"foo": "bar"}, {"X-Duo-Foo": "bar"}),
+    ]
+
+    def test_signed_requests(self):
+        for test_name, method, params, headers in self.signed_request_test_cases:
+            with self.subTest(test_name):
+                path, query_string, body, out_headers = self.sign_and_split(
+                    method, params, headers
+                )
+                actual = self.verifier.verify(
+                    method, API_HOST, path, query_string, body, out_headers
+                )
+                self.assertEqual(IKEY, actual)
+
+    def test_bytes_body(self):
+        path, query_string, body, out_headers = self.sign_and_split(
+            "POST", {"foo": "bar"}
+        )
+        actual = self.verifier.verify(
+            "POST", API_HOST, path, query_string, body.encode("utf-8"), out_headers
+        )
+        self.assertEqual(IKEY, actual)
+
+    def test_body_hash(self):
+        path, query_string, body, out_headers = self.sign_and_split(
+            "POST", {"foo": "bar"}
+        )
+        body_hash = hashlib.sha512(body.encode("utf-8")).hexdigest()
+        actual = self.verifier.verify_body_hash(
+            "POST", API_HOST, path, query_string, body_hash, out_headers
+        )
+        self.assertEqual(IKEY, actual)
+
+        with self.assertRaises(ValueError):
+            self.verifier.verify_body_hash(
+                "POST", API_HOST, path, query_string, body_hash[::-1], out_headers
+            )
+
+    def test_tampered_requests(self):
+        path, query_string, body, out_headers = self.sign_and_split(
+            "GET", {"foo": "bar"}
+        )
+        tampered_test_cases = [
+            ("Different method", "POST", API_HOST, path, query_string),
+            ("Different host", "GET", "api-yyyy.duosecurity.com", path, query_string),
+            ("Different path", "GET", API_HOST, "/api/other", query_string),
+            ("Different parameters", "GET", API_HOST, path, "foo=baz"),
+        ]
+
+        for test_name, method, host, path, query_string in tampered_test_cases:
+            with self.subTest(test_name):
+                with self.assertRaises(ValueError):
+                    self.verifier.verify(
+                        method, host, path, query_string, body, out_headers
+                    )
+
+    def test_unknown_ikey(self):
+        verifier = duo_hmac_verify.DuoHmacVerifier({"DIOTHER": SKEY})
+        path, query_string, body, out_headers = self.sign_and_split("GET", None)
+
+        with self.assertRaises(ValueError):
+            verifier.verify("GET", API_HOST, path, query_string, body, out_headers)
+
+    def test_wrong_skey(self):
+        verifier = duo_hmac_verify.DuoHmacVerifier({IKEY: SKEY.upper()})
+        path, query_string, body, out_headers = self.sign_and_split("GET", None)
+
+        with self.assertRaises(ValueError):
+            verifier.verify("GET", API_HOST, path, query_string, body, out_headers)
+
+    def test_historical_skeys(self):
+        path, query_string, body, out_headers = self.sign_and_split("GET", None)
+        test_cases = [
+            ("Current key", [SKEY, SKEY.upper()], True),
+            ("Historical key", [SKEY.upper(), SKEY], True),
+            ("Neither key", [SKEY.upper(), SKEY[::-1]], False),
+            ("No keys", [], False),
+        ]
+        for test_name, skeys, valid in test_cases:
+            with self.subTest(test_name):
+                verifier = duo_hmac_verify.DuoHmacVerifier({IKEY: skeys})
+                if valid:
+                    actual = verifier.verify(
+                        "GET", API_HOST, path, query_string, body, out_headers
+                    )
+                    self.assertEqual(IKEY, actual)
+                else:
+                    with self.assertRaises(ValueError):
+                        verifier.verify(
+                            "GET", API_HOST, path, query_string, body, out_headers
+                        )
+
+    def test_non_ascii_signature(self):
+        path, query_string, body, out_headers = self.sign_and_split("GET", None)
+        out_headers["Authorization"] = "Basic " + base64.b64encode(
+            f"{IKEY}:é".encode("utf-8")
+        ).decode("ascii")
+
+        with self.assertRaises(ValueError):
+            self.verifier.verify("GET", API_HOST, path, query_string, body, out_headers)
+
+    def test_missing_date(self):
+        path, query_string, body, out_headers = self.sign_and_split("GET", None)
+        del out_headers["x-duo-date"]
+
+        with self.assertRaises(ValueError):
+            self.verifier.verify("GET", API_HOST, path, query_string, body, out_headers)
@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import unittest
+
+from signing_fixtures import IKEY, SKEY
+
+from duo_hmac import duo_hmac, duo_hmac_utils, duo_stand_in
+
+try:
+    import httpx
+
+    from duo_hmac import duo_httpx_auth
+except ImportError:
+    httpx = None
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestDuoHttpxAuth(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = duo_stand_in.start_threaded_server(
+            duo_stand_in.StandInApi({IKEY: SKEY})
+        )
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, self.server.api_host)
+        self.auth = duo_httpx_auth.DuoHttpxAuth(self.hmac)
+        self.base_url = f"http://{self.server.api_host}"
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+        return super().tearDown()
+
+    def test_pooled_client(self):
+        with httpx.Client(auth=self.auth, base_url=self.base_url) as client:
+            for offset in range(0, 300, 100):
+                with self.subTest(offset=offset):
+                    response = client.get(
+                        "/admin/v1/users",
+                        params={"limit": "100", "offset": str(offset)},
+                    )
+                    self.assertEqual(200, response.status_code)
+
+            response = client.get(
+                "/auth/v2/check", params={"a b": ["c&d", "é~", ""]}
+            )
+            self.assertEqual(200, response.status_code)
+
+            response = client.post(
+                "/auth/v2/check",
+                content=duo_hmac_utils.jsonize_parameters({"username": "someone"}),
+                headers={"Content-Type": "application/json", "X-Duo-Extra": "value"},
+            )
+            self.assertEqual(200, response.status_code)
+
+    def test_async_client(self):
+        async def call_api():
+            async with httpx.AsyncClient(
+                auth=self.auth, base_url=self.base_url
+            ) as client:
+                return await asyncio.gather(
+                    client.get("/auth/v2/check"),
+                    client.post(
+                        "/auth/v2/check",
+                        content=duo_hmac_utils.jsonize_parameters({"username": "a"}),
+                        headers={"Content-Type": "application/json"},
+                    ),
+                    client.get("/admin/v1/settings"),
+                )
+
+        responses = asyncio.run(call_api())
+        self.assertEqual([200, 200, 200], [r.status_code for r in responses])
+
+    def test_wrong_skey(self):
+        wrong_skey = duo_hmac.DuoHmac(IKEY, SKEY.upper(), self.server.api_host)
+        auth = duo_httpx_auth.DuoHttpxAuth(wrong_skey)
+        with httpx.Client(auth=auth, base_url=self.base_url) as client:
+            self.assertEqual(401, client.get("/auth/v2/check").status_code)
@@ -0,0 +1,386 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import base64
+import io
+import json
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_hmac, duo_hmac_verify, duo_middleware
+
+
+def sign(http_method, api_path, parameters):
+    """Return (path, query string, body bytes, headers) of a signed request"""
+    hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+    uri, body, headers = hmac.get_authentication_components(
+        http_method, api_path, parameters, {"X-Duo-Extra": "extra"}
+    )
+    path, _, query_string = uri[len(API_HOST):].partition("?")
+    return (path, query_string, (body or "").encode("utf-8"), headers)
+
+
+def wsgi_environ(http_method, path, query_string, body, headers):
+    environ = {
+        "REQUEST_METHOD": http_method,
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path,
+        "QUERY_STRING": query_string,
+        "CONTENT_LENGTH": str(len(body)) if body else "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "8080",
+        "HTTP_HOST": API_HOST,
+        "wsgi.url_scheme": "https",
+        "wsgi.input": io.BytesIO(body),
+    }
+    for name, value in headers.items():
+        key = name.upper().replace("-", "_")
+        if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[key] = value
+        else:
+            environ["HTTP_" + key] = value
+    return environ
+
+
+def wsgi_app(environ, start_response):
+    """Echo the body and the verified IKEY"""
+    content = {
+        "ikey": environ[duo_middleware.IKEY_KEY],
+        "body": environ["wsgi.input"].read().decode("utf-8"),
+    }
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps(content).encode("utf-8")]
+
+
+class TestWsgiMiddleware(unittest.TestCase):
+    def setUp(self) -> None:
+        verifier = duo_hmac_verify.DuoHmacVerifier({IKEY: SKEY})
+        self.middleware = duo_middleware.DuoHmacWsgiMiddleware(wsgi_app, verifier)
+
+        return super().setUp()
+
+    def call(self, environ, middleware=None):
+        started = []
+        result = (middleware or self.middleware)(
+            environ, lambda status, headers: started.append(status)
+        )
+        # As a WSGI server would
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        return (started[0], json.loads(content))
+
+    def test_verified(self):
+        test_cases = [
+            ("GET", "/admin/v1/users", {"limit": "300", "offset": "0"}),
+            ("GET", "/admin/v1/info/summary", None),
+            ("POST", "/auth/v2/auth", {"username": "someone", "factor": "push"}),
+            ("DELETE", "/admin/v1/users/DU123", {"force": "true"}),
+            ("PUT", "/admin/v1/users/DU123", {"realname": "Söme Öne " * 20000}),
+        ]
+        for http_method, api_path, parameters in test_cases:
+            with self.subTest(http_method=http_method, api_path=api_path):
+                path, query_string, body, headers = sign(
+                    http_method, api_path, parameters
+                )
+                status, content = self.call(
+                    wsgi_environ(http_method, path, query_string, body, headers)
+                )
+
+                self.assertEqual("200 OK", status)
+                self.assertEqual(IKEY, content["ikey"])
+                self.assertEqual(body.decode("utf-8"), content["body"])
+
+    def test_rejected(self):
+        path, query_string, body, headers = sign(
+            "POST", "/auth/v2/auth", {"username": "someone"}
+        )
+        test_cases = [
+            ("tampered body", {"wsgi.input": io.BytesIO(body.replace(b"some", b"any"))}),
+            ("wrong host", {"HTTP_HOST": "api-yyyyyyyy.duosecurity.com"}),
+            ("wrong path", {"PATH_INFO": "/auth/v2/preauth"}),
+            ("tampered x-duo header", {"HTTP_X_DUO_EXTRA": "changed"}),
+            ("no authorization", {"HTTP_AUTHORIZATION": ""}),
+        ]
+        for name, changes in test_cases:
+            with self.subTest(name=name):
+                environ = wsgi_environ("POST", path, query_string, body, headers)
+                environ.update(changes)
+                status, content = self.call(environ)
+
+                self.assertEqual("401 Unauthorized", status)
+                self.assertEqual("FAIL", content["stat"])
+                self.assertEqual(40101, content["code"])
+
+    def test_chunked_body(self):
+        path, query_string, body, headers = sign(
+            "POST", "/auth/v2/auth", {"username": "someone"}
+        )
+        environ = wsgi_environ("POST", path, query_string, body, headers)
+        del environ["CONTENT_LENGTH"]
+        environ["wsgi.input_terminated"] = True
+        status, content = self.call(environ)
+
+        self.assertEqual("200 OK", status)
+        self.assertEqual(body.decode("utf-8"), content["body"])
+
+    def test_chunked_body_too_large(self):
+        path, query_string, body, headers = sign(
+            "POST", "/admin/v1/users", {"realname": "x" * 1000}
+        )
+        middleware = duo_middleware.DuoHmacWsgiMiddleware(
+            wsgi_app, self.middleware.verifier, max_body_size=100
+        )
+        environ = wsgi_environ("POST", path, query_string, body, headers)
+        del environ["CONTENT_LENGTH"]
+        environ["wsgi.input_terminated"] = True
+        status, content = self.call(environ, middleware)
+
+        self.assertEqual("413 Payload Too Large", status)
+        # No more than one byte past the limit was read
+        self.assertEqual(101, environ["wsgi.input"].tell())
+
+    def test_bad_content_length(self):
+        path, query_string, body, headers = sign(
+            "POST", "/auth/v2/auth", {"username": "someone"}
+        )
+        for content_length in ("-1", "-100000", "ten"):
+            with self.subTest(content_length=content_length):
+                environ = wsgi_environ("POST", path, query_string, body, headers)
+                environ["CONTENT_LENGTH"] = content_length
+                status, content = self.call(environ)
+
+                self.assertEqual("400 Bad Request", status)
+                self.assertEqual(0, environ["wsgi.input"].tell())
+
+    def test_non_ascii_signature(self):
+        path, query_string, body, headers = sign("GET", "/admin/v1/users", None)
+        environ = wsgi_environ("GET", path, query_string, body, headers)
+        environ["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(
+            f"{IKEY}:é".encode("utf-8")
+        ).decode("ascii")
+
+        self.assertEqual("401 Unauthorized", self.call(environ)[0])
+
+    def test_body_closed_with_response(self):
+        path, query_string, body, headers = sign(
+            "POST", "/auth/v2/auth", {"username": "someone"}
+        )
+        environ = wsgi_environ("POST", path, query_string, body, headers)
+        self.call(environ)
+
+        self.assertTrue(environ["wsgi.input"].closed)
+
+    def test_raw_uri(self):
+        path, query_string, body, headers = sign("GET", "/admin/v1/a%20b", None)
+        environ = wsgi_environ("GET", "/admin/v1/a b", query_string, body, headers)
+        self.assertEqual("401 Unauthorized", self.call(dict(environ))[0])
+
+        environ["RAW_URI"] = path
+        self.assertEqual("200 OK", self.call(environ)[0])
+
+    def test_configured_api_host(self):
+        path, query_string, body, headers = sign("GET", "/admin/v1/users", None)
+        environ = wsgi_environ("GET", path, query_string, body, headers)
+        environ["HTTP_HOST"] = "internal:8080"
+        middleware = duo_middleware.DuoHmacWsgiMiddleware(
+            wsgi_app, self.middleware.verifier, api_host=API_HOST
+        )
+
+        self.assertEqual("200 OK", self.call(environ, middleware)[0])
+
+    def test_body_spooled_to_disk(self):
+        parameters = {"realname": "x" * 100000}
+        path, query_string, body, headers = sign("POST", "/admin/v1/users", parameters)
+        middleware = duo_middleware.DuoHmacWsgiMiddleware(
+            wsgi_app, self.middleware.verifier, spool_size=1024
+        )
+        status, content = self.call(
+            wsgi_environ("POST", path, query_string, body, headers), middleware
+        )
+
+        self.assertEqual("200 OK", status)
+        self.assertEqual(body.decode("utf-8"), content["body"])
+
+    def test_body_too_large(self):
+        path, query_string, body, headers = sign(
+            "POST", "/admin/v1/users", {"realname": "x" * 1000}
+        )
+        middleware = duo_middleware.DuoHmacWsgiMiddleware(
+            wsgi_app, self.middleware.verifier, max_body_size=100
+        )
+        environ = wsgi_environ("POST", path, query_string, body, headers)
+        status, content = self.call(environ, middleware)
+
+        self.assertEqual("413 Payload Too Large", status)
+        self.assertEqual(41301, content["code"])
+        # The body was not read
+        self.assertEqual(0, environ["wsgi.input"].tell())
+
+
+def asgi_scope(http_method, path, query_string, headers, host=API_HOST):
+    raw_headers = [(b"host", host.encode("latin-1"))] + [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for (name, value) in headers.items()
+    ]
+    return {
+        "type": "http",
+        "method": http_method,
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query_string.encode("latin-1"),
+        "headers": raw_headers,
+    }
+
+
+async def asgi_app(scope, receive, send):
+    """Echo the body and the verified IKEY"""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    content = {
+        "ikey": scope[duo_middleware.IKEY_KEY],
+        "body": b"".join(chunks).decode("utf-8"),
+        "messages": len(chunks),
+    }
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": json.dumps(content).encode()})
+
+
+def run_asgi(middleware, scope, body=b"", chunk_size=None):
+    chunk_size = chunk_size or max(len(body), 1)
+    messages = [
+        {
+            "type": "http.request",
+            "body": body[start: start + chunk_size],
+            "more_body": start + chunk_size < len(body),
+        }
+        for start in range(0, max(len(body), 1), chunk_size)
+    ]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return (sent[0]["status"], json.loads(sent[1]["body"]))
+
+
+class TestAsgiMiddleware(unittest.TestCase):
+    def setUp(self) -> None:
+        verifier = duo_hmac_verify.DuoHmacVerifier({IKEY: SKEY})
+        self.middleware = duo_middleware.DuoHmacAsgiMiddleware(asgi_app, verifier)
+
+        return super().setUp()
+
+    def test_verified(self):
+        test_cases = [
+            ("GET", "/admin/v1/users", {"limit": "300", "offset": "0"}, None),
+            ("GET", "/admin/v1/info/summary", None, None),
+            ("POST", "/auth/v2/auth", {"username": "someone"}, None),
+            ("POST", "/auth/v2/auth", {"username": "someone"}, 7),
+            ("PUT", "/admin/v1/users/DU123", {"realname": "Söme Öne " * 20000}, 65536),
+        ]
+        for http_method, api_path, parameters, chunk_size in test_cases:
+            with self.subTest(http_method=http_method, chunk_size=chunk_size):
+                path, query_string, body, headers = sign(
+                    http_method, api_path, parameters
+                )
+                status, content = run_asgi(
+                    self.middleware,
+                    asgi_scope(http_method, path, query_string, headers),
+                    body,
+                    chunk_size,
+                )
+
+                self.assertEqual(200, status)
+                self.assertEqual(IKEY, content["ikey"])
+                self.assertEqual(body.decode("utf-8"), content["body"])
+                # The application sees the messages as they were received
+                expected = -(-len(body) // chunk_size) if chunk_size else 1
+                self.assertEqual(expected, content["messages"])
+
+    def test_offloaded_hashing(self):
+        parameters = {"realname": "x" * 100000}
+        path, query_string, body, headers = sign("POST", "/admin/v1/users", parameters)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            middleware = duo_middleware.DuoHmacAsgiMiddleware(
+                asgi_app,
+                self.middleware.verifier,
+                offload_threshold=1024,
+                executor=executor,
+            )
+            status, content = run_asgi(
+                middleware,
+                asgi_scope("POST", path, query_string, headers),
+                body,
+                4096,
+            )
+
+        self.assertEqual(200, status)
+        self.assertEqual(body.decode("utf-8"), content["body"])
+
+    def test_rejected(self):
+        path, query_string, body, headers = sign(
+            "POST", "/auth/v2/auth", {"username": "someone"}
+        )
+        test_cases = [
+            ("tampered body", asgi_scope("POST", path, query_string, headers), b"{}"),
+            (
+                "wrong host",
+                asgi_scope("POST", path, query_string, headers, host="elsewhere"),
+                body,
+            ),
+            (
+                "wrong method",
+                asgi_scope("PUT", path, query_string, headers),
+                body,
+            ),
+        ]
+        for name, scope, request_body in test_cases:
+            with self.subTest(name=name):
+                status, content = run_asgi(self.middleware, scope, request_body)
+
+                self.assertEqual(401, status)
+                self.assertEqual(40101, content["code"])
+
+    def test_body_too_large(self):
+        path, query_string, body, headers = sign(
+            "POST", "/admin/v1/users", {"realname": "x" * 1000}
+        )
+        middleware = duo_middleware.DuoHmacAsgiMiddleware(
+            asgi_app, self.middleware.verifier, max_body_size=100
+        )
+        status, content = run_asgi(
+            middleware, asgi_scope("POST", path, query_string, headers), body, 64
+        )
+
+        self.assertEqual(413, status)
+        self.assertEqual(41301, content["code"])
+
+    def test_other_scopes_pass_through(self):
+        scopes = []
+
+        async def app(scope, receive, send):
+            scopes.append(scope)
+
+        middleware = duo_middleware.DuoHmacAsgiMiddleware(
+            app, self.middleware.verifier
+        )
+        asyncio.run(middleware({"type": "lifespan"}, None, None))
+
+        self.assertEqual([{"type": "lifespan"}], scopes)
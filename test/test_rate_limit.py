@@ -0,0 +1,246 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import http.client
+import random
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY
+
+from duo_hmac import duo_hmac, duo_hmac_utils, duo_rate_limit, duo_stand_in
+
+
+class CountingDateStringProvider(duo_hmac_utils.DateStringProvider):
+    """Issue a different date for every signature"""
+
+    def __init__(self):
+        self.count = 0
+
+    def get_rfc_2822_date_string(self) -> str:
+        self.count += 1
+        return f"Fri, 24 May 2024 12:00:{self.count:02d} -0000"
+
+
+class FakeClock:
+    """A clock that only moves when something sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+
+        return super().setUp()
+
+    def test_burst_then_paced(self):
+        bucket = duo_rate_limit.TokenBucket(
+            10, burst=2, clock=self.clock, sleep=self.clock.sleep
+        )
+        for _ in range(12):
+            bucket.acquire()
+
+        # Two tokens up front, then one every 0.1 seconds
+        self.assertAlmostEqual(1.0, self.clock.now)
+
+    def test_try_acquire(self):
+        bucket = duo_rate_limit.TokenBucket(4, burst=1, clock=self.clock)
+
+        self.assertEqual(0, bucket.try_acquire())
+        self.assertAlmostEqual(0.25, bucket.try_acquire())
+        self.clock.now = 0.25
+        self.assertEqual(0, bucket.try_acquire())
+
+    def test_pause(self):
+        bucket = duo_rate_limit.TokenBucket(100, burst=5, clock=self.clock)
+        bucket.pause(2.0)
+
+        self.assertAlmostEqual(2.0, bucket.try_acquire())
+        self.clock.now = 2.0
+        self.assertEqual(0, bucket.try_acquire())
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            duo_rate_limit.TokenBucket(0)
+
+
+class TestAdaptiveTokenBucket(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.bucket = duo_rate_limit.AdaptiveTokenBucket(
+            100,
+            min_rate=1,
+            additive_increase=100,
+            backoff_base=1.0,
+            clock=self.clock,
+            sleep=self.clock.sleep,
+            jitter=random.Random(1),
+        )
+
+        return super().setUp()
+
+    def test_throttled_halves_rate_and_backs_off(self):
+        backoffs = []
+        for expected_rate in [50, 25, 12.5, 6.25]:
+            backoffs.append(self.bucket.throttled())
+            self.assertEqual(expected_rate, self.bucket.rate)
+
+        # Full jitter under a doubling ceiling
+        for attempt, backoff in enumerate(backoffs):
+            self.assertLessEqual(0, backoff)
+            self.assertLessEqual(backoff, 2**attempt)
+
+        self.assertGreater(self.bucket.try_acquire(), 0)
+
+    def test_min_rate(self):
+        for _ in range(20):
+            self.bucket.throttled()
+        self.assertEqual(1, self.bucket.rate)
+
+    def test_succeeded_recovers_to_max_rate(self):
+        self.bucket.throttled()
+        self.bucket.succeeded()
+        self.assertEqual(52, self.bucket.rate)
+
+        for _ in range(1000):
+            self.bucket.succeeded()
+        self.assertEqual(100, self.bucket.rate)
+
+
+class TestRateLimitedScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dates = CountingDateStringProvider()
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, self.dates)
+        self.clock = FakeClock()
+        self.scheduler = duo_rate_limit.RateLimitedScheduler(
+            100,
+            max_attempts=3,
+            bucket_factory=lambda rate: duo_rate_limit.AdaptiveTokenBucket(
+                rate, clock=self.clock, sleep=self.clock.sleep
+            ),
+        )
+
+        return super().setUp()
+
+    def test_signs_each_attempt(self):
+        sent = []
+
+        def send(http_method, uri, body, headers):
+            sent.append(headers["x-duo-date"])
+            return (429, None) if len(sent) < 3 else (200, "done")
+
+        self.assertEqual(
+            (200, "done"), self.scheduler.call(self.hmac, "GET", "/x", None, send)
+        )
+        self.assertEqual(3, len(set(sent)))
+
+    def test_gives_up_after_max_attempts(self):
+        calls = []
+
+        def send(http_method, uri, body, headers):
+            calls.append(uri)
+            return (429, "slow down")
+
+        self.assertEqual(
+            (429, "slow down"),
+            self.scheduler.call(self.hmac, "GET", "/x", {"a": "1"}, send),
+        )
+        self.assertEqual(3, len(calls))
+
+    def test_one_bucket_per_host_and_ikey(self):
+        other_host = duo_hmac.DuoHmac(IKEY, SKEY, "api-other.duosecurity.com")
+        same = duo_hmac.DuoHmac(IKEY, "another skey", API_HOST.upper())
+
+        bucket = self.scheduler.bucket_for(self.hmac)
+        self.assertIs(bucket, self.scheduler.bucket_for(same))
+        self.assertIsNot(bucket, self.scheduler.bucket_for(other_host))
+
+
+class TestSchedulerAgainstStandIn(unittest.TestCase):
+    """
+    The scheduler and the stand-in's rate limiter share a fake clock that
+    only the scheduler's backoffs move, so pacing does not depend on how
+    fast the machine running the tests is
+    """
+
+    def start(self, rate_limit=0.0, **api_options):
+        self.clock = FakeClock()
+        self.api = duo_stand_in.StandInApi({IKEY: SKEY}, seed=1, **api_options)
+        if rate_limit:
+            self.api.rate_limiter = duo_rate_limit.TokenBucket(
+                rate_limit, clock=self.clock
+            )
+        self.server = duo_stand_in.start_threaded_server(self.api)
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, self.server.api_host)
+        self.statuses = []
+        self.connection = http.client.HTTPConnection(self.server.api_host)
+
+    def tearDown(self) -> None:
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+        return super().tearDown()
+
+    def bucket_factory(self, **options):
+        return lambda rate: duo_rate_limit.AdaptiveTokenBucket(
+            rate,
+            clock=self.clock,
+            sleep=self.clock.sleep,
+            jitter=random.Random(0),
+            **options,
+        )
+
+    def send(self, http_method, uri, body, headers):
+        self.connection.request(
+            http_method, uri[len(self.server.api_host):], body, headers
+        )
+        response = self.connection.getresponse()
+        response.read()
+        self.statuses.append(response.status)
+        return (response.status, None)
+
+    def run_requests(self, scheduler, count):
+        requests = [("GET", "/auth/v2/check", None)] * count
+        return [scheduler.call(self.hmac, *request, self.send) for request in requests]
+
+    def test_injected_429s(self):
+        self.start(fail_429_rate=0.3)
+        scheduler = duo_rate_limit.RateLimitedScheduler(
+            1000,
+            max_attempts=20,
+            # Random 429s say nothing about the real limit, so keep the rate up
+            bucket_factory=self.bucket_factory(min_rate=500, backoff_base=0.001),
+        )
+
+        results = self.run_requests(scheduler, 40)
+
+        self.assertEqual([200] * 40, [status for status, _ in results])
+        self.assertIn(429, self.statuses)
+
+    def test_adapts_to_server_rate_limit(self):
+        self.start(rate_limit=200)
+        scheduler = duo_rate_limit.RateLimitedScheduler(
+            1000,
+            max_attempts=20,
+            bucket_factory=self.bucket_factory(
+                additive_increase=200, backoff_base=0.01
+            ),
+        )
+
+        results = self.run_requests(scheduler, 200)
+
+        self.assertEqual([200] * 200, [status for status, _ in results])
+        # Rejected requests are a small fraction of those sent
+        self.assertIn(429, self.statuses)
+        self.assertLess(self.statuses.count(429), 40)
+        # and accepted requests came no faster than the server's limit
+        # allows, after its initial burst of 20
+        self.assertLessEqual(200 - 20, 200 * self.clock.now + 1)
@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import unittest
+
+from signing_fixtures import IKEY, SKEY
+
+from duo_hmac import duo_hmac, duo_hmac_utils, duo_stand_in
+
+try:
+    import requests
+
+    from duo_hmac import duo_requests_auth
+except ImportError:
+    requests = None
+
+
+@unittest.skipIf(requests is None, "requests is not installed")
+class TestDuoRequestsAuth(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = duo_stand_in.start_threaded_server(
+            duo_stand_in.StandInApi({IKEY: SKEY})
+        )
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, self.server.api_host)
+        self.base_url = f"http://{self.server.api_host}"
+        self.session = requests.Session()
+        self.session.auth = duo_requests_auth.DuoRequestsAuth(self.hmac)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+        return super().tearDown()
+
+    def test_pooled_get_requests(self):
+        for offset in range(0, 300, 100):
+            with self.subTest(offset=offset):
+                response = self.session.get(
+                    f"{self.base_url}/admin/v1/users",
+                    params={"limit": "100", "offset": str(offset)},
+                )
+                self.assertEqual(200, response.status_code)
+                self.assertEqual(100, len(response.json()["response"]))
+
+    def test_get_with_reserved_characters(self):
+        response = self.session.get(
+            f"{self.base_url}/auth/v2/check",
+            params={"a b": ["c&d", "é~", ""], "list": ["2", "1"]},
+        )
+        self.assertEqual(200, response.status_code)
+
+    def test_post_json_body(self):
+        response = self.session.post(
+            f"{self.base_url}/auth/v2/check",
+            data=duo_hmac_utils.jsonize_parameters(
+                {"username": "someone", "factor": "push"}
+            ),
+            headers={"Content-Type": "application/json", "X-Duo-Extra": "value"},
+        )
+        self.assertEqual(200, response.status_code)
+
+    def test_post_prejsonized_body(self):
+        response = self.session.post(
+            f"{self.base_url}/auth/v2/check",
+            data='{"username":"someone"}',
+            headers={"Content-Type": "application/json"},
+        )
+        self.assertEqual(200, response.status_code)
+
+    def test_wrong_skey(self):
+        wrong_skey = duo_hmac.DuoHmac(IKEY, SKEY.upper(), self.server.api_host)
+        response = self.session.get(
+            f"{self.base_url}/auth/v2/check",
+            auth=duo_requests_auth.DuoRequestsAuth(wrong_skey),
+        )
+        self.assertEqual(401, response.status_code)
+
+    def test_wrong_host(self):
+        with self.assertRaises(ValueError):
+            self.session.get("http://localhost:1/auth/v2/check")
@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_hmac, duo_schema
+
+AUTH_KEYS = ("username", "factor", "device", "ipaddr")
+
+
+class TestParameterSchema(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+
+        return super().setUp()
+
+    def test_matches_generic_path(self):
+        test_cases = [
+            ("POST", "/auth/v2/auth", AUTH_KEYS, ("someone", "push", "auto", "1.2.3.4")),
+            ("GET", "/auth/v2/auth", AUTH_KEYS, ("some one", "push", "auto", "::1")),
+            ("GET", "/admin/v1/users", ("z", "a", "m"), (["2", "1"], "ü", [True, 5])),
+            ("GET", "/admin/v1/users", ("~key", "key with space"), ("a+b", "%20")),
+            ("PUT", "/admin/v1/x", ("b", "a"), ({"nested": [1, None]}, "ü")),
+            ("DELETE", "/admin/v1/x", (), ()),
+            ("POST", "/admin/v1/x", (), ()),
+        ]
+        for http_method, api_path, keys, values in test_cases:
+            with self.subTest(http_method=http_method, keys=keys):
+                schema = duo_schema.ParameterSchema(http_method, api_path, keys)
+                self.assertEqual(
+                    self.hmac.get_authentication_components(
+                        http_method, api_path, dict(zip(keys, values))
+                    ),
+                    self.hmac.get_schema_components(schema, values),
+                )
+
+    def test_headers(self):
+        schema = duo_schema.ParameterSchema("GET", "/auth/v2/check", ())
+        headers = {"X-Duo-Trace": "abc", "User-Agent": "test"}
+
+        self.assertEqual(
+            self.hmac.get_authentication_components(
+                "GET", "/auth/v2/check", {}, headers
+            ),
+            self.hmac.get_schema_components(schema, (), headers),
+        )
+
+    def test_prepared_request_can_be_resigned(self):
+        schema = duo_schema.ParameterSchema("POST", "/auth/v2/auth", AUTH_KEYS)
+        prepared = self.hmac.prepare_schema_request(schema, ("a", "push", "auto", ""))
+
+        self.assertEqual(prepared.sign(), prepared.sign())
+
+    def test_wrong_number_of_values(self):
+        schema = duo_schema.ParameterSchema("GET", "/auth/v2/auth", AUTH_KEYS)
+        with self.assertRaises(ValueError):
+            self.hmac.get_schema_components(schema, ("someone", "push"))
+
+    def test_invalid_keys(self):
+        test_cases = [("a", "a"), ("a", b"b")]
+        for keys in test_cases:
+            with self.subTest(keys=keys):
+                with self.assertRaises(ValueError):
+                    duo_schema.ParameterSchema("GET", "/path", keys)
+
+    def test_invalid_headers(self):
+        schema = duo_schema.ParameterSchema("GET", "/path", ())
+        with self.assertRaises(ValueError):
+            self.hmac.get_schema_components(schema, (), {"X-Duo-A": "1", "x-duo-a": "2"})
@@ -0,0 +1,244 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_hmac, duo_sign_daemon
+
+OTHER_IKEY = "DIZYXWVUTSRQPONMLKJI"
+OTHER_SKEY = "othrothrothrothrothrothrothrothrothrothr"
+OTHER_API_HOST = "api-yyyyyyyy.duosecurity.com"
+
+
+@unittest.skipIf(not hasattr(socket, "AF_UNIX"), "Unix sockets are not available")
+class TestSigningDaemon(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+        self.other_hmac = duo_hmac.DuoHmac(
+            OTHER_IKEY, OTHER_SKEY, OTHER_API_HOST, FixedDateStringProvider()
+        )
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, "sign.sock")
+        self.server = duo_sign_daemon.SigningDaemon(
+            self.socket_path, {IKEY: self.hmac, OTHER_IKEY: self.other_hmac}
+        )
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self.thread.start()
+        self.client = duo_sign_daemon.DuoSignClient(self.socket_path, timeout=10)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.directory.cleanup()
+
+        return super().tearDown()
+
+    def test_sign_matches_local_signer(self):
+        test_cases = [
+            ("GET", "/admin/v1/users", {"username": "some user", "limit": "10"}, None),
+            ("POST", "/admin/v1/users", {"username": "some user"}, None),
+            ("GET", "/auth/v2/check", None, {"X-Duo-Extra": "value"}),
+        ]
+        for request in test_cases:
+            with self.subTest(request=request):
+                self.assertEqual(
+                    self.hmac.get_authentication_components(*request),
+                    self.client.sign(IKEY, *request),
+                )
+
+    def test_sign_batch_mixed_ikeys(self):
+        requests = [
+            (IKEY, "GET", "/admin/v1/users", {"offset": "0"}, None),
+            (OTHER_IKEY, "GET", "/admin/v1/users", {"offset": "0"}, None),
+        ]
+        results = self.client.sign_batch(requests)
+
+        self.assertEqual(
+            [
+                self.hmac.get_authentication_components(*requests[0][1:]),
+                self.other_hmac.get_authentication_components(*requests[1][1:]),
+            ],
+            results,
+        )
+
+    def test_errors_do_not_fail_the_batch(self):
+        results = self.client.sign_batch(
+            [
+                ("DINOTAKEY", "GET", "/auth/v2/check", None, None),
+                (IKEY, "GET", "/auth/v2/check", {"a": [None]}, None),
+                (IKEY, "GET", "/auth/v2/check", None, None),
+            ]
+        )
+
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(
+            self.hmac.get_authentication_components("GET", "/auth/v2/check"),
+            results[2],
+        )
+
+    def test_malformed_requests(self):
+        test_cases = [
+            ("Non-string method", (IKEY, 5, "/auth/v2/check", None, None)),
+            ("Non-string ikey", (None, "GET", "/auth/v2/check", None, None)),
+            ("Parameters not an object", (IKEY, "GET", "/x", ["a"], None)),
+            ("Headers not an object", (IKEY, "GET", "/x", None, "h")),
+            ("Too few items", (IKEY, "GET")),
+            ("Not a list", "GET /auth/v2/check"),
+        ]
+        for test_name, request in test_cases:
+            with self.subTest(test_name):
+                results = self.client.sign_batch(
+                    [request, (IKEY, "GET", "/auth/v2/check", None, None)]
+                )
+
+                self.assertIsInstance(results[0], ValueError)
+                self.assertEqual(
+                    self.hmac.get_authentication_components("GET", "/auth/v2/check"),
+                    results[1],
+                )
+
+    def test_malformed_payloads(self):
+        for payload in ({"sign": 5}, {"sign": {"a": 1}}, ["sign"], 5):
+            with self.subTest(payload=payload):
+                payload = duo_sign_daemon._encode_payload(payload)
+                results = self.client._receive(self.client._send(payload))
+
+                self.assertEqual(1, len(results))
+                self.assertIsInstance(results[0], ValueError)
+
+        # The connection is still usable
+        self.assertEqual(
+            self.hmac.get_authentication_components("GET", "/auth/v2/check"),
+            self.client.sign(IKEY, "GET", "/auth/v2/check"),
+        )
+
+    def test_refuses_to_replace_other_files(self):
+        path = os.path.join(self.directory.name, "not-a-socket")
+        with open(path, "w") as other_file:
+            other_file.write("keep me")
+
+        with self.assertRaises(ValueError):
+            duo_sign_daemon.SigningDaemon(path, {IKEY: self.hmac})
+        with open(path) as other_file:
+            self.assertEqual("keep me", other_file.read())
+
+    def test_replaces_stale_socket(self):
+        self.client.close()
+        self.server.shutdown()
+        # Closing the listening socket leaves its file behind, as a crash would
+        self.server.socket.close()
+        self.assertTrue(os.path.exists(self.socket_path))
+
+        server = duo_sign_daemon.SigningDaemon(self.socket_path, {IKEY: self.hmac})
+        server.server_close()
+        self.assertFalse(os.path.exists(self.socket_path))
+
+    def test_sign_raises_for_errors(self):
+        with self.assertRaises(ValueError):
+            self.client.sign(IKEY, "GET", "/auth/v2/check", {"a": [None]})
+
+    def test_sign_many_keeps_order(self):
+        requests = [
+            (IKEY, "GET", "/admin/v1/users", {"offset": str(offset)}, None)
+            for offset in range(500)
+        ]
+        results = self.client.sign_many(requests, batch_size=16, window=4)
+
+        self.assertEqual(
+            [self.hmac.get_authentication_components(*r[1:]) for r in requests],
+            results,
+        )
+
+    def test_unsendable_requests_leave_the_connection_usable(self):
+        requests = [
+            (IKEY, "GET", "/admin/v1/users", {"n": str(index)}, None)
+            for index in range(10)
+        ]
+        requests.append((IKEY, "GET", "/admin/v1/users", {"b": b"x"}, None))
+
+        with self.assertRaises(TypeError):
+            self.client.sign_many(requests, batch_size=2)
+        self.assertEqual(
+            self.hmac.get_authentication_components("GET", "/next"),
+            self.client.sign(IKEY, "GET", "/next"),
+        )
+
+    def test_failed_exchange_closes_the_connection(self):
+        # A response left unread, as after a timeout, is not taken as the
+        # answer to the next call
+        payload = duo_sign_daemon._encode_payload({"sign": [[IKEY, "GET", "/a"]]})
+        self.client._send(payload)
+
+        with self.assertRaises(ConnectionError):
+            self.client.sign(IKEY, "GET", "/next")
+        with self.assertRaises(ConnectionError):
+            self.client.sign(IKEY, "GET", "/next")
+        with self.assertRaises(ConnectionError):
+            self.client.stats()
+
+    def test_stats(self):
+        self.client.sign_batch([(IKEY, "GET", "/auth/v2/check", None, None)] * 3)
+        self.client.sign(OTHER_IKEY, "GET", "/auth/v2/check")
+
+        stats = self.client.stats()
+        self.assertEqual(4, stats["signatures"])
+        self.assertEqual(2, stats["batches"])
+        self.assertEqual(0, stats["errors"])
+        self.assertGreater(stats["signatures_per_second"], 0)
+
+    def test_socket_is_private(self):
+        self.assertEqual(0o600, os.stat(self.socket_path).st_mode & 0o777)
+
+    def test_bound_in_place(self):
+        self.assertEqual(["sign.sock"], os.listdir(self.directory.name))
+        self.assertEqual(self.socket_path, self.server.server_address)
+
+    def test_read_keys(self):
+        path = os.path.join(self.directory.name, "keys.json")
+        with open(path, "w") as keys_file:
+            json.dump(
+                {
+                    IKEY: {"skey": SKEY, "api_host": API_HOST},
+                    OTHER_IKEY: {"skey": OTHER_SKEY, "api_host": OTHER_API_HOST},
+                },
+                keys_file,
+            )
+
+        self.assertEqual(
+            [(IKEY, SKEY, API_HOST), (OTHER_IKEY, OTHER_SKEY, OTHER_API_HOST)],
+            duo_sign_daemon._read_keys(path),
+        )
+
+    def test_concurrent_clients(self):
+        results = {}
+
+        def sign(index):
+            with duo_sign_daemon.DuoSignClient(self.socket_path, timeout=10) as client:
+                results[index] = client.sign(IKEY, "GET", "/x", {"i": str(index)})
+
+        threads = [threading.Thread(target=sign, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index in range(8):
+            self.assertEqual(
+                self.hmac.get_authentication_components("GET", "/x", {"i": str(index)}),
+                results[index],
+            )
@@ -0,0 +1,115 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import http.client
+import json
+import unittest
+
+from signing_fixtures import IKEY, SKEY
+
+from duo_hmac import duo_hmac, duo_stand_in
+
+
+class TestStandInServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.api = duo_stand_in.StandInApi({IKEY: SKEY}, list_size=250, seed=1)
+        self.server = self.start_server(self.api)
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, self.server.api_host)
+        self.connection = http.client.HTTPConnection(self.server.api_host)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+        return super().tearDown()
+
+    def start_server(self, api):
+        return duo_stand_in.start_threaded_server(api)
+
+    def call(self, method, path, params=None, duo=None):
+        duo = duo or self.hmac
+        uri, body, headers = duo.get_authentication_components(method, path, params)
+        self.connection.request(method, uri[len(duo.api_host):], body, headers)
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_check(self):
+        status, content = self.call("GET", "/auth/v2/check")
+        self.assertEqual(200, status)
+        self.assertEqual("OK", content["stat"])
+
+    def test_settings(self):
+        status, content = self.call("GET", "/admin/v1/settings")
+        self.assertEqual(200, status)
+        self.assertIn("name", content["response"])
+
+    def test_bad_signature(self):
+        wrong_skey = duo_hmac.DuoHmac(IKEY, SKEY.upper(), self.server.api_host)
+        status, content = self.call("GET", "/admin/v1/settings", duo=wrong_skey)
+        self.assertEqual(401, status)
+        self.assertEqual(40101, content["code"])
+
+    def test_unknown_path(self):
+        status, _ = self.call("GET", "/admin/v1/nothing")
+        self.assertEqual(404, status)
+
+    def test_paging(self):
+        user_ids = []
+        offset = 0
+        while offset is not None:
+            status, content = self.call(
+                "GET", "/admin/v1/users", {"limit": "100", "offset": str(offset)}
+            )
+            self.assertEqual(200, status)
+            user_ids.extend(user["user_id"] for user in content["response"])
+            offset = content["metadata"].get("next_offset")
+
+        self.assertEqual(250, len(user_ids))
+        self.assertEqual(250, len(set(user_ids)))
+
+    def test_injected_failures(self):
+        self.api.fail_429_rate = 1.0
+        status, content = self.call("GET", "/auth/v2/check")
+        self.assertEqual(429, status)
+        self.assertEqual(42901, content["code"])
+
+        self.api.fail_429_rate = 0.0
+        self.api.fail_401_rate = 1.0
+        status, _ = self.call("GET", "/auth/v2/check")
+        self.assertEqual(401, status)
+
+    def test_bad_content_length(self):
+        for content_length in ("abc", "-1", "1e3"):
+            with self.subTest(content_length=content_length):
+                connection = http.client.HTTPConnection(self.server.api_host)
+                connection.putrequest("POST", "/auth/v2/check")
+                connection.putheader("Content-Length", content_length)
+                connection.endheaders()
+                response = connection.getresponse()
+
+                self.assertEqual(400, response.status)
+                self.assertEqual(40001, json.loads(response.read())["code"])
+                self.assertEqual("close", response.getheader("Connection"))
+                connection.close()
+
+        # The server is still serving
+        status, _ = self.call("GET", "/auth/v2/check")
+        self.assertEqual(200, status)
+
+
+class TestAsyncioStandInServer(TestStandInServer):
+    """The same requests against the asyncio server"""
+
+    def start_server(self, api):
+        return duo_stand_in.start_asyncio_server(api)
+
+    def test_keep_alive_requests(self):
+        # Keep-alive requests are read one after another from the same stream
+        for _ in range(3):
+            status, _ = self.call("GET", "/auth/v2/check")
+            self.assertEqual(200, status)
+        status, _ = self.call("POST", "/admin/v1/users", {"username": "a"})
+        self.assertEqual(405, status)
@@ -0,0 +1,134 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import hashlib
+import io
+import json
+import pickle
+import unittest
+
+from signing_fixtures import API_HOST, DATE_STRING, IKEY, SKEY, FixedDateStringProvider
+
+from duo_hmac import duo_hmac, duo_hmac_verify, duo_trace
+
+
+class TestCanonicalStringTrace(unittest.TestCase):
+    def setUp(self) -> None:
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, FixedDateStringProvider())
+        self.trace = duo_trace.CanonicalStringTrace(capacity=4, clock=lambda: 1.0)
+        self.hmac.trace = self.trace
+
+        return super().setUp()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(duo_hmac.DuoHmac(IKEY, SKEY, API_HOST).trace)
+
+    def test_records_parts(self):
+        self.hmac.get_authentication_components(
+            "get", "/admin/v1/users", {"username": "a b"}, {"X-Duo-Extra": "x"}
+        )
+        canon_string = "\n".join(
+            [
+                DATE_STRING,
+                "GET",
+                API_HOST,
+                "/admin/v1/users",
+                "username=a%20b",
+                hashlib.sha512(b"").hexdigest(),
+                hashlib.sha512(
+                    f"x-duo-date\x00{DATE_STRING}\x00x-duo-extra\x00x".encode()
+                ).hexdigest(),
+            ]
+        )
+
+        self.assertEqual(
+            [
+                duo_trace.TraceRecord(
+                    1.0,
+                    IKEY,
+                    DATE_STRING,
+                    "GET",
+                    API_HOST,
+                    "/admin/v1/users",
+                    len("username=a%20b"),
+                    hashlib.sha512(b"").hexdigest(),
+                    canon_string.rsplit("\n", 1)[1],
+                    hashlib.sha256(canon_string.encode()).hexdigest(),
+                    None,
+                )
+            ],
+            self.trace.dump(),
+        )
+
+    def test_ring_keeps_most_recent(self):
+        for index in range(10):
+            self.hmac.get_authentication_components("GET", f"/path/{index}")
+
+        self.assertEqual(
+            ["/path/6", "/path/7", "/path/8", "/path/9"],
+            [record.api_path for record in self.trace.dump()],
+        )
+        self.assertEqual(10, self.trace.recorded)
+
+    def test_path_with_newline(self):
+        self.hmac.get_authentication_components("GET", "/a\nb")
+        self.assertEqual("/a\nb", self.trace.dump()[0].api_path)
+
+    def test_sampling(self):
+        trace = duo_trace.CanonicalStringTrace(capacity=10000, sample_rate=0.5)
+        self.hmac.trace = trace
+        for _ in range(2000):
+            self.hmac.get_authentication_components("GET", "/path")
+
+        self.assertLess(700, trace.recorded)
+        self.assertLess(trace.recorded, 1300)
+
+    def test_client_and_server_digests_match(self):
+        verifier = duo_hmac_verify.DuoHmacVerifier({IKEY: SKEY})
+        verifier.trace = duo_trace.CanonicalStringTrace()
+
+        uri, body, headers = self.hmac.get_authentication_components(
+            "GET", "/admin/v1/users", {"limit": "10"}
+        )
+        api_path, _, query_string = uri[len(API_HOST):].partition("?")
+        verifier.verify("GET", API_HOST, api_path, query_string, body, headers)
+        with self.assertRaises(ValueError):
+            verifier.verify("GET", API_HOST, api_path, "limit=11", body, headers)
+
+        client = self.trace.dump()[0]
+        valid, invalid = verifier.trace.dump()
+        self.assertEqual(client.canonical_string_digest, valid.canonical_string_digest)
+        self.assertEqual("valid", valid.outcome)
+        self.assertEqual("invalid", invalid.outcome)
+        self.assertNotEqual(
+            client.canonical_string_digest, invalid.canonical_string_digest
+        )
+
+    def test_write_jsonl(self):
+        self.hmac.get_authentication_components("GET", "/one")
+        self.hmac.get_authentication_components("POST", "/two", {"a": 1})
+        stream = io.StringIO()
+
+        self.assertEqual(2, self.trace.write_jsonl(stream))
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(["/one", "/two"], [line["api_path"] for line in lines])
+
+    def test_clear(self):
+        self.hmac.get_authentication_components("GET", "/one")
+        self.trace.clear()
+        self.assertEqual([], self.trace.dump())
+
+    def test_pickle(self):
+        self.hmac.trace = duo_trace.CanonicalStringTrace()
+        self.hmac.get_authentication_components("GET", "/one")
+        copy = pickle.loads(pickle.dumps(self.hmac))
+        copy.get_authentication_components("GET", "/two")
+
+        self.assertEqual(["/one", "/two"], [r.api_path for r in copy.trace.dump()])
+
+    def test_invalid_arguments(self):
+        test_cases = [{"capacity": 0}, {"sample_rate": 0}, {"sample_rate": 1.5}]
+        for arguments in test_cases:
+            with self.subTest(arguments=arguments):
+                with self.assertRaises(ValueError):
+                    duo_trace.CanonicalStringTrace(**arguments)
@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: 2024 Cisco Systems, Inc. and/or its affiliates
+# SPDX-License-Identifier: MIT
+
+import gc
+import os
+import unittest
+
+from signing_fixtures import API_HOST, IKEY, SKEY
+
+from duo_hmac import duo_hmac, duo_hmac_utils, duo_trace, duo_warmup
+
+ENDPOINTS = [
+    ("GET", "/admin/v1/users", {"limit": "10"}),
+    ("POST", "/auth/v2/auth", {"username": "someone", "factor": "push"}),
+]
+
+
+class TestWarmUp(unittest.TestCase):
+    def setUp(self) -> None:
+        self.date_provider = duo_hmac_utils.SkewCompensatingDateStringProvider()
+        self.hmac = duo_hmac.DuoHmac(IKEY, SKEY, API_HOST, self.date_provider)
+
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        gc.unfreeze()
+
+        return super().tearDown()
+
+    def test_builds_key_state_and_date_cache(self):
+        duo_warmup.warm_up([self.hmac], ENDPOINTS)
+
+        self.assertIsNotNone(self.hmac._thread_state.key_state)
+        self.assertIsNotNone(self.date_provider._cache[0])
+
+    def test_warm_up_is_not_traced(self):
+        trace = duo_trace.CanonicalStringTrace()
+        self.hmac.trace = trace
+
+        duo_warmup.warm_up([self.hmac], ENDPOINTS)
+
+        self.assertIs(trace, self.hmac.trace)
+        self.assertEqual([], trace.dump())
+
+    def test_prepare_for_fork_freezes(self):
+        duo_warmup.prepare_for_fork([self.hmac], ENDPOINTS)
+        self.assertGreater(gc.get_freeze_count(), 0)
+
+    def test_prepare_for_fork_without_freezing(self):
+        duo_warmup.prepare_for_fork([self.hmac], ENDPOINTS, freeze_objects=False)
+        self.assertEqual(0, gc.get_freeze_count())
+
+    @unittest.skipIf(not hasattr(os, "fork"), "os.fork is not available")
+    def test_forked_child_signs_with_inherited_state(self):
+        duo_warmup.prepare_for_fork([self.hmac], ENDPOINTS)
+        key_state = self.hmac._thread_state.key_state
+
+        # A lock held by another thread at fork time must not deadlock the child
+        self.date_provider._lock.acquire()
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.close(read_fd)
+                self.date_provider.observe_server_date("Fri, 24 May 2024 12:00:00 GMT")
+                same_state = self.hmac._get_key_state() is key_state
+                uri, _, headers = self.hmac.get_authentication_components(*ENDPOINTS[0])
+                os.write(write_fd, f"{same_state} {uri} {len(headers)}".encode())
+            finally:
+                os._exit(0)
+        self.date_provider._lock.release()
+
+        os.close(write_fd)
+        with os.fdopen(read_fd) as child_output:
+            output = child_output.read()
+        os.waitpid(pid, 0)
+
+        self.assertEqual(f"True {API_HOST}/admin/v1/users?limit=10 2", output)